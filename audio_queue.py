@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Audio prompt queue for autoRain - priority, preemption, never blocks the caller
+
+One worker thread plays prompts through mpg123, one at a time, highest
+priority first:
+
+  - a prompt with a higher priority than the one playing preempts it (its
+    mpg123 is killed), e.g. "retry" cuts off a stale DFU step
+  - submitting a prompt drops queued prompts of lower or equal priority
+    that have not started yet (superseded), unless they were queued keep=True
+  - any prompt can be cancelled through its ticket
+
+submit() returns a Ticket at once; wait on it only where the caller really
+needs the prompt to be over (finish, shutdown).
+
+A prompt's hold is the minimum length of its slot: the next prompt starts
+no earlier than hold seconds after this one started, even if the audio is
+shorter. The DFU steps rely on it.
+
+KeepWarm holds the Bluetooth sink awake during a session so prompts do not
+start with a clipped syllable.
+"""
+
+import heapq
+import itertools
+import logging
+import os
+import subprocess
+import threading
+import time
+
+import metrics
+
+log = logging.getLogger("autorain.audio")
+
+LOW = 0
+NORMAL = 1
+URGENT = 2
+
+HOLD_STEP = 0.05  # seconds; how quickly a preemption ends a hold
+
+QUEUE_SECONDS = metrics.histogram(
+    "autorain_audio_prompt_latency_seconds", "Time from queueing a prompt until mpg123 is running",
+    ["prompt"], buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+PROMPTS = metrics.counter(
+    "autorain_audio_prompts_total", "Prompts by outcome (played, silent, preempted, dropped, cancelled, failed)",
+    ["prompt", "outcome"])
+
+
+class Ticket:
+    """A queued prompt; outcome is set once it is over."""
+
+    def __init__(self, queue, path, priority, hold, keep):
+        self.queue = queue
+        self.path = path
+        self.name = os.path.basename(path)
+        self.priority = priority
+        self.hold = hold or 0.0
+        self.keep = keep
+        self.enqueued = time.monotonic()
+        self.started = None
+        self.outcome = None
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Block until the prompt's slot is over. Returns True if it is."""
+        return self._done.wait(timeout)
+
+    def cancel(self):
+        self.queue.cancel(self)
+
+
+class AudioQueue:
+    """Priority prompt player (see module docstring)."""
+
+    def __init__(self, command, max_play=30.0, env=None):
+        """
+        Args:
+            command: path -> player argv, e.g. lambda p: ["mpg123", "-q", p];
+                None plays nothing but keeps the prompt's slot (hold)
+            max_play: kill the player after this many seconds
+            env: callable returning the player's environment (None = inherit)
+        """
+        self.command = command
+        self.max_play = max_play
+        self.env = env
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        self._current = None
+        self._proc = None
+        self._interrupt = None  # "preempted" / "cancelled" for the current prompt
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, daemon=True, name="audio")
+        self._thread.start()
+
+    @property
+    def current(self):
+        return self._current
+
+    def submit(self, path, priority=NORMAL, hold=0.0, keep=False):
+        """Queue a prompt; returns its Ticket without waiting."""
+        ticket = Ticket(self, path, priority, hold, keep)
+        with self._cond:
+            for _, _, queued in self._heap:
+                if not queued.done and not queued.keep and queued.priority <= priority:
+                    self._end(queued, "dropped")
+            current = self._current
+            if current is not None and priority > current.priority:
+                self._interrupt_current("preempted")
+            heapq.heappush(self._heap, (-priority, next(self._seq), ticket))
+            self._cond.notify_all()
+        return ticket
+
+    def cancel(self, ticket):
+        with self._cond:
+            if ticket is self._current:
+                self._interrupt_current("cancelled")
+            elif not ticket.done:
+                self._end(ticket, "cancelled")
+
+    def cancel_all(self):
+        with self._cond:
+            for _, _, queued in self._heap:
+                if not queued.done:
+                    self._end(queued, "cancelled")
+            if self._current is not None:
+                self._interrupt_current("cancelled")
+
+    def stop(self):
+        """Cancel everything and end the worker."""
+        with self._cond:
+            self._stopping = True
+        self.cancel_all()
+        with self._cond:
+            self._cond.notify_all()
+
+    # ---- worker ----
+
+    def _interrupt_current(self, reason):
+        # Called with the lock held
+        self._interrupt = reason
+        if self._proc is not None and self._proc.poll() is None:
+            self._proc.kill()
+        self._cond.notify_all()
+
+    def _end(self, ticket, outcome):
+        ticket.outcome = outcome
+        PROMPTS.inc(prompt=ticket.name, outcome=outcome)
+        if outcome not in ("played", "silent"):
+            log.info(f"[audio] {ticket.name} {outcome}")
+        ticket._done.set()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopping and not any(not t.done for _, _, t in self._heap):
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                _, _, ticket = heapq.heappop(self._heap)
+                if ticket.done:
+                    continue  # dropped or cancelled while queued
+                self._current = ticket
+                self._interrupt = None
+            self._play(ticket)
+
+    def _play(self, ticket):
+        ticket.started = time.monotonic()
+        QUEUE_SECONDS.observe(ticket.started - ticket.enqueued, prompt=ticket.name)
+        argv = self.command(ticket.path)
+        if argv is None:
+            log.info(f"[audio] No audio output, {ticket.name} not played")
+            proc = None
+        else:
+            log.info(f"[audio] Playing {ticket.name}")
+            try:
+                proc = subprocess.Popen(argv, env=self.env() if self.env else None,
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            except OSError as e:
+                log.warning(f"[audio] Playback error: {e}")
+                proc = None
+        if proc is not None:
+            with self._cond:
+                self._proc = proc
+                if self._interrupt:
+                    proc.kill()
+            try:
+                proc.wait(timeout=self.max_play)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+
+        # Rest of the slot, cut short by a preemption or cancel
+        end = ticket.started + ticket.hold
+        while not self._interrupt:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(HOLD_STEP, remaining))
+
+        with self._cond:
+            self._proc = None
+            self._current = None
+            outcome = self._interrupt or ("played" if proc is not None else
+                                          "silent" if argv is None else "failed")
+            self._end(ticket, outcome)
+
+
+# ================= KEEP WARM =================
+
+# A Bluetooth A2DP sink suspends a few seconds after the last stream ends;
+# the next prompt then waits for the transport to resume and the speaker
+# swallows its first syllable ("...ress and hold"). While a session is
+# active KeepWarm keeps the sink running:
+#
+#   stream   a silent 8 kHz mono stream from /dev/zero through pacat
+#   suspend  re-issue `pactl suspend-sink SINK 0` every few seconds
+#   off      do nothing
+#
+# Both hold the sink given to set_sink() (the default sink until then);
+# set_sink() with another sink moves the stream there.
+# touch() marks activity (re-acquiring the sink if it was released);
+# after idle seconds without a touch the stream is dropped so an idle box
+# lets the speaker sleep.
+
+KEEP_WARM_CHECK = 1.0      # seconds between idle/liveness checks
+SUSPEND_REFRESH = 3.0      # seconds between suspend-sink 0 calls (below the usual 5 s timeout)
+
+STREAM_COMMAND = ["pacat", "--playback", "--raw", "--format=s16le", "--rate=8000", "--channels=1",
+                  "--latency-msec=500", "--client-name=autorain-keepwarm", "/dev/zero"]
+SUSPEND_COMMAND = ["pactl", "suspend-sink", "@DEFAULT_SINK@", "0"]
+
+SINK_WARM = metrics.gauge("autorain_audio_sink_warm", "1 while the keep-warm holds the audio sink")
+
+
+class KeepWarm:
+    """Keep the audio sink from suspending between prompts (see above)."""
+
+    def __init__(self, mode="stream", idle=300.0, env=None):
+        """
+        Args:
+            mode: "stream", "suspend" or "off"
+            idle: release the sink after this many seconds without touch()
+            env: callable returning the environment for pacat/pactl
+        """
+        self.mode = mode
+        self.idle = idle
+        self.env = env
+        self._lock = threading.Lock()
+        self.sink = None  # pactl sink name; None = the default sink
+        self._proc = None
+        self._warm = False
+        self._last = time.monotonic()
+        self._refreshed = 0.0
+        self._stopping = False
+        self._kick = threading.Event()
+        self._thread = None
+        SINK_WARM.set(0)
+
+    @property
+    def warm(self):
+        return self._warm
+
+    def touch(self):
+        """Mark activity; the sink is (re)acquired in the background, never blocks."""
+        if self.mode == "off":
+            return
+        with self._lock:
+            self._last = time.monotonic()
+            if self._warm:
+                return
+            self._warm = True
+            SINK_WARM.set(1)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name="keep-warm")
+                self._thread.start()
+        log.info(f"[audio] Keeping sink warm ({self.mode})")
+        self._kick.set()
+
+    def set_sink(self, sink):
+        """Hold `sink` from now on; a stream on another sink is restarted there."""
+        with self._lock:
+            if sink == self.sink:
+                return
+            self.sink = sink
+            proc, self._proc = self._proc, None
+            self._refreshed = 0.0
+        _terminate(proc)
+        self._kick.set()
+
+    def stop(self):
+        """Release the sink and end the checker."""
+        with self._lock:
+            self._stopping = True
+        self._kick.set()
+        self._release("stopped")
+
+    # ---- checker thread ----
+
+    def _run(self):
+        while True:
+            self._kick.wait(KEEP_WARM_CHECK)
+            self._kick.clear()
+            with self._lock:
+                if self._stopping:
+                    return
+                warm, idle = self._warm, time.monotonic() - self._last
+            if not warm:
+                continue
+            if idle >= self.idle:
+                self._release(f"idle {idle:.0f}s")
+            elif self.mode == "stream":
+                # Also reopens after pacat exits, e.g. when the speaker reconnects
+                if self._proc is None or self._proc.poll() is not None:
+                    self._spawn()
+            elif time.monotonic() - self._refreshed >= SUSPEND_REFRESH:
+                self._refresh()
+
+    def _release(self, reason):
+        with self._lock:
+            was_warm, self._warm = self._warm, False
+            proc, self._proc = self._proc, None
+        SINK_WARM.set(0)
+        _terminate(proc)
+        self._refreshed = 0.0
+        if was_warm:
+            log.info(f"[audio] Sink released ({reason})")
+
+    def _spawn(self):
+        sink = self.sink
+        command = STREAM_COMMAND[:-1] + ([f"--device={sink}"] if sink else []) + STREAM_COMMAND[-1:]
+        try:
+            proc = subprocess.Popen(command, env=self.env() if self.env else None,
+                                    stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                    stderr=subprocess.DEVNULL)
+        except OSError as e:
+            log.warning(f"[audio] Keep-warm stream not started ({e}), using suspend-sink instead")
+            self.mode = "suspend"
+            self._refresh()
+            return
+        with self._lock:
+            if self._warm and self.sink == sink:
+                self._proc = proc
+                return
+        _terminate(proc)  # released or moved while starting
+
+    def _refresh(self):
+        self._refreshed = time.monotonic()
+        try:
+            command = SUSPEND_COMMAND[:2] + [self.sink or SUSPEND_COMMAND[2]] + SUSPEND_COMMAND[3:]
+            subprocess.run(command, env=self.env() if self.env else None,
+                           capture_output=True, timeout=2)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            log.debug(f"[audio] suspend-sink failed: {e}")
+
+
+def _terminate(proc):
+    if proc is not None and proc.poll() is None:
+        proc.terminate()
+        try:
+            proc.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            proc.kill()
@@ -2,98 +2,212 @@
 """
 autoRain - Automated iOS Jailbreak System for Orange Pi Zero 2
 
-Boot chain: getty@tty1 (autologin) -> .bash_profile -> autoRain.py
+Boot chain: autorain.service (Type=notify, see configs/autorain.service),
+or getty@tty1 (autologin) -> .bash_profile -> autoRain.py when the service
+is not enabled
 
 Features:
 - Bluetooth speaker connection with power cycle recovery
 - Audio prompts for DFU steps
 - LED visual feedback via led_controller
 - pexpect-based palera1n automation
+
+Usage:
+  autoRain.py                    run the jailbreak loop
+  autoRain.py --startup-trace    same, printing import/init times up to the first LED
+  autoRain.py stats [...]        run history report
+  autoRain.py ctl COMMAND [...]  query/nudge the running instance (ctl help)
 """
 
-import subprocess
-import time
-import pexpect
 import sys
 import os
-import logging
-import atexit
-import threading
+import time
 
 # Add script directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-# ================= LOGGING =================
+import profiler
 
-LOG_FILE = "/home/orangepi/autoRain.log"
+# --startup-trace: time every import from here on (report after LED boot)
+_trace = profiler.StartupTrace() if "--startup-trace" in sys.argv else None
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler(sys.stdout),
-    ],
-)
+import subprocess
+import logging
+import atexit
+import collections
+import threading
+
+import audio_queue
+import config
+import event_log
+import metrics
+import sd_notify
+import sink_select
+import status_web
+
+# pexpect, led_controller, run_history, control, speaker_power and bt_session
+# are imported on first use
 
 log = logging.getLogger("autorain")
 
+# Resolved by config.load() in main(); defaults until then
+cfg = config.Config()
+
 # ================= LED CONTROLLER =================
 
 LED_AVAILABLE = False
 led = None
 
-try:
-    import led_controller as led
-    LED_AVAILABLE = True
-    log.info("[led] LED controller loaded")
-except ImportError as e:
-    log.warning(f"[led] LED controller not available: {e}")
+
+def load_led():
+    """Import led_controller on first use; False if it is not available."""
+    global led, LED_AVAILABLE
+    
+    if led is None:
+        try:
+            import led_controller
+            led = led_controller
+            LED_AVAILABLE = True
+            log.info("[led] LED controller loaded")
+        except ImportError as e:
+            log.warning(f"[led] LED controller not available: {e}")
+    return LED_AVAILABLE
 
 
 def led_call(func_name, *args, **kwargs):
-    """Safely call LED function."""
+    """Queue an LED command; never blocks the caller (cleanup runs inline)."""
     if not LED_AVAILABLE or led is None:
         return
     try:
-        func = getattr(led, func_name, None)
-        if func:
-            func(*args, **kwargs)
+        if func_name == "cleanup":
+            led.cleanup()
+        else:
+            led.post(func_name, *args, **kwargs)
     except Exception as e:
         log.debug(f"[led] {func_name} error: {e}")
 
 
-# ================= ENVIRONMENT =================
+# ================= STARTUP =================
 
-os.environ["PATH"] = "/usr/sbin:/sbin:/usr/local/sbin:/home/orangepi:" + os.environ.get("PATH", "")
-os.environ["PULSE_SERVER"] = "unix:/run/user/1000/pulse/native"
+def _trace_phase(name):
+    if _trace is not None:
+        _trace.phase(name)
 
-# ================= CONFIG =================
 
-BT_MAC = "11:81:AA:11:88:72"
-BT_TIMEOUT = 60  # Max seconds to wait for BT
-SPEAKER_POWER_SCRIPT = "/usr/local/bin/speaker-power.sh"
+def setup_environment():
+    """Tools live in sbin and the home dir; audio goes to the user's PulseAudio."""
+    os.environ["PATH"] = cfg.environment.path_prefix + ":" + os.environ.get("PATH", "")
+    os.environ["PULSE_SERVER"] = cfg.environment.pulse_server
+
+
+def setup_logging():
+    event_log.setup_logging(
+        cfg.logging.file,
+        max_bytes=cfg.logging.max_bytes,
+        backups=cfg.logging.backups,
+        buffer_seconds=cfg.logging.buffer_seconds,
+    )
+
+
+# ================= METRICS =================
+
+BT_CONNECT_ATTEMPTS = metrics.counter(
+    "autorain_bt_connect_attempts_total", "Bluetooth connect attempts", ["result"])
+BT_POWER_SKIPPED = metrics.counter(
+    "autorain_bt_power_skipped_total", "Speaker power presses skipped because it was already on")
+BT_CONNECT_SECONDS = metrics.histogram(
+    "autorain_bt_connect_seconds", "Time from starting to wait for the speaker until it connected")
+STATUS_VIEWERS = metrics.gauge(
+    "autorain_status_viewers", "Open status page event streams", func=status_web.viewers)
+STAGE_SECONDS = metrics.histogram(
+    "autorain_stage_seconds", "Time spent in each pipeline stage", ["stage"])
+RETRIES = metrics.counter(
+    "autorain_palera1n_retries_total", "palera1n restarts", ["reason"])
+RETRY_COST = metrics.histogram(
+    "autorain_palera1n_retry_cost_seconds", "Time spent in a palera1n attempt that failed", ["reason"])
+WATCHDOG_FIRES = metrics.counter(
+    "autorain_palera1n_watchdog_total", "palera1n attempts stopped by the watchdog", ["kind", "stage"])
+ESCALATIONS = metrics.counter(
+    "autorain_palera1n_escalations_total", "Recovery actions taken after a watchdog fire", ["action"])
+
+
+def _led_metrics():
+    """Register PWM loop health from led_controller."""
+    # Read-only: every render (exporter scrapes, `ctl metrics`) sees the same
+    # values, so the jitter max is the worst since start, not per scrape
+    def stat(key):
+        return lambda: led.pwm_stats()[key] if led._pwm_threads else None
+    
+    metrics.counter("autorain_led_pwm_periods_total", "PWM periods run", func=stat("periods"))
+    metrics.counter("autorain_led_pwm_jitter_seconds_total",
+                    "Summed |period - nominal| of PWM periods", func=stat("jitter_sum"))
+    metrics.gauge("autorain_led_pwm_jitter_max_seconds",
+                  "Worst PWM period deviation since start", func=stat("jitter_max"))
+    metrics.counter("autorain_led_pwm_cpu_seconds_total", "CPU time of the PWM threads",
+                    func=stat("cpu_seconds"))
 
-AUDIO_DIR = "/home/orangepi/autoRain/audio/sounds"
-READY_MP3 = f"{AUDIO_DIR}/ready.mp3"
-STEP1_MP3 = f"{AUDIO_DIR}/step1.mp3"
-STEP2_MP3 = f"{AUDIO_DIR}/step2.mp3"
-FINISH_MP3 = f"{AUDIO_DIR}/complete.mp3"
-RETRY_MP3 = f"{AUDIO_DIR}/retry.mp3"
-SHUTDOWN_MP3 = f"{AUDIO_DIR}/shutdown.mp3"
+# ================= STAGES =================
 
-# Fallback to home dir if audio dir doesn't exist
-if not os.path.exists(AUDIO_DIR):
-    AUDIO_DIR = "/home/orangepi"
-    READY_MP3 = f"{AUDIO_DIR}/ready.mp3"
-    STEP1_MP3 = f"{AUDIO_DIR}/step1.mp3"
-    STEP2_MP3 = f"{AUDIO_DIR}/step2.mp3"
-    FINISH_MP3 = f"{AUDIO_DIR}/complete.mp3"
-    RETRY_MP3 = f"{AUDIO_DIR}/retry.mp3"
-    SHUTDOWN_MP3 = f"{AUDIO_DIR}/shutdown.mp3"
+_stage = {"name": "starting", "since": time.time()}
+_recent_stages = collections.deque(maxlen=20)  # for `ctl status`
+_history = None
+_started = time.time()
+_lock_file = None  # holds the single-instance flock
+_audio = None  # audio_queue.AudioQueue, see audio()
+_keep_warm = None  # audio_queue.KeepWarm once the speaker is connected
+_speaker = None  # speaker_power.SpeakerPower, False if the line is unavailable
+_bt = {}  # MAC -> bt_session.BtSession; one per speaker so none waits behind another
+_bt_lock = threading.Lock()
+_bt_failed = False  # a session could not be started: one bluetoothctl per command
+_race = None  # sink_select.SinkRace for the audio outputs
+_sink = None  # name of the output prompts play on; None = LEDs only
+_sink_info = {}  # how the main speaker connected (cycle, attempt)
+
+
+def enter_stage(name, message, level=logging.INFO, **fields):
+    """
+    Record a pipeline stage transition and log it as a structured event.
+    
+    The record carries stage, prev_stage and duration (seconds spent in the
+    previous stage) plus any extra fields (device, attempt, ...).
+    """
+    now = time.time()
+    event = {
+        "stage": name,
+        "prev_stage": _stage["name"],
+        "duration": round(now - _stage["since"], 3),
+    }
+    event.update(fields)
+    _stage["name"], _stage["since"] = name, now
+    _recent_stages.append(event)
+    log.log(level, message, extra=event)
+    sd_notify.status(message)
+    sd_notify.watchdog()
+    status_web.stage(name, message, attempt=fields.get("attempt"))
+    STAGE_SECONDS.observe(event["duration"], stage=event["prev_stage"])
+    if _keep_warm is not None:
+        _keep_warm.touch()
+    
+    if _history is not None:
+        _history.record_stage(name, event["prev_stage"], now, event["duration"], fields.get("attempt"))
+
+
+def record_retry(reason, prompted=False, stage=None, attempt=None, cost=None):
+    """
+    Count a palera1n retry in metrics and the run history.
+    
+    Args:
+        reason: dfu_timeout, exited, timeout, ...
+        stage: pipeline stage the attempt failed in
+        cost: seconds spent in the failed attempt
+    """
+    RETRIES.inc(reason=reason)
+    status_web.publish("retry", {"reason": reason, "stage": stage, "attempt": attempt})
+    if cost is not None:
+        RETRY_COST.observe(cost, reason=reason)
+    if _history is not None:
+        _history.add_retry(prompted, reason, stage, attempt, cost)
 
-PALERA1N_CMD = "sudo palera1n -l"
-MAX_RETRIES = 3
 
 # ================= UTILITY =================
 
@@ -126,21 +240,70 @@ def kill_process(name):
 
 # ================= BLUETOOTH =================
 
-def bt_is_connected():
-    """Check if Bluetooth speaker is connected."""
-    success, output = run_cmd(["bluetoothctl", "info", BT_MAC])
+def bt(mac=None):
+    """
+    The persistent bluetoothctl session for a speaker (default: bluetooth.mac),
+    or None to run one bluetoothctl per command.
+    
+    Each speaker gets its own session: a session runs one command at a
+    time, and an extra speaker that is out of range must not hold up the
+    main speaker's connects right after its power cycle.
+    """
+    global _bt_failed
+    
+    if _bt_failed or not cfg.bluetooth.session:
+        return None
+    mac = (mac or cfg.bluetooth.mac).upper()
+    with _bt_lock:  # probe threads of the audio race call this concurrently
+        session = _bt.get(mac)
+        if session is None or not session.alive:
+            try:
+                import bt_session
+                session = _bt[mac] = bt_session.BtSession()
+            except Exception as e:
+                log.warning(f"[bt] bluetoothctl session not available ({e}), one process per command")
+                _bt_failed = True
+                return None
+        return session
+
+
+def bt_is_connected(mac=None):
+    """Check if Bluetooth speaker is connected (default: bluetooth.mac)."""
+    mac = mac or cfg.bluetooth.mac
+    session = bt(mac)
+    if session is not None:
+        try:
+            return session.is_connected(mac, timeout=cfg.bluetooth.info_timeout)
+        except EOFError as e:
+            log.warning(f"[bt] {e}")
+    success, output = run_cmd(["bluetoothctl", "info", mac], timeout=cfg.bluetooth.info_timeout)
     return success and "Connected: yes" in output
 
 
-def bt_connect():
+def bt_connect(mac=None):
     """Attempt to connect to Bluetooth speaker with a shorter timeout."""
-    log.info(f"[bt] Connecting to {BT_MAC}...")
+    mac = mac or cfg.bluetooth.mac
+    log.info(f"[bt] Connecting to {mac}...")
+    session = bt(mac)
+    if session is not None:
+        try:
+            ok, output = session.connect(mac, timeout=cfg.bluetooth.connect_timeout)
+        except EOFError as e:
+            log.warning(f"[bt] {e}")
+        else:
+            if ok:
+                log.info("[bt] Connect command succeeded")
+            elif ok is None:
+                log.warning("[bt] Connect command timed out (speaker may still be processing)")
+            else:
+                log.debug(f"[bt] Connect output: {output.strip()}")
+            return bool(ok)
     try:
         result = subprocess.run(
-            ["bluetoothctl", "connect", BT_MAC],
+            ["bluetoothctl", "connect", mac],
             capture_output=True,
             text=True,
-            timeout=8  # Wait up to 8 seconds for the connect command
+            timeout=cfg.bluetooth.connect_timeout
         )
         if result.returncode == 0:
             log.info("[bt] Connect command succeeded")
@@ -164,55 +327,121 @@ def bt_connect():
         return False
 
 
+def speaker_power():
+    """The speaker power button line (speaker_power.py), or None to use power_script."""
+    global _speaker
+    
+    if _speaker is None:
+        _speaker = False
+        if cfg.bluetooth.power_backend != "script":
+            try:
+                import speaker_power
+                _speaker = speaker_power.SpeakerPower(cfg.bluetooth.power_backend, cfg.bluetooth.power_chip,
+                                                      cfg.bluetooth.power_line, cfg.bluetooth.power_hold)
+            except Exception as e:
+                log.warning(f"[bt] Power button line not available ({e}), using {cfg.bluetooth.power_script}")
+    return _speaker or None
+
+
+def speaker_is_on():
+    """
+    Check whether the speaker is already powered before touching its button.
+    
+    The button toggles, so pressing an on speaker turns it off. The speaker
+    is on if it is connected or accepts a connect within power_probe seconds
+    (an off speaker fails that connect on the page timeout).
+    """
+    if cfg.bluetooth.power_probe <= 0:
+        return bt_is_connected()
+    log.info("[bt] Checking whether the speaker is already on...")
+    session = bt(cfg.bluetooth.mac)
+    if session is not None:
+        try:
+            # A timed-out probe leaves its late reply to the session, see bt_session.py
+            ok, _ = session.connect(cfg.bluetooth.mac, timeout=cfg.bluetooth.power_probe)
+            return bool(ok)
+        except EOFError as e:
+            log.warning(f"[bt] {e}")
+    success, output = run_cmd(["bluetoothctl", "--timeout", str(max(1, round(cfg.bluetooth.power_probe))),
+                               "connect", cfg.bluetooth.mac], timeout=cfg.bluetooth.power_probe + 2)
+    return success or "already connected" in output.lower()
+
+
 def bt_power_cycle():
-    """Power cycle the Bluetooth speaker via GPIO 79."""
+    """Power the Bluetooth speaker on via GPIO 79 (off and on again if it is known to be on)."""
     log.info("[bt] Power cycling speaker...")
+    button = speaker_power()
     try:
-        subprocess.run(
-            ["sudo", SPEAKER_POWER_SCRIPT],
-            capture_output=True,
-            timeout=10
-        )
+        if button is None:
+            subprocess.run(
+                ["sudo", cfg.bluetooth.power_script],
+                capture_output=True,
+                timeout=cfg.bluetooth.power_timeout
+            )
+        else:
+            if button.on:
+                # On but not connecting: a single press would only turn it off
+                button.press()
+                time.sleep(cfg.bluetooth.cycle_pause)
+            button.press()
         log.info("[bt] Power cycle complete, waiting for speaker boot...")
-        time.sleep(3)  # Wait for speaker to boot
+        time.sleep(cfg.bluetooth.power_boot_wait)  # Wait for speaker to boot
         return True
     except Exception as e:
         log.error(f"[bt] Power cycle failed: {e}")
         return False
 
 
-def bt_disconnect():
+def bt_disconnect(mac=None):
     """Disconnect from Bluetooth speaker."""
+    mac = mac or cfg.bluetooth.mac
+    session = bt(mac)
+    if session is not None:
+        try:
+            session.disconnect(mac, timeout=cfg.bluetooth.disconnect_timeout)
+            return
+        except EOFError as e:
+            log.warning(f"[bt] {e}")
     try:
         subprocess.run(
-            ["bluetoothctl", "disconnect", BT_MAC],
+            ["bluetoothctl", "disconnect", mac],
             capture_output=True,
-            timeout=3
+            timeout=cfg.bluetooth.disconnect_timeout
         )
     except:
         pass
 
 
-def wait_for_bluetooth():
+def wait_for_bluetooth(stop):
     """
-    Block until Bluetooth speaker is connected.
+    Try to bring up the main Bluetooth speaker for one round (bluetooth.timeout).
     
     Sequence:
     1. Power cycle speaker to ensure it boots fresh
     2. Wait for full initialization
     3. Rapidly attempt connects immediately after boot
     4. If fails, retry from step 1
-    """
-    # Set volume early to ensure all audio plays at safe level
-    set_volume("2%")
-    
-    log.info("[bt] === Waiting for Bluetooth speaker ===")
-    led_call("boot_bt_waiting")
     
+    Returns {cycle, attempt} once connected, None if the round ran out or
+    stop (an Event) was set.
+    """
     start_time = time.time()
     cycle_attempt = 0
     
-    while time.time() - start_time < BT_TIMEOUT:
+    # Never press the power button of a speaker that is already on
+    button = speaker_power()
+    if speaker_is_on():
+        if button is not None:
+            button.on = True
+        BT_POWER_SKIPPED.inc()
+        BT_CONNECT_ATTEMPTS.inc(result="success")
+        saved = cfg.bluetooth.power_hold + cfg.bluetooth.power_boot_wait + cfg.bluetooth.boot_settle
+        log.info(f"[bt] Speaker was already on, no power cycle (~{saved:.0f}s saved)")
+        return {"cycle": 0, "attempt": 0}
+    if button is not None and button.on is None and cfg.bluetooth.power_probe > 0:
+        button.on = False  # verified off: the next press turns it on
+    
+    while time.time() - start_time < cfg.bluetooth.timeout and not stop.is_set():
         cycle_attempt += 1
         log.info(f"[bt] Power cycle attempt {cycle_attempt}...")
         
@@ -222,38 +451,135 @@ def wait_for_bluetooth():
         # After power cycle, the speaker is booting
         # Wait a bit longer for full initialization (speaker-specific timing)
         log.info("[bt] Waiting for speaker to fully boot...")
-        time.sleep(2)
+        time.sleep(cfg.bluetooth.boot_settle)
         
         # Now attempt rapid connects while speaker is fresh
-        for connect_attempt in range(1, 5):
+        attempts = cfg.bluetooth.connect_attempts
+        for connect_attempt in range(1, attempts + 1):
+            if stop.is_set():
+                return None
             log.info(f"[bt] Connect attempt {connect_attempt} (after boot {cycle_attempt})...")
             
             # Try to connect
             bt_connect()
-            time.sleep(1)  # Wait for connection to establish
+            time.sleep(cfg.bluetooth.connect_settle)  # Wait for connection to establish
             
             # Check if connected
-            if bt_is_connected():
+            connected = bt_is_connected()
+            BT_CONNECT_ATTEMPTS.inc(result="success" if connected else "fail")
+            if connected:
                 log.info("[bt] ✓ Speaker connected!")
-                led_call("boot_bt_connected")
-                return True
+                return {"cycle": cycle_attempt, "attempt": connect_attempt}
             
             log.warning(f"[bt] Connect attempt {connect_attempt} failed")
             
             # Disconnect before next attempt to clear Bluetooth state
-            if connect_attempt < 4:  # Don't disconnect after last attempt before retry
+            if connect_attempt < attempts:  # Don't disconnect after last attempt before retry
                 bt_disconnect()
-                time.sleep(0.5)
+                time.sleep(cfg.bluetooth.disconnect_settle)
         
         # If all rapid connects failed, try next power cycle
         log.warning(f"[bt] All connects failed after boot {cycle_attempt}, will retry...")
-        time.sleep(1)
+        time.sleep(cfg.bluetooth.cycle_pause)
     
-    log.error(f"[bt] ✗ Failed to connect after {BT_TIMEOUT}s")
-    led_call("palera1n_error")
+    if not stop.is_set():
+        log.error(f"[bt] ✗ Failed to connect after {cfg.bluetooth.timeout}s")
+    return None
+
+
+def _main_speaker(stop):
+    """SinkRace probe for bluetooth.mac: rounds of power cycles until connected."""
+    while not stop.is_set():
+        result = wait_for_bluetooth(stop)
+        if result is not None:
+            _sink_info.update(result)
+            return True
+        log.info("[bt] Will keep retrying...")
+        time.sleep(cfg.bluetooth.retry_pause)
     return False
 
 
+def _extra_speaker(mac):
+    """SinkRace probe for one of bluetooth.extra_macs: plain connects, no power button."""
+    def probe(stop):
+        while not stop.is_set():
+            bt_connect(mac)
+            time.sleep(cfg.bluetooth.connect_settle)
+            if bt_is_connected(mac):
+                return True
+            time.sleep(cfg.bluetooth.cycle_pause)
+        return False
+    return probe
+
+
+def _wired(stop):
+    return sink_select.wait_for_jack(stop, cfg.audio.jack_glob)
+
+
+def _activate_sink(name):
+    """SinkRace on_ready: route prompts to the winning output (also mid-run)."""
+    global _sink
+    
+    kind, _, mac = name.partition(":")
+    sink = sink_select.route(sink_select.bt_sink_key(mac) if kind == "bt" else cfg.audio.wired_sink,
+                             env=_audio_env())
+    set_volume()
+    _sink = name
+    keep_warm(sink)  # a late winner must be kept warm too, not the old default
+    if _race is not None and _race.late:
+        log.warning(f"[audio] {name} is ready - prompts play on it from now on")
+        status_web.publish("audio", {"sink": name})
+
+
+def wait_for_audio():
+    """
+    Race every audio output (sink_select.py) and return the winner's name.
+    
+    Returns None if nothing was ready within audio.sink_deadline seconds;
+    the pipeline then goes on with LEDs only and _activate_sink() turns
+    prompts on when an output turns up later.
+    """
+    global _race
+    
+    # Set volume early to ensure all audio plays at safe level
+    set_volume()
+    
+    enter_stage("bt_waiting", "[bt] === Waiting for an audio output ===", device=cfg.bluetooth.mac)
+    led_call("boot_bt_waiting")
+    
+    candidates = [(f"bt:{cfg.bluetooth.mac}", _main_speaker)]
+    candidates += [(f"bt:{mac}", _extra_speaker(mac)) for mac in cfg.bluetooth.extra_macs]
+    if cfg.audio.wired:
+        candidates.append(("wired", _wired))
+    start_time = time.time()
+    _race = sink_select.SinkRace(candidates, on_ready=_activate_sink).start()
+    
+    # Wait in slices so the systemd watchdog sees the main thread alive
+    deadline = cfg.audio.sink_deadline or None
+    winner = None
+    while winner is None and not _race.finished:
+        left = None if deadline is None else deadline - (time.time() - start_time)
+        if left is not None and left <= 0:
+            break
+        winner = _race.wait(min(5.0, left) if left is not None else 5.0)
+        sd_notify.watchdog()
+    winner = winner or _race.detach()
+    
+    elapsed = round(time.time() - start_time, 3)
+    if winner is None:
+        enter_stage("audio_degraded", f"[audio] No audio output after {elapsed:.0f}s - continuing with LEDs only",
+                    logging.WARNING, elapsed=elapsed)
+        return None
+    BT_CONNECT_SECONDS.observe(elapsed)
+    if winner == "wired":
+        enter_stage("audio_wired", "[audio] ✓ Headphone jack plugged in", elapsed=elapsed)
+    else:
+        enter_stage("bt_connected", "[bt] ✓ Speaker connected!", device=winner.partition(":")[2],
+                    elapsed=elapsed, **_sink_info)
+    led_call("boot_bt_connected")
+    return winner
+
+
 # ================= AUDIO =================
 
 def get_pulse_socket():
@@ -268,54 +594,71 @@ def get_pulse_socket():
     return paths[0]
 
 
-def set_volume(level="2%"):
-    """Set audio volume."""
+def set_volume(level=None):
+    """Set audio volume (None = configured volume)."""
     try:
         env = os.environ.copy()
         env["PULSE_SERVER"] = f"unix:{get_pulse_socket()}"
         subprocess.run(
-            ["pactl", "set-sink-volume", "@DEFAULT_SINK@", level],
+            ["pactl", "set-sink-volume", "@DEFAULT_SINK@", level or cfg.audio.volume],
             env=env,
             capture_output=True,
-            timeout=2
+            timeout=cfg.audio.volume_timeout
         )
     except:
         pass
 
 
-def play_audio(mp3_path, wait=True, wait_time=None):
-    """Play audio file via mpg123."""
-    if not os.path.exists(mp3_path):
-        log.warning(f"[audio] File not found: {mp3_path}")
-        return
+def _audio_env():
+    env = os.environ.copy()
+    env["PULSE_SERVER"] = f"unix:{get_pulse_socket()}"
+    return env
+
+
+def audio():
+    """The prompt queue (started on first use)."""
+    global _audio
     
-    log.info(f"[audio] Playing {os.path.basename(mp3_path)}")
+    if _audio is None:
+        # No output yet (LEDs only): prompts keep their slots but play nothing
+        _audio = audio_queue.AudioQueue(lambda path: ["mpg123", "-q", path] if _sink else None,
+                                        max_play=cfg.audio.max_play, env=_audio_env)
+    return _audio
+
+
+def keep_warm(sink=None):
+    """Start holding the speaker's sink (or `sink`, a pactl name) awake for this session."""
+    global _keep_warm
     
-    try:
-        env = os.environ.copy()
-        env["PULSE_SERVER"] = f"unix:{get_pulse_socket()}"
-        
-        if wait:
-            start = time.time()
-            subprocess.run(
-                ["mpg123", "-q", mp3_path],
-                env=env,
-                timeout=30
-            )
-            # If wait_time specified, ensure we wait at least that long
-            if wait_time:
-                elapsed = time.time() - start
-                if elapsed < wait_time:
-                    time.sleep(wait_time - elapsed)
-        else:
-            subprocess.Popen(
-                ["mpg123", "-q", mp3_path],
-                env=env,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL
-            )
-    except Exception as e:
-        log.warning(f"[audio] Playback error: {e}")
+    if _keep_warm is None:
+        _keep_warm = audio_queue.KeepWarm(cfg.audio.keep_warm, cfg.audio.keep_warm_idle, env=_audio_env)
+    if sink:
+        _keep_warm.set_sink(sink)
+    _keep_warm.touch()
+    return _keep_warm
+
+
+def play_audio(mp3_path, wait=True, wait_time=None, priority=audio_queue.NORMAL, keep=False):
+    """
+    Queue a prompt for mpg123 (see audio_queue.py).
+    
+    Args:
+        wait: block until the prompt's slot is over
+        wait_time: minimum slot length in seconds (hold)
+        priority: audio_queue.URGENT preempts whatever is playing
+        keep: never dropped by a later prompt of the same priority (DFU steps)
+    
+    Returns the prompt's Ticket.
+    """
+    if not os.path.exists(mp3_path):
+        # Still queued: the slot (hold) keeps the DFU timing without the audio
+        log.warning(f"[audio] File not found: {mp3_path}")
+    if _keep_warm is not None:
+        _keep_warm.touch()
+    ticket = audio().submit(mp3_path, priority, hold=wait_time, keep=keep)
+    if wait:
+        ticket.wait(cfg.audio.max_play + (wait_time or 0) + 1)
+    return ticket
 
 
 # ================= USBMUXD =================
@@ -324,21 +667,24 @@ def start_usbmuxd():
     """Start usbmuxd for iOS device communication."""
     log.info("[usb] Stopping existing usbmuxd...")
     kill_process("usbmuxd")
-    time.sleep(0.5)
+    time.sleep(cfg.usbmuxd.stop_settle)
     
     log.info("[usb] Starting usbmuxd...")
     subprocess.Popen(
-        ["sudo", "/usr/sbin/usbmuxd", "-f", "-p", "-v"],
-        stdout=open("/home/orangepi/autorain-usbmuxd.txt", "w"),
+        cfg.usbmuxd.cmd.split(),
+        stdout=open(cfg.usbmuxd.log, "w"),
         stderr=subprocess.STDOUT,
         start_new_session=True
     )
     
     # Wait for socket
-    for _ in range(20):
-        if os.path.exists("/var/run/usbmuxd"):
+    deadline = time.monotonic() + cfg.usbmuxd.socket_wait
+    while True:
+        if os.path.exists(cfg.usbmuxd.socket):
             log.info("[usb] usbmuxd ready")
             return True
+        if time.monotonic() >= deadline:
+            break
         time.sleep(0.1)
     
     log.warning("[usb] usbmuxd socket not found")
@@ -347,82 +693,230 @@ def start_usbmuxd():
 
 # ================= PALERA1N =================
 
+# Device modes palera1n reports; a relaunch finds the device where it was left
+MODE_NORMAL = "normal"
+MODE_RECOVERY = "recovery"
+MODE_PONGO = "pongo"
+
+PALERA1N_PATTERNS = [
+    r"Waiting for devices",           # 0
+    r"Entering recovery mode",        # 1
+    r"Press Enter when ready for DFU",# 2
+    r"Booting Kernel",                # 3
+    r"Found PongoOS USB Device",      # 4
+    r"Timed out waiting for download mode",  # 5
+    r"Entering normal mode",          # 6
+]
+
+# Watchdog: config key holding each stage's deadline; stages in which
+# palera1n is expected to keep printing (silence = stalled)
+STAGE_DEADLINES = {
+    "waiting": "expect_timeout",
+    "normal_mode": "normal_deadline",
+    "recovery": "recovery_deadline",
+    "dfu": "dfu_deadline",
+}
+IDLE_STAGES = ("recovery", "dfu")
+
+# Stages in which a palera1n attempt is running (`ctl restart` allowed)
+PALERA1N_STAGES = ("waiting", "normal_mode", "recovery", "dfu", "dfu_timeout",
+                   "timeout", "stalled", "exited", "restart")
+
+# Set by `ctl restart`; the poll loop abandons the attempt and starts over
+RESTART = threading.Event()
+
+# expect() timeout while an action waits for a prompt to end (DFU Enter)
+PROMPT_POLL = 0.02
+
+
+class _ActivityTap:
+    """child.logfile_read target: forwards output and notes when it last arrived."""
+    
+    def __init__(self, target):
+        self.target = target
+        self.last = time.monotonic()
+    
+    def write(self, data):
+        self.last = time.monotonic()
+        self.target.write(data)
+    
+    def flush(self):
+        self.target.flush()
+
+
+def _stage_deadline(stage, resumed):
+    if stage == "waiting" and resumed:
+        return cfg.palera1n.resume_timeout
+    return getattr(cfg.palera1n, STAGE_DEADLINES.get(stage, "expect_timeout"))
+
+
 def run_palera1n():
-    """Run palera1n with pexpect, handling all stages."""
+    """
+    Run palera1n with pexpect, handling all stages.
+    
+    A failed attempt is relaunched with the device left in whatever mode it
+    reached: if it is already in recovery, the retry skips the ready prompt
+    and waits only resume_timeout for palera1n to pick it up again.
+    
+    A watchdog stops an attempt whose stage outlives its deadline, or that
+    prints nothing for idle_timeout during recovery/DFU. Consecutive watchdog
+    fires escalate through palera1n.escalation (retry, usbmuxd, reset).
+    
+    Prompts never block the reader: the DFU Enter and step-2 prompt run as
+    a pending action once the step-1 prompt's slot is over.
+    """
+    import pexpect
+    
     log.info("[palera1n] Starting palera1n...")
     led_call("boot_ready")
+    RESTART.clear()
     
     retry_count = 0
+    device_mode = None  # last mode palera1n reported
+    watchdog_fires = 0  # consecutive, cleared when an attempt makes progress
     
-    while retry_count <= MAX_RETRIES:
-        child = pexpect.spawn(PALERA1N_CMD, encoding="utf-8", timeout=None)
-        child.logfile = sys.stdout
+    while retry_count <= cfg.palera1n.max_retries:
+        resumed = retry_count > 0 and device_mode in (MODE_RECOVERY, MODE_PONGO)
+        attempt_start = time.time()
+        watch = {"stage": "waiting", "since": time.monotonic()}
+        pending = None  # (ticket, action): run action once the prompt's slot ends
+        
+        def fail(reason, prompted=False):
+            record_retry(reason, prompted, stage=_stage["name"], attempt=retry_count,
+                         cost=round(time.time() - attempt_start, 3))
+        
+        def watch_stage(name):
+            watch["stage"], watch["since"] = name, time.monotonic()
+        
+        def dfu_step2():
+            child.sendline("")
+            led_call("palera1n_dfu_step2")
+            status_web.countdown("Release side, keep holding volume down", cfg.palera1n.step2_hold)
+            play_audio(cfg.prompt("step2"), wait=False, wait_time=cfg.palera1n.step2_hold, keep=True)
+        
+        tap = _ActivityTap(event_log.LogWriter(logging.getLogger("autorain.palera1n")))
+        child = pexpect.spawn(cfg.palera1n.cmd, encoding="utf-8", timeout=None)
+        child.logfile_read = tap
         
         while True:
+            if pending is not None and pending[0].done:
+                ticket, action = pending
+                pending = None
+                if ticket.outcome in ("played", "silent", "failed"):
+                    action()
+            
             try:
-                idx = child.expect([
-                    r"Waiting for devices",           # 0
-                    r"Entering recovery mode",        # 1
-                    r"Press Enter when ready for DFU",# 2
-                    r"Booting Kernel",                # 3
-                    r"Found PongoOS USB Device",      # 4
-                    r"Timed out waiting for download mode",  # 5
-                    r"Entering normal mode",          # 6
-                    pexpect.EOF,                      # 7
-                ], timeout=300)
-                
-                if idx == 0:
-                    log.info("[palera1n] Waiting for device...")
-                    led_call("palera1n_waiting")
-                    play_audio(READY_MP3, wait_time=2.5)
-                
-                elif idx == 1:
-                    log.info("[palera1n] Recovery mode - device detected!")
-                    led_call("palera1n_device_detected")  # Speed up chase!
-                    child.sendline("\r")
-                
-                elif idx == 2:
-                    log.info("[palera1n] DFU mode instructions")
-                    led_call("palera1n_dfu_step1")
-                    play_audio(STEP1_MP3, wait_time=5)
-                    child.sendline("")
-                    led_call("palera1n_dfu_step2")
-                    play_audio(STEP2_MP3, wait_time=10)
-                
-                elif idx in (3, 4):
-                    log.info("[palera1n] Kernel booting - SUCCESS!")
-                    led_call("palera1n_booting")
-                    play_audio(FINISH_MP3)
-                    led_call("palera1n_complete")
-                    return True
-                
-                elif idx == 5:
-                    log.warning("[palera1n] DFU timeout - retrying")
-                    led_call("palera1n_error")
-                    play_audio(RETRY_MP3)
-                    retry_count += 1
+                idx = child.expect(PALERA1N_PATTERNS + [pexpect.EOF],
+                                   timeout=cfg.palera1n.watchdog_poll if pending is None else PROMPT_POLL)
+            except pexpect.TIMEOUT:
+                sd_notify.watchdog()
+                if RESTART.is_set():
+                    # Operator restart: does not count against max_retries
+                    RESTART.clear()
+                    fail("manual")
+                    enter_stage("restart", "[palera1n] Restart requested - starting over",
+                                logging.WARNING, attempt=retry_count, device_mode=device_mode)
                     child.close(force=True)
+                    device_mode = None
+                    watchdog_fires = 0
                     break
                 
-                elif idx == 6:
-                    log.info("[palera1n] Normal mode - will reboot to recovery")
-                    led_call("palera1n_device_detected")
+                now = time.monotonic()
+                limit = _stage_deadline(watch["stage"], resumed)
+                if now - watch["since"] >= limit:
+                    kind, detail = "deadline", f"{watch['stage']} took longer than {limit:.0f}s"
+                elif watch["stage"] in IDLE_STAGES and now - tap.last >= cfg.palera1n.idle_timeout:
+                    kind, detail = "stall", f"no output for {cfg.palera1n.idle_timeout:.0f}s in {watch['stage']}"
+                else:
                     continue
                 
-                elif idx == 7:
-                    log.error("[palera1n] Unexpected exit")
-                    led_call("palera1n_error")
-                    retry_count += 1
-                    break
-                    
-            except pexpect.TIMEOUT:
-                log.error("[palera1n] Timeout waiting for device")
+                watchdog_fires += 1
+                ladder = cfg.palera1n.escalation
+                action = ladder[min(watchdog_fires, len(ladder)) - 1]
+                WATCHDOG_FIRES.inc(kind=kind, stage=watch["stage"])
+                ESCALATIONS.inc(action=action)
+                fail(kind)
+                enter_stage("timeout" if kind == "deadline" else "stalled",
+                            f"[palera1n] Watchdog: {detail} - {action}", logging.ERROR,
+                            attempt=retry_count, device_mode=device_mode, watchdog=kind, action=action)
+                led_call("palera1n_error")
+                child.close(force=True)
+                if action in ("usbmuxd", "reset"):
+                    start_usbmuxd()
+                if action == "reset":
+                    device_mode = None
+                retry_count += 1
+                break
+            
+            if idx == 0:
+                watch_stage("waiting")
+                enter_stage("waiting", "[palera1n] Waiting for device...", attempt=retry_count,
+                            resumed=resumed, device_mode=device_mode)
+                led_call("palera1n_waiting")
+                if resumed:
+                    log.info(f"[palera1n] Device still in {device_mode} mode - skipping ready prompt")
+                else:
+                    play_audio(cfg.prompt("ready"), wait=False, wait_time=cfg.palera1n.ready_hold)
+            
+            elif idx == 1:
+                device_mode = MODE_RECOVERY
+                watchdog_fires = 0
+                watch_stage("recovery")
+                enter_stage("recovery", "[palera1n] Recovery mode - device detected!", attempt=retry_count)
+                led_call("palera1n_device_detected")  # Speed up chase!
+                child.sendline("\r")
+            
+            elif idx == 2:
+                device_mode = MODE_RECOVERY
+                watchdog_fires = 0
+                watch_stage("dfu")
+                enter_stage("dfu", "[palera1n] DFU mode instructions", attempt=retry_count,
+                            resumed=resumed)
+                led_call("palera1n_dfu_step1")
+                status_web.countdown("Hold side + volume down", cfg.palera1n.step1_hold)
+                # keep: a `ctl replay` must not drop step 1, its end sends the Enter
+                ticket = play_audio(cfg.prompt("step1"), wait=False, wait_time=cfg.palera1n.step1_hold,
+                                    keep=True)
+                pending = (ticket, dfu_step2)
+            
+            elif idx in (3, 4):
+                device_mode = MODE_PONGO
+                enter_stage("booting", "[palera1n] Kernel booting - SUCCESS!", attempt=retry_count)
+                led_call("palera1n_booting")
+                play_audio(cfg.prompt("finish"), priority=audio_queue.URGENT)
+                led_call("palera1n_complete")
+                return True
+            
+            elif idx == 5:
+                # The device falls back to recovery; the next attempt resumes there
+                device_mode = MODE_RECOVERY
+                fail("dfu_timeout", prompted=True)
+                enter_stage("dfu_timeout", "[palera1n] DFU timeout - retrying", logging.WARNING,
+                            attempt=retry_count)
+                led_call("palera1n_error")
+                # Cuts off a DFU step still playing; no Enter for this attempt
+                play_audio(cfg.prompt("retry"), wait=False, priority=audio_queue.URGENT)
                 retry_count += 1
                 child.close(force=True)
                 break
+            
+            elif idx == 6:
+                device_mode = MODE_NORMAL
+                watch_stage("normal_mode")
+                enter_stage("normal_mode", "[palera1n] Normal mode - will reboot to recovery",
+                            attempt=retry_count)
+                led_call("palera1n_device_detected")
+            
+            elif idx == 7:
+                fail("exited")
+                enter_stage("exited", "[palera1n] Unexpected exit", logging.ERROR, attempt=retry_count,
+                            device_mode=device_mode)
+                led_call("palera1n_error")
+                retry_count += 1
+                break
     
     log.critical("[palera1n] Max retries exceeded")
-    play_audio(SHUTDOWN_MP3)
+    play_audio(cfg.prompt("shutdown"), priority=audio_queue.URGENT)
     return False
 
 
@@ -431,17 +925,29 @@ def run_palera1n():
 def cleanup():
     """Cleanup on exit."""
     log.info("[system] Cleanup...")
+    sd_notify.stopping()
     
-    # Remove PID file
-    try:
-        pidfile = "/tmp/autorain.pid"
-        if os.path.exists(pidfile):
-            os.remove(pidfile)
-    except:
-        pass
+    # The instance lock goes with the process; only the socket is removed
+    if "control" in sys.modules:
+        sys.modules["control"].stop_server()
     
-    # Stop LEDs
+    # Stop LEDs and any prompt still playing
     led_call("cleanup")
+    if _race is not None:
+        _race.stop()
+    if _speaker:
+        _speaker.close()
+    for session in list(_bt.values()):
+        session.close()
+    if _audio is not None:
+        _audio.stop()
+    if _keep_warm is not None:
+        _keep_warm.stop()
+    
+    # Close the run record (no-op if main already finished it)
+    if _history is not None:
+        _history.finish("aborted")
+        _history.close()
     
     # Kill processes
     kill_process("palera1n")
@@ -449,50 +955,182 @@ def cleanup():
 
 
 def check_already_running():
-    """Prevent multiple instances."""
-    pidfile = "/tmp/autorain.pid"
+    """
+    Prevent multiple instances.
+    
+    Holds an exclusive flock on the pidfile for the life of the process;
+    the kernel drops it on exit or crash, so there is no stale-PID check.
+    """
+    global _lock_file
+    import fcntl
+    
+    pidfile = cfg.system.pidfile
+    _lock_file = open(pidfile, "a+")
+    try:
+        fcntl.flock(_lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        _lock_file.seek(0)
+        log.critical(f"[system] Already running (PID {_lock_file.read().strip() or '?'})")
+        sys.exit(1)
     
-    if os.path.exists(pidfile):
+    # Write our PID (informational only)
+    _lock_file.seek(0)
+    _lock_file.truncate()
+    _lock_file.write(str(os.getpid()))
+    _lock_file.flush()
+
+
+# ================= CONTROL =================
+
+PROMPT_NAMES = ("ready", "step1", "step2", "finish", "retry", "shutdown")
+
+# led_controller functions an operator may call over the control socket.
+# set_all/all_off stop the running effect, so they hold until the next
+# stage; *_effect functions only build effects and are not callable here.
+LED_CONTROL_PREFIXES = ("boot_", "palera1n_", "flash_", "pulse_", "rainbow_", "set_all",
+                        "all_off", "fade_to", "test_colors")
+
+
+def _ctl_status():
+    now = time.time()
+    return {
+        "pid": os.getpid(),
+        "uptime_s": round(now - _started, 3),
+        "config": cfg.source or "built-in defaults",
+        "stage": _stage["name"],
+        "stage_s": round(now - _stage["since"], 3),
+        "stages": list(_recent_stages),
+        "led": LED_AVAILABLE,
+        "sink": _sink,
+    }
+
+
+def _ctl_replay(name):
+    if name not in PROMPT_NAMES:
+        raise ValueError(f"unknown prompt {name} ({', '.join(PROMPT_NAMES)})")
+    play_audio(cfg.prompt(name), wait=False)
+    return {"prompt": name}
+
+
+def _ctl_restart():
+    if _stage["name"] not in PALERA1N_STAGES:
+        raise ValueError(f"no palera1n attempt running (stage {_stage['name']})")
+    RESTART.set()
+    return {"pending": True}
+
+
+def _ctl_led(func, *args):
+    if not LED_AVAILABLE:
+        raise ValueError("LED controller not available")
+    if (not func.startswith(LED_CONTROL_PREFIXES) or func.endswith("_effect")
+            or not callable(getattr(led, func, None))):
+        raise ValueError(f"not an LED state: {func}")
+    values = []
+    for a in args:
         try:
-            with open(pidfile) as f:
-                pid = int(f.read().strip())
-            # Check if process exists
-            os.kill(pid, 0)
-            log.critical(f"[system] Already running (PID {pid})")
-            sys.exit(1)
-        except (ProcessLookupError, ValueError):
-            os.remove(pidfile)
+            values.append(int(a))
+        except ValueError:
+            values.append(float(a))
+    led_call(func, *values)
+    return {"led": func}
+
+
+def start_control():
+    """Serve the control socket (commands only queue work, see control.py)."""
+    import control
     
-    # Write our PID
-    with open(pidfile, 'w') as f:
-        f.write(str(os.getpid()))
+    control.command("status", _ctl_status, "current stage and recent stage times")
+    control.command("metrics", lambda: {"text": metrics.REGISTRY.render()}, "metric snapshot")
+    control.command("replay", _ctl_replay, f"replay a prompt: {', '.join(PROMPT_NAMES)}")
+    control.command("restart", _ctl_restart, "abandon the palera1n attempt and start over")
+    control.command("led", _ctl_led, "LED state until the next stage, e.g. led palera1n_error / led set_all 255 0 0")
+    try:
+        control.start_server(cfg.system.control_socket)
+    except OSError as e:
+        log.warning(f"[control] Not started on {cfg.system.control_socket}: {e}")
 
 
 # ================= MAIN =================
 
+def load_config():
+    """config.load(), or the built-in defaults if the file is broken."""
+    try:
+        return config.load()
+    except (config.ConfigError, OSError) as e:
+        # A typo in the config file must not leave the box dark
+        print(f"autoRain: {e} - using built-in defaults", file=sys.stderr)
+        return config.Config().resolve()
+
+
 def main():
+    global _history, _started, cfg
+    
+    _started = time.time()
+    _trace_phase("imports")
+    cfg = load_config()
+    setup_environment()
+    setup_logging()
+    _trace_phase("config + logging")
+    
     log.info("=" * 50)
     log.info("autoRain starting")
     log.info("=" * 50)
+    log.info(f"[system] Config: {cfg.source or 'built-in defaults'}")
     
-    atexit.register(cleanup)
+    # Lock first: a second instance must exit without touching our processes
     check_already_running()
+    atexit.register(cleanup)
     
-    # Start LED controller and show boot animation
-    if LED_AVAILABLE and led is not None:
-        led.start_pwm()
-        time.sleep(0.2)
-        led.boot_starting()
+    # Start LED controller and show boot animation first: it is the
+    # operator's only sign of life until the speaker connects
+    if load_led():
+        led.configure(cfg.leds)
+        _trace_phase("led_controller import")
+        if led.start_pwm():
+            led_call("boot_starting")
+            if _trace is not None:
+                led.flush(timeout=1.0)
+            _trace_phase("first LED")
+        else:
+            log.warning(f"[led] PWM not started (backend: {led.GPIO_BACKEND}) - continuing without LEDs")
     
-    # Wait for Bluetooth speaker (BLOCKING)
-    if not wait_for_bluetooth():
-        log.critical("[system] Cannot proceed without Bluetooth audio")
-        log.info("[system] Will keep retrying...")
-        while not wait_for_bluetooth():
-            time.sleep(5)
+    profiler.install(interval=cfg.profiler.interval, output_dir=cfg.profiler.dir)
+    start_control()
     
-    # Set up audio
-    set_volume("2%")
+    import run_history
+    _history = run_history.RunHistory(cfg.history.db)
+    _history.start_run()
+    
+    # Also read by `ctl metrics`, exporter or not
+    if LED_AVAILABLE:
+        _led_metrics()
+    if cfg.metrics.port:
+        try:
+            metrics.start_server(cfg.metrics.port)
+        except OSError as e:
+            log.warning(f"[metrics] Exporter not started on port {cfg.metrics.port}: {e}")
+    
+    if cfg.status.port:
+        try:
+            status_web.start_server(cfg.status.port, cfg.status.addr)
+        except OSError as e:
+            log.warning(f"[status] Status page not started on port {cfg.status.port}: {e}")
+    
+    if _trace is not None:
+        _trace.phase("init done")
+        _trace.stop()
+        report = _trace.report()
+        print(report, file=sys.stderr)
+        log.info(f"[system] {report}")
+    
+    # Under systemd: startup done, units ordered after us may start
+    sd_notify.ready("Waiting for an audio output")
+    
+    # Wait for a speaker or the headphone jack, at most audio.sink_deadline
+    # (the winner is routed, volume set and kept warm by _activate_sink)
+    bt_start = time.time()
+    if wait_for_audio() is not None:
+        _history.set_bt_connect(time.time() - bt_start)
     
     # Start usbmuxd
     start_usbmuxd()
@@ -504,9 +1142,23 @@ def main():
         log.info("[system] Jailbreak complete!")
     else:
         log.error("[system] Jailbreak failed")
+    _history.finish("success" if success else "failed")
+    
+    # led_call() only queues the celebration; let it play before cleanup
+    # turns the LEDs off
+    if success and LED_AVAILABLE and led is not None:
+        led.flush()
+        time.sleep(led.celebration_seconds())
     
     cleanup()
 
 
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 1 and sys.argv[1] == "stats":
+        import run_history
+        sys.exit(run_history.main(sys.argv[2:], load_config().history.db))
+    elif len(sys.argv) > 1 and sys.argv[1] == "ctl":
+        import control
+        sys.exit(control.main(sys.argv[2:], load_config().system.control_socket))
+    else:
+        main()
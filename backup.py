@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Incremental backups for the Orange Pi - content-addressed, deduplicated
+
+Files are split into chunks; each chunk is stored once, zlib-compressed,
+under the sha256 of its content:
+
+    <store>/objects/ab/cdef...      chunk (zlib)
+    <store>/snapshots/<stamp>.json  manifest: path -> size, mtime, mode, chunks
+
+A file whose size and mtime match the previous snapshot is not even read:
+its chunk list is copied from the old manifest. Changed files are hashed
+and only chunks the store does not have yet are written, so a backup of an
+unchanged box writes one small manifest.
+
+    python3 backup.py backup              # prints files/bytes read/bytes written
+    python3 backup.py list
+    python3 backup.py restore [SNAPSHOT] [--target DIR] [--only PATH ...]
+    python3 backup.py prune --keep 10     # drop old snapshots and unused chunks
+
+scripts/backup-orangepi.sh wraps this with the box's paths and services.
+"""
+
+import argparse
+import fnmatch
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+import zlib
+
+DEFAULT_STORE = "/home/orangepi/backups/store"
+CHUNK_SIZE = 1024 * 1024  # configs and scripts are far smaller; big files split
+COMPRESS_LEVEL = 6
+
+# What backup-orangepi.sh used to tar
+SOURCES = [
+    "/home/orangepi/*.py",
+    "/home/orangepi/*.sh",
+    "/home/orangepi/*.md",
+    "/home/orangepi/*.txt",
+    "/home/orangepi/*.json",
+    "/home/orangepi/*.toml",
+    "/home/orangepi/.bash*",
+    "/home/orangepi/.led*",
+    "/home/orangepi/.profile",
+    "/home/orangepi/.zshrc",
+    "/home/orangepi/autoRain",
+    "/home/orangepi/python-fun",
+    "/home/orangepi/utils",
+    "/home/orangepi/etc",
+    "/home/orangepi/systemd",
+    "/etc/autorain.toml",
+    "/etc/systemd/system/gpio71-init.service",
+    "/etc/systemd/system/leds-off.service",
+    "/etc/systemd/system/auto-wifi-connect.service",
+    "/etc/systemd/system/jailbreakbox-ap*.service",
+    "/etc/systemd/system/autorain.service",
+    "/etc/modules-load.d/modules.conf",
+]
+
+EXCLUDES = [
+    "*.pyc", "__pycache__", ".cache", "node_modules", "*.log", "*.mp3", "*.zip",
+    "*.tar.gz", "backups", "pipewire", "autoRainBuild", "*.db", "*.db-*", ".git",
+]
+
+
+# ================= STORE =================
+
+def _fsync_dir(path):
+    """Make renames into a directory durable."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class Store:
+    """Chunk objects and snapshot manifests under one directory."""
+
+    def __init__(self, root=DEFAULT_STORE):
+        self.root = root
+        self.objects = os.path.join(root, "objects")
+        self.snapshots = os.path.join(root, "snapshots")
+        self._unsynced_dirs = set()  # directories with chunks renamed in since the last save()
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects, digest[:2], digest[2:])
+
+    def has(self, digest):
+        return os.path.exists(self._object_path(digest))
+
+    def put(self, digest, data):
+        """Store a chunk if new. Returns bytes written (0 if already stored)."""
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            return 0
+        subdir = os.path.dirname(path)
+        if not os.path.isdir(subdir):
+            os.makedirs(subdir, exist_ok=True)
+            self._unsynced_dirs.add(self.objects)
+        packed = zlib.compress(data, COMPRESS_LEVEL)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(packed)
+            # A chunk that exists is never rewritten: it must be whole on disk
+            # before any manifest can point at it
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        self._unsynced_dirs.add(subdir)
+        return len(packed)
+
+    def get(self, digest):
+        with open(self._object_path(digest), "rb") as f:
+            data = zlib.decompress(f.read())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"chunk {digest} is corrupt")
+        return data
+
+    def list_snapshots(self):
+        """Snapshot names, oldest first."""
+        try:
+            return sorted(n[:-5] for n in os.listdir(self.snapshots) if n.endswith(".json"))
+        except FileNotFoundError:
+            return []
+
+    def load(self, name):
+        with open(os.path.join(self.snapshots, name + ".json")) as f:
+            return json.load(f)
+
+    def save(self, name, manifest):
+        """Write a manifest atomically; it is the commit point of a backup."""
+        # The chunk renames first, so a power cut cannot leave the manifest
+        # pointing at chunks that are not there
+        for path in sorted(self._unsynced_dirs, key=len, reverse=True):
+            _fsync_dir(path)
+        self._unsynced_dirs.clear()
+        os.makedirs(self.snapshots, exist_ok=True)
+        path = os.path.join(self.snapshots, name + ".json")
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        _fsync_dir(self.snapshots)
+
+    def remove(self, name):
+        os.remove(os.path.join(self.snapshots, name + ".json"))
+
+    def all_objects(self):
+        for sub in os.listdir(self.objects) if os.path.isdir(self.objects) else []:
+            for name in os.listdir(os.path.join(self.objects, sub)):
+                if not name.endswith(".tmp"):
+                    yield sub + name
+
+
+# ================= BACKUP =================
+
+def _excluded(name, excludes):
+    return any(fnmatch.fnmatch(name, pattern) for pattern in excludes)
+
+
+def walk(sources=SOURCES, excludes=EXCLUDES):
+    """Absolute paths of regular files and symlinks to back up, sorted."""
+    found = set()
+    for pattern in sources:
+        for top in glob.glob(pattern):
+            if _excluded(os.path.basename(top), excludes):
+                continue
+            if os.path.isdir(top) and not os.path.islink(top):
+                for dirpath, dirnames, filenames in os.walk(top):
+                    dirnames[:] = [d for d in dirnames if not _excluded(d, excludes)]
+                    for name in filenames:
+                        if not _excluded(name, excludes):
+                            found.add(os.path.join(dirpath, name))
+            else:
+                found.add(os.path.abspath(top))
+    return sorted(found)
+
+
+def _chunks(path):
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(CHUNK_SIZE)
+            if not data:
+                return
+            yield data
+
+
+def backup(store, sources=SOURCES, excludes=EXCLUDES, name=None):
+    """
+    Take a snapshot. Returns (name, stats).
+
+    Stats: files, changed (files read), unreadable, bytes_read, new_chunks,
+    bytes_written (compressed chunks + manifest), seconds.
+    """
+    started = time.monotonic()
+    snapshots = store.list_snapshots()
+    previous = store.load(snapshots[-1])["files"] if snapshots else {}
+    stats = dict.fromkeys(("files", "changed", "unreadable", "bytes_read", "new_chunks",
+                           "bytes_written"), 0)
+    files = {}
+
+    for path in walk(sources, excludes):
+        try:
+            st = os.lstat(path)
+        except OSError:
+            stats["unreadable"] += 1
+            continue
+        entry = {"size": st.st_size, "mtime": st.st_mtime_ns, "mode": st.st_mode & 0o7777}
+        if os.path.islink(path):
+            entry["link"] = os.readlink(path)
+            files[path] = entry
+            stats["files"] += 1
+            continue
+
+        old = previous.get(path)
+        if (old is not None and old.get("size") == entry["size"] and old.get("mtime") == entry["mtime"]
+                and "chunks" in old):
+            entry["chunks"] = old["chunks"]
+        else:
+            try:
+                chunks = []
+                for data in _chunks(path):
+                    digest = hashlib.sha256(data).hexdigest()
+                    written = store.put(digest, data)
+                    stats["bytes_read"] += len(data)
+                    stats["bytes_written"] += written
+                    stats["new_chunks"] += 1 if written else 0
+                    chunks.append(digest)
+            except OSError:
+                stats["unreadable"] += 1
+                continue
+            entry["chunks"] = chunks
+            stats["changed"] += 1
+        files[path] = entry
+        stats["files"] += 1
+
+    name = name or time.strftime("%Y%m%d_%H%M%S")
+    manifest = {"created": time.time(), "files": files}
+    stats["seconds"] = round(time.monotonic() - started, 3)
+    manifest["stats"] = stats
+    store.save(name, manifest)
+    stats["bytes_written"] += os.path.getsize(os.path.join(store.snapshots, name + ".json"))
+    return name, stats
+
+
+# ================= RESTORE =================
+
+def _unchanged(path, entry):
+    try:
+        if "link" in entry:
+            return os.readlink(path) == entry["link"]
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return st.st_size == entry["size"] and st.st_mtime_ns == entry["mtime"]
+
+
+def restore(store, name=None, target="/", only=None):
+    """
+    Write a snapshot's files under `target`. Returns stats.
+
+    Files whose size and mtime already match are skipped; everything else is
+    written to a temp file and renamed into place.
+    """
+    started = time.monotonic()
+    snapshots = store.list_snapshots()
+    if not snapshots:
+        raise ValueError(f"no snapshots in {store.root}")
+    name = name or snapshots[-1]
+    files = store.load(name)["files"]
+    stats = {"snapshot": name, "files": 0, "skipped": 0, "bytes": 0}
+
+    for path, entry in sorted(files.items()):
+        if only and not any(path == p or path.startswith(p.rstrip("/") + "/") for p in only):
+            continue
+        dest = os.path.join(target, path.lstrip("/"))
+        if _unchanged(dest, entry):
+            stats["skipped"] += 1
+            continue
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp = dest + ".restore-tmp"
+        if "link" in entry:
+            if os.path.lexists(tmp):
+                os.remove(tmp)
+            os.symlink(entry["link"], tmp)
+        else:
+            with open(tmp, "wb") as f:
+                for digest in entry["chunks"]:
+                    data = store.get(digest)
+                    f.write(data)
+                    stats["bytes"] += len(data)
+            os.chmod(tmp, entry["mode"])
+            os.utime(tmp, ns=(entry["mtime"], entry["mtime"]))
+        os.replace(tmp, dest)
+        stats["files"] += 1
+
+    stats["seconds"] = round(time.monotonic() - started, 3)
+    return stats
+
+
+# ================= PRUNE =================
+
+def prune(store, keep):
+    """Keep the newest `keep` snapshots and delete chunks no longer referenced."""
+    snapshots = store.list_snapshots()
+    dropped = snapshots[:-keep] if keep > 0 else snapshots
+    for name in dropped:
+        store.remove(name)
+
+    used = set()
+    for name in store.list_snapshots():
+        for entry in store.load(name)["files"].values():
+            used.update(entry.get("chunks", ()))
+    freed = removed = 0
+    for digest in list(store.all_objects()):
+        if digest not in used:
+            path = store._object_path(digest)
+            freed += os.path.getsize(path)
+            os.remove(path)
+            removed += 1
+    return {"snapshots": len(dropped), "chunks": removed, "bytes": freed}
+
+
+# ================= CLI =================
+
+def _size(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="backup.py", description="Incremental Orange Pi backups")
+    parser.add_argument("--store", default=DEFAULT_STORE, help=f"store directory (default {DEFAULT_STORE})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("backup")
+    p.add_argument("--json", action="store_true", help="print stats as JSON")
+    sub.add_parser("list")
+    p = sub.add_parser("restore")
+    p.add_argument("snapshot", nargs="?", help="default: newest")
+    p.add_argument("--target", default="/", help="restore under this directory (default /)")
+    p.add_argument("--only", nargs="+", metavar="PATH", help="restore only these files/directories")
+    p = sub.add_parser("prune")
+    p.add_argument("--keep", type=int, required=True, help="snapshots to keep")
+    args = parser.parse_args(argv)
+
+    store = Store(args.store)
+    if args.command == "backup":
+        name, stats = backup(store)
+        if args.json:
+            print(json.dumps(dict(stats, snapshot=name)))
+        else:
+            print(f"snapshot {name}: {stats['files']} files, {stats['changed']} changed, "
+                  f"read {_size(stats['bytes_read'])}, wrote {_size(stats['bytes_written'])} "
+                  f"({stats['new_chunks']} new chunks) in {stats['seconds']:.2f}s"
+                  + (f", {stats['unreadable']} unreadable" if stats["unreadable"] else ""))
+    elif args.command == "list":
+        for name in store.list_snapshots():
+            m = store.load(name)
+            # Manifest stats are taken before the manifest itself is written
+            written = m.get("stats", {}).get("bytes_written", 0)
+            written += os.path.getsize(os.path.join(store.snapshots, name + ".json"))
+            size = sum(e["size"] for e in m["files"].values())
+            print(f"{name}  {len(m['files']):5d} files  {_size(size):>9}  wrote {_size(written):>9}")
+    elif args.command == "restore":
+        try:
+            stats = restore(store, args.snapshot, args.target, args.only)
+        except (ValueError, OSError) as e:
+            print(f"restore failed: {e}", file=sys.stderr)
+            return 1
+        print(f"restored {stats['snapshot']}: {stats['files']} files ({_size(stats['bytes'])}), "
+              f"{stats['skipped']} unchanged, in {stats['seconds']:.2f}s")
+    elif args.command == "prune":
+        stats = prune(store, args.keep)
+        print(f"pruned {stats['snapshots']} snapshots, {stats['chunks']} chunks ({_size(stats['bytes'])})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
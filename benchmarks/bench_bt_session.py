@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Per-command bluetoothctl latency: one process per command vs bt_session.
+
+For each command (info, connect on a connected speaker, disconnect +
+connect) it times `bluetoothctl CMD MAC` as a new process, the way
+autoRain used to, against the same command over one BtSession, plus
+is_connected() answered from the session's event state.
+
+By default it runs against simulator.py's fake bluetoothctl (speaker on
+and connected, virtual clock at x1, so connects take their simulated
+0.5 s); the fake is a Python script, so the per-process number mostly
+shows interpreter start-up. Use --real MAC on the box for the real
+bluetoothctl, D-Bus and agent set-up.
+
+Usage:
+  python3 benchmarks/bench_bt_session.py [--count 20] [--real MAC] [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import bt_session
+import simulator
+
+SIM_MAC = "11:81:AA:11:88:72"
+
+
+def fake_env():
+    """Point PATH at the simulator's fakes (speaker on and connected)."""
+    sim_dir = tempfile.mkdtemp(prefix="autorain-bench-bt-")
+    spec = simulator.scenario({"speaker": {"initially_on": True}})
+    bin_dir = simulator.prepare(spec, sim_dir, connected=True)
+    os.environ.update({
+        simulator.DIR_ENV: sim_dir,
+        simulator.SCALE_ENV: "1.0",
+        simulator.EPOCH_ENV: repr(time.monotonic() - 3600.0),
+        "PATH": bin_dir + ":" + os.environ.get("PATH", ""),
+    })
+    return sim_dir
+
+
+def _ms(samples):
+    samples = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(samples) * 1000, 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1 if len(samples) > 1 else 0] * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3),
+    }
+
+
+def timed(func, count):
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return _ms(samples)
+
+
+def fork(*args):
+    subprocess.run(["bluetoothctl", *args], capture_output=True, timeout=30)
+
+
+def bench(mac, count):
+    results = {}
+    results["info"] = {"fork": timed(lambda: fork("info", mac), count)}
+    results["connect"] = {"fork": timed(lambda: fork("connect", mac), count)}
+    results["reconnect"] = {"fork": timed(lambda: (fork("disconnect", mac), fork("connect", mac)), count)}
+
+    start = time.perf_counter()
+    session = bt_session.BtSession()
+    startup = time.perf_counter() - start
+    try:
+        results["info"]["session"] = timed(lambda: session._run("info", mac, 30), count)
+        results["connect"]["session"] = timed(lambda: session.connect(mac, 30), count)
+        results["reconnect"]["session"] = timed(
+            lambda: (session.disconnect(mac, 30), session.connect(mac, 30)), count)
+        results["is_connected"] = {"session": timed(lambda: session.is_connected(mac), count)}
+    finally:
+        session.close()
+    return results, round(startup * 1000, 3)
+
+
+def print_report(report):
+    print(f"session start-up {report['session_startup_ms']:.1f} ms ({report['target']})")
+    print(f"{'command':<14}{'fork p50':>10}{'p95':>9}{'session p50':>13}{'p95':>9}{'speed-up':>10}")
+    for name, r in report["commands"].items():
+        fork_r, sess = r.get("fork"), r["session"]
+        fork_cols = f"{fork_r['p50_ms']:>10.2f}{fork_r['p95_ms']:>9.2f}" if fork_r else f"{'-':>10}{'-':>9}"
+        speedup = f"{fork_r['p50_ms'] / sess['p50_ms']:>9.1f}x" if fork_r and sess["p50_ms"] else f"{'-':>10}"
+        print(f"{name:<14}{fork_cols}{sess['p50_ms']:>13.2f}{sess['p95_ms']:>9.2f}{speedup}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="bluetoothctl per-command latency, fork vs session")
+    parser.add_argument("--count", type=int, default=20, help="runs per command and mode")
+    parser.add_argument("--real", metavar="MAC", help="use the system bluetoothctl with this (paired) speaker")
+    parser.add_argument("--json", metavar="PATH", help="write results as JSON")
+    args = parser.parse_args()
+
+    sim_dir = None
+    if args.real:
+        mac, target = args.real, "bluetoothctl"
+    else:
+        sim_dir = fake_env()
+        mac, target = SIM_MAC, "simulator fake"
+    try:
+        commands, startup = bench(mac, args.count)
+    finally:
+        if sim_dir:
+            import shutil
+            shutil.rmtree(sim_dir, ignore_errors=True)
+
+    report = {
+        "benchmark": "bt_session",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": platform.node(),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "target": target,
+        "count": args.count,
+        "session_startup_ms": startup,
+        "commands": commands,
+    }
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+End-to-end time-to-jailbreak under simulated device behaviour.
+
+Runs autoRain.main() through simulator.py (fake speaker, tools and
+palera1n, virtual clock) for each scenario, each run in a fresh process,
+and splits the run history into phases:
+
+  startup    process start until waiting for the speaker
+  bluetooth  power cycles and connects until the speaker is connected
+  prepare    volume, usbmuxd and palera1n start until "Waiting for devices"
+  device     waiting for the device / normal-mode reboots until recovery
+  recovery   recovery mode until the DFU prompt
+  dfu        DFU instructions until the kernel boots (or the DFU timeout)
+  retry      time lost in failed attempts (timeout, crash) before the next one
+  finish     completion prompt and cleanup
+
+time_to_jailbreak is the time until the kernel boots. All times are
+virtual seconds, i.e. what the box would see.
+
+Use --baseline with an earlier --json file to print the change per scenario,
+and --set SECTION.KEY=VALUE to run with a config override (e.g. the old
+speaker power path: --set bluetooth.power_backend=script --set bluetooth.power_probe=0).
+
+Usage:
+  python3 benchmarks/bench_end_to_end.py [--scenarios fast_dfu,missed_dfu] [--repeat 3]
+                                         [--scale 20] [--json out.json] [--baseline old.json]
+                                         [--set SECTION.KEY=VALUE ...]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import simulator
+
+DEFAULT_SCENARIOS = "fast_dfu,missed_dfu,slow_speaker,normal_mode_loop,speaker_on"
+
+PHASES = ["startup", "bluetooth", "prepare", "device", "recovery", "dfu", "retry", "finish"]
+
+# Stage being left -> phase its duration counts towards
+PHASE_OF = {
+    "starting": "startup",
+    "bt_waiting": "bluetooth",
+    "bt_failed": "bluetooth",
+    "bt_connected": "prepare",
+    "audio_wired": "prepare",
+    "audio_degraded": "prepare",
+    "waiting": "device",
+    "normal_mode": "device",
+    "recovery": "recovery",
+    "dfu": "dfu",
+    "dfu_timeout": "retry",
+    "exited": "retry",
+    "timeout": "retry",
+    "stalled": "retry",
+}
+
+
+def run_once(scenario, scale, limit, overrides=()):
+    """One simulator run in a fresh process; returns its results dict."""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        out = f.name
+    try:
+        subprocess.run(
+            [sys.executable, os.path.join(ROOT, "simulator.py"), "run",
+             "--scenario", scenario, "--scale", str(scale), "--limit", str(limit), "--json", out]
+            + [arg for item in overrides for arg in ("--set", item)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            timeout=limit / scale + 60,
+        )
+        with open(out) as f:
+            return json.load(f)
+    except (subprocess.TimeoutExpired, ValueError, OSError):
+        return {"outcome": "crashed", "stages": [], "total_s": None, "retries": 0}
+    finally:
+        os.remove(out)
+
+
+def phases(results):
+    """Seconds per phase and time to jailbreak from one run's stages."""
+    totals = dict.fromkeys(PHASES, 0.0)
+    elapsed = 0.0
+    time_to_jailbreak = None
+    for s in results["stages"]:
+        if s["prev_stage"] is None or s["duration"] is None:
+            continue
+        totals[PHASE_OF.get(s["prev_stage"], "retry")] += s["duration"]
+        elapsed += s["duration"]
+        if s["stage"] == "booting" and time_to_jailbreak is None:
+            time_to_jailbreak = elapsed
+    if results.get("total_s") is not None:
+        totals["finish"] = max(0.0, results["total_s"] - elapsed)
+    return {k: round(v, 3) for k, v in totals.items()}, time_to_jailbreak
+
+
+def _stats(values):
+    values = [v for v in values if v is not None]
+    if not values:
+        return {"median": None, "max": None}
+    return {"median": round(statistics.median(values), 3), "max": round(max(values), 3)}
+
+
+def bench_scenario(scenario, repeat, scale, limit, overrides=()):
+    runs = []
+    for _ in range(repeat):
+        results = run_once(scenario, scale, limit, overrides)
+        run_phases, ttj = phases(results)
+        runs.append({
+            "outcome": results["outcome"],
+            "time_to_jailbreak_s": None if ttj is None else round(ttj, 3),
+            "total_s": results.get("total_s"),
+            "retries": results.get("retries", 0),
+            "real_s": results.get("real_s"),
+            "phases": run_phases,
+        })
+    return {
+        "runs": runs,
+        "summary": {
+            "success": sum(r["outcome"] == "success" for r in runs),
+            "runs": len(runs),
+            "time_to_jailbreak_s": _stats([r["time_to_jailbreak_s"] for r in runs]),
+            "total_s": _stats([r["total_s"] for r in runs]),
+            "phases_s": {p: _stats([r["phases"][p] for r in runs])["median"] for p in PHASES},
+        },
+    }
+
+
+def _fmt(v):
+    return "-" if v is None else f"{v:.1f}"
+
+
+def print_report(report, baseline=None):
+    print(f"{'scenario':<18}{'ok':>5}{'ttj p50':>9}{'ttj max':>9}{'total':>8}  "
+          + "".join(f"{p:>10}" for p in PHASES))
+    for name, result in report["scenarios"].items():
+        s = result["summary"]
+        print(f"{name:<18}{s['success']:>3}/{s['runs']}{_fmt(s['time_to_jailbreak_s']['median']):>9}"
+              f"{_fmt(s['time_to_jailbreak_s']['max']):>9}{_fmt(s['total_s']['median']):>8}  "
+              + "".join(f"{_fmt(s['phases_s'][p]):>10}" for p in PHASES))
+
+    if not baseline:
+        return
+    print()
+    print(f"vs baseline {baseline.get('timestamp', '')} (time to jailbreak, median)")
+    for name, result in report["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        new_v = result["summary"]["time_to_jailbreak_s"]["median"]
+        old_v = old["summary"]["time_to_jailbreak_s"]["median"] if old else None
+        if new_v is None or old_v is None:
+            print(f"  {name:<18} -")
+            continue
+        print(f"  {name:<18}{old_v:>8.1f} -> {new_v:>6.1f} s  ({new_v - old_v:+.1f} s, "
+              f"{(new_v - old_v) / old_v * 100:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="autoRain end-to-end time-to-jailbreak benchmark")
+    parser.add_argument("--scenarios", default=DEFAULT_SCENARIOS,
+                        help=f"comma separated, from: {', '.join(simulator.SCENARIOS)}")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per scenario")
+    parser.add_argument("--scale", type=float, default=simulator.DEFAULT_SCALE,
+                        help="virtual seconds per real second")
+    parser.add_argument("--limit", type=float, default=900.0, help="virtual seconds per run before giving up")
+    parser.add_argument("--json", metavar="PATH", help="write results as JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="earlier --json results to compare against")
+    parser.add_argument("--set", action="append", default=[], metavar="SECTION.KEY=VALUE",
+                        help="config override passed to the simulator; repeatable")
+    args = parser.parse_args()
+
+    report = {
+        "benchmark": "end_to_end",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": platform.node(),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "scale": args.scale,
+        "repeat": args.repeat,
+        "overrides": args.set,
+        "scenarios": {},
+    }
+    for name in args.scenarios.split(","):
+        if name not in simulator.SCENARIOS:
+            parser.error(f"unknown scenario {name}")
+        report["scenarios"][name] = bench_scenario(name, args.repeat, args.scale, args.limit, args.set)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
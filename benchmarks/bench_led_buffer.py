@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: led_buffer.ColorBuffer vs the old dict + threading.Lock targets.
+
+Measures, for each implementation:
+  update    - set_led() calls per second from one writer
+  read      - single-channel reads per second from one reader (PWM hot path)
+  contended - total reads per second from 9 reader threads (one per PWM pin)
+              while a writer updates at full speed, plus writer throughput
+
+Usage:
+  python3 benchmarks/bench_led_buffer.py [--seconds 1.0] [--json results.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from led_buffer import ColorBuffer, channel_index
+
+PINS = [(led_id, key) for led_id in (1, 2, 3) for key in ('r', 'g', 'b')]
+
+
+# ================= IMPLEMENTATIONS =================
+
+class DictLockTargets:
+    """The original led_controller state: nested dict guarded by one lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._targets = {i: {'r': 0, 'g': 0, 'b': 0} for i in (1, 2, 3)}
+
+    def set_led(self, led_id, r, g, b):
+        with self._lock:
+            self._targets[led_id]['r'] = max(0, min(255, int(r)))
+            self._targets[led_id]['g'] = max(0, min(255, int(g)))
+            self._targets[led_id]['b'] = max(0, min(255, int(b)))
+
+    def reader(self, led_id, key):
+        def read():
+            with self._lock:
+                return self._targets[led_id][key]
+        return read
+
+
+class SeqlockTargets:
+    """led_buffer.ColorBuffer wrapped in the same interface."""
+
+    def __init__(self):
+        self._buffer = ColorBuffer()
+
+    def set_led(self, led_id, r, g, b):
+        self._buffer.write_led(led_id, r, g, b)
+
+    def reader(self, led_id, key):
+        index = channel_index(led_id, key)
+        channel = self._buffer.channel
+
+        def read():
+            return channel(index)
+        return read
+
+
+IMPLEMENTATIONS = {
+    "dict+lock": DictLockTargets,
+    "seqlock": SeqlockTargets,
+}
+
+
+# ================= MEASUREMENTS =================
+
+def bench_update(impl, seconds):
+    n = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for i in range(100):
+            impl.set_led(1 + i % 3, i, 255 - i, i * 2)
+        n += 100
+    return n / seconds
+
+
+def bench_read(impl, seconds):
+    read = impl.reader(2, 'g')
+    n = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            read()
+        n += 100
+    return n / seconds
+
+
+def bench_contended(impl, seconds):
+    stop = threading.Event()
+    reads = [0] * len(PINS)
+    writes = [0]
+
+    def reader_loop(slot, read):
+        n = 0
+        while not stop.is_set():
+            for _ in range(50):
+                read()
+            n += 50
+        reads[slot] = n
+
+    def writer_loop():
+        n = 0
+        while not stop.is_set():
+            impl.set_led(1 + n % 3, n & 255, 0, 255 - (n & 255))
+            n += 1
+        writes[0] = n
+
+    threads = [
+        threading.Thread(target=reader_loop, args=(slot, impl.reader(led_id, key)))
+        for slot, (led_id, key) in enumerate(PINS)
+    ]
+    threads.append(threading.Thread(target=writer_loop))
+
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    return sum(reads) / seconds, writes[0] / seconds
+
+
+def run(seconds):
+    results = {}
+    for name, factory in IMPLEMENTATIONS.items():
+        reads, writes = bench_contended(factory(), seconds)
+        results[name] = {
+            "update_ops_per_s": bench_update(factory(), seconds),
+            "read_ops_per_s": bench_read(factory(), seconds),
+            "contended_read_ops_per_s": reads,
+            "contended_write_ops_per_s": writes,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=1.0, help="duration of each measurement")
+    parser.add_argument("--json", metavar="PATH", help="also write results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.seconds)
+
+    print(f"{'impl':<12}{'update/s':>14}{'read/s':>14}{'cont. read/s':>16}{'cont. write/s':>16}")
+    for name, r in results.items():
+        print(f"{name:<12}{r['update_ops_per_s']:>14,.0f}{r['read_ops_per_s']:>14,.0f}"
+              f"{r['contended_read_ops_per_s']:>16,.0f}{r['contended_write_ops_per_s']:>16,.0f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "led_buffer", "seconds": args.seconds, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Latency of LED stage transitions as seen by the caller.
+
+Calls every led_controller stage function the way autoRain does, once
+directly (inline on the caller's thread) and once through post() (the
+command queue behind autoRain.led_call), and reports caller-side latency
+percentiles. Logging goes to a handler that sleeps per record to stand in
+for the synchronous SD-card log file.
+
+Exits non-zero if the post() p99 exceeds --limit-ms (default 1 ms), so it
+can gate changes.
+
+Usage:
+  python3 benchmarks/bench_led_call.py [--rounds 200] [--log-delay-ms 2] [--json out.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("AUTORAIN_GPIO_BACKEND", "recorder")
+
+import led_controller as led
+
+STAGES = [
+    "boot_starting", "boot_bt_waiting", "boot_bt_connected", "boot_ready",
+    "palera1n_waiting", "palera1n_device_detected", "palera1n_dfu_step1",
+    "palera1n_dfu_step2", "palera1n_booting", "palera1n_complete", "palera1n_error",
+]
+
+
+class SlowHandler(logging.Handler):
+    """Log handler that blocks like a synchronous write to a slow card."""
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+
+    def emit(self, record):
+        time.sleep(self.delay)
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda pct: samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+    return {
+        "p50_ms": round(pick(50) * 1000, 4),
+        "p99_ms": round(pick(99) * 1000, 4),
+        "max_ms": round(samples[-1] * 1000, 4),
+    }
+
+
+def measure(call, rounds):
+    samples = []
+    for i in range(rounds):
+        name = STAGES[i % len(STAGES)]
+        start = time.perf_counter()
+        call(name)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LED stage call latency")
+    parser.add_argument("--rounds", type=int, default=200, help="calls per mode")
+    parser.add_argument("--log-delay-ms", type=float, default=2.0, help="simulated log write time")
+    parser.add_argument("--limit-ms", type=float, default=1.0, help="p99 budget for post()")
+    parser.add_argument("--json", metavar="PATH", help="write results as JSON")
+    args = parser.parse_args()
+
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(SlowHandler(args.log_delay_ms / 1000))
+
+    led.start_pwm()
+
+    direct = measure(lambda name: getattr(led, name)(), max(1, args.rounds // 10))
+    queued = measure(led.post, args.rounds)
+    led.flush(timeout=30)
+
+    results = {
+        "direct": _percentiles(direct),
+        "post": _percentiles(queued),
+        "coalesced": led._coalesced,
+        "limit_ms": args.limit_ms,
+    }
+
+    for mode in ("direct", "post"):
+        r = results[mode]
+        print(f"{mode:<8} p50 {r['p50_ms']:8.3f} ms   p99 {r['p99_ms']:8.3f} ms   max {r['max_ms']:8.3f} ms")
+    print(f"coalesced stage commands: {results['coalesced']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "led_call", "results": results}, f, indent=2)
+
+    led.cleanup()
+
+    if results["post"]["p99_ms"] >= args.limit_ms:
+        print(f"FAIL: post() p99 {results['post']['p99_ms']} ms >= {args.limit_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Prompt start latency with and without the Bluetooth sink keep-warm.
+
+Runs autoRain.main() through simulator.py once per keep-warm mode
+(audio.keep_warm = off, stream, suspend) and scenario, each run in a fresh
+process. The simulated sink suspends after sink.suspend_after idle seconds
+and a prompt started on a suspended sink loses its first sink.resume
+seconds (the clipped first syllable); the fake mpg123 records that per
+prompt in calls.jsonl.
+
+Per mode it reports how many prompts started on a cold sink and the
+audible start latency (mpg123 start until the first sample is heard) per
+prompt. All times are virtual seconds.
+
+Usage:
+  python3 benchmarks/bench_prompt_latency.py [--modes off,stream] [--scenarios fast_dfu,missed_dfu]
+                                             [--repeat 3] [--scale 20] [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import simulator
+
+DEFAULT_MODES = "off,stream,suspend"
+DEFAULT_SCENARIOS = "fast_dfu,missed_dfu"
+
+
+def run_once(scenario, mode, scale, limit):
+    """One simulator run in a fresh process; returns its results dict."""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        out = f.name
+    try:
+        subprocess.run(
+            [sys.executable, os.path.join(ROOT, "simulator.py"), "run",
+             "--scenario", scenario, "--scale", str(scale), "--limit", str(limit), "--json", out,
+             "--set", f"audio.keep_warm={mode}"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            timeout=limit / scale + 60,
+        )
+        with open(out) as f:
+            return json.load(f)
+    except (subprocess.TimeoutExpired, ValueError, OSError):
+        return {"outcome": "crashed", "calls": [], "total_s": None}
+    finally:
+        os.remove(out)
+
+
+def prompts(results):
+    """(prompt, audible start latency) for each mpg123 call of a run."""
+    return [(os.path.basename(c["args"][-1]), c.get("clipped", 0.0))
+            for c in results.get("calls", []) if c["tool"] == "mpg123"]
+
+
+def bench(mode, scenarios, repeat, scale, limit):
+    played = []
+    outcomes = []
+    for scenario in scenarios:
+        for _ in range(repeat):
+            results = run_once(scenario, mode, scale, limit)
+            outcomes.append(results["outcome"])
+            played.extend(prompts(results))
+
+    per_prompt = {}
+    for name, delay in played:
+        per_prompt.setdefault(name, []).append(delay)
+    delays = [d for _, d in played]
+    return {
+        "runs": len(outcomes),
+        "success": outcomes.count("success"),
+        "prompts": len(played),
+        "cold_starts": sum(d > 0 for d in delays),
+        "latency_mean_s": round(statistics.mean(delays), 3) if delays else None,
+        "latency_max_s": max(delays) if delays else None,
+        "per_prompt_mean_s": {k: round(statistics.mean(v), 3) for k, v in sorted(per_prompt.items())},
+    }
+
+
+def _fmt(v):
+    return "-" if v is None else f"{v:.2f}"
+
+
+def print_report(report):
+    names = sorted({p for r in report["modes"].values() for p in r["per_prompt_mean_s"]})
+    print(f"{'mode':<9}{'ok':>7}{'prompts':>9}{'cold':>6}{'mean':>7}{'max':>6}  "
+          + "".join(f"{n.rsplit('.', 1)[0]:>10}" for n in names))
+    for mode, r in report["modes"].items():
+        print(f"{mode:<9}{r['success']:>4}/{r['runs']:<2}{r['prompts']:>9}{r['cold_starts']:>6}"
+              f"{_fmt(r['latency_mean_s']):>7}{_fmt(r['latency_max_s']):>6}  "
+              + "".join(f"{_fmt(r['per_prompt_mean_s'].get(n)):>10}" for n in names))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="autoRain prompt start latency vs sink keep-warm")
+    parser.add_argument("--modes", default=DEFAULT_MODES, help="comma separated audio.keep_warm values")
+    parser.add_argument("--scenarios", default=DEFAULT_SCENARIOS,
+                        help=f"comma separated, from: {', '.join(simulator.SCENARIOS)}")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per scenario and mode")
+    parser.add_argument("--scale", type=float, default=simulator.DEFAULT_SCALE,
+                        help="virtual seconds per real second")
+    parser.add_argument("--limit", type=float, default=900.0, help="virtual seconds per run before giving up")
+    parser.add_argument("--json", metavar="PATH", help="write results as JSON")
+    args = parser.parse_args()
+
+    scenarios = args.scenarios.split(",")
+    for name in scenarios:
+        if name not in simulator.SCENARIOS:
+            parser.error(f"unknown scenario {name}")
+
+    report = {
+        "benchmark": "prompt_latency",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": platform.node(),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "scale": args.scale,
+        "repeat": args.repeat,
+        "scenarios": scenarios,
+        "sink": simulator.SINK,
+        "modes": {},
+    }
+    for mode in args.modes.split(","):
+        report["modes"][mode] = bench(mode, scenarios, args.repeat, args.scale, args.limit)
+
+    print(f"audible start latency per prompt, sink suspends after {simulator.SINK['suspend_after']:g} s idle")
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
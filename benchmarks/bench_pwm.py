@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+PWM accuracy benchmark for led_controller.
+
+Runs each PWM engine against gpio_backend's in-memory "recorder" backend,
+which timestamps every set_values() call with time.monotonic_ns(), then reconstructs each pin's
+waveform and reports:
+  frequency  - achieved PWM frequency per pin (from rising edges)
+  duty error - achieved duty minus requested duty, per requested value
+  jitter     - percentiles of |period - median period| in microseconds
+  cpu        - CPU time of the PWM threads as a percentage of one core
+
+Each engine runs under two load conditions: idle, and a thread forking
+short-lived subprocesses back to back (what autoRain does when it calls
+bluetoothctl / pactl / mpg123 while LEDs animate).
+
+Usage:
+  python3 benchmarks/bench_pwm.py [--seconds 2] [--engines threads,frame] [--json report.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gpio_backend
+import led_controller as led
+
+# Requested duty per channel, LED1 RGB, LED2 RGB, LED3 RGB
+TEST_VALUES = [16, 32, 64, 96, 128, 160, 192, 224, 250]
+
+
+# ================= LOAD =================
+
+def _fork_load(stop):
+    while not stop.is_set():
+        subprocess.run(["true"])
+
+
+# ================= ANALYSIS =================
+
+def _thread_cpu_seconds(threads):
+    """User + system CPU of the given threads, from /proc."""
+    ticks = os.sysconf("SC_CLK_TCK")
+    total = 0
+    for t in threads:
+        try:
+            with open(f"/proc/self/task/{t.native_id}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            total += int(fields[11]) + int(fields[12])
+        except (OSError, IndexError, TypeError):
+            pass
+    return total / ticks
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def analyze_pin(events, start_ns, end_ns):
+    """Duty, frequency and period deviations for one pin's (t, active) events."""
+    state = False
+    last_t = start_ns
+    high_ns = 0
+    rising = []
+
+    for t, active in events:
+        if t < start_ns or t > end_ns:
+            if t < start_ns:
+                state = active
+            continue
+        if state:
+            high_ns += t - last_t
+        if active and not state:
+            rising.append(t)
+        state = active
+        last_t = t
+
+    if state:
+        high_ns += end_ns - last_t
+
+    periods = [b - a for a, b in zip(rising, rising[1:])]
+    median = statistics.median(periods) if periods else None
+    deviations_us = [abs(p - median) / 1000 for p in periods] if periods else []
+
+    return {
+        "duty": high_ns / (end_ns - start_ns),
+        "frequency_hz": 1e9 / median if median else 0.0,
+        "deviations_us": deviations_us,
+    }
+
+
+def run_case(engine, load, seconds, warmup=0.2):
+    led.GPIO_BACKEND = "recorder"
+    # Keep every write of the run (the recorder drops the oldest ones)
+    gpio_backend.MAX_EVENTS = max(gpio_backend.MAX_EVENTS, int((warmup + seconds + 1) * 50000))
+    led._buffer.write_all(TEST_VALUES)
+
+    stop_load = threading.Event()
+    loader = None
+    if load == "fork":
+        loader = threading.Thread(target=_fork_load, args=(stop_load,), daemon=True)
+        loader.start()
+
+    led.start_pwm(engine)
+    lines = led._lines
+    time.sleep(warmup)
+
+    start_ns = time.monotonic_ns()
+    cpu_start = _thread_cpu_seconds(led._pwm_threads)
+    time.sleep(seconds)
+    cpu_end = _thread_cpu_seconds(led._pwm_threads)
+    end_ns = time.monotonic_ns()
+
+    led._running = False
+    for t in led._pwm_threads:
+        t.join(timeout=1.0)
+    led._cleanup_gpio()
+    stop_load.set()
+    if loader:
+        loader.join(timeout=5.0)
+
+    per_pin = {}
+    for t, pin, active in lines.events:
+        per_pin.setdefault(pin, []).append((t, active))
+
+    pins = []
+    deviations = []
+    for (led_id, pin, key), requested in zip(led.LED_PINS, TEST_VALUES):
+        stats = analyze_pin(per_pin.get(pin, []), start_ns, end_ns)
+        deviations.extend(stats["deviations_us"])
+        target = requested / 255
+        pins.append({
+            "led": led_id,
+            "color": key,
+            "pin": pin,
+            "requested_value": requested,
+            "requested_duty": round(target, 4),
+            "achieved_duty": round(stats["duty"], 4),
+            "duty_error": round(stats["duty"] - target, 4),
+            "frequency_hz": round(stats["frequency_hz"], 1),
+        })
+
+    wall = (end_ns - start_ns) / 1e9
+    return {
+        "engine": engine,
+        "load": load,
+        "seconds": round(wall, 3),
+        "set_values_calls": lines.calls,
+        "frequency_hz_mean": round(statistics.mean(p["frequency_hz"] for p in pins), 1),
+        "duty_error_abs_mean": round(statistics.mean(abs(p["duty_error"]) for p in pins), 4),
+        "duty_error_abs_max": round(max(abs(p["duty_error"]) for p in pins), 4),
+        "jitter_us": {
+            f"p{pct}": round(_percentile(deviations, pct) or 0.0, 1)
+            for pct in (50, 90, 99)
+        } | {"max": round(max(deviations, default=0.0), 1)},
+        "cpu_percent": round(100 * (cpu_end - cpu_start) / wall, 1),
+        "pins": pins,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="led_controller PWM accuracy benchmark")
+    parser.add_argument("--seconds", type=float, default=2.0, help="measurement window per case")
+    parser.add_argument("--engines", default="threads,frame", help="comma separated engine names")
+    parser.add_argument("--loads", default="idle,fork", help="comma separated load conditions")
+    parser.add_argument("--json", metavar="PATH", help="write the machine-readable report here")
+    args = parser.parse_args()
+
+    results = []
+    for engine in args.engines.split(","):
+        for load in args.loads.split(","):
+            results.append(run_case(engine, load, args.seconds))
+
+    print(f"{'engine':<9}{'load':<6}{'freq Hz':>9}{'|err| mean':>12}{'|err| max':>11}"
+          f"{'p50 us':>8}{'p99 us':>8}{'cpu %':>7}")
+    for r in results:
+        print(f"{r['engine']:<9}{r['load']:<6}{r['frequency_hz_mean']:>9.1f}"
+              f"{r['duty_error_abs_mean']:>12.4f}{r['duty_error_abs_max']:>11.4f}"
+              f"{r['jitter_us']['p50']:>8.1f}{r['jitter_us']['p99']:>8.1f}{r['cpu_percent']:>7.1f}")
+
+    if args.json:
+        report = {
+            "benchmark": "pwm",
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "host": platform.node(),
+            "machine": platform.machine(),
+            "python": platform.python_version(),
+            "pwm_period_s": led.PWM_PERIOD,
+            "results": results,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Persistent bluetoothctl session for autoRain
+
+Every `bluetoothctl info|connect|disconnect MAC` used to be a new process
+that set up its D-Bus connection, registered an agent and loaded the
+device list before doing anything, many times per boot. BtSession keeps
+one interactive bluetoothctl under pexpect instead:
+
+  - a reader thread parses everything bluetoothctl prints, including the
+    asynchronous "[CHG] Device MAC Connected: yes|no" events, so
+    is_connected() is answered from that state without a round trip
+  - commands are sent one at a time (a lock) and each waits for the lines
+    that end it ("Connection successful", "Failed to connect", ...)
+  - a command that timed out still owns the ending line bluetoothctl
+    prints for it later, so that line cannot end the next command
+
+Same answers as the one-shot commands: is_connected(mac) -> bool,
+connect(mac) -> (ok, output), disconnect(mac) -> bool. A session whose
+bluetoothctl died (bluetoothd restart) reports alive == False; the caller
+opens a new one.
+
+Run `python3 bt_session.py MAC` to print connection events as they come.
+"""
+
+import logging
+import re
+import threading
+import time
+
+import pexpect
+
+log = logging.getLogger("autorain.bt")
+
+READ_POLL = 0.5      # seconds; how often the reader re-checks for close()
+START_TIMEOUT = 5.0  # seconds for bluetoothctl to print its first prompt
+LATE_REPLY_TTL = 60.0  # seconds a timed-out command's ending line is still expected
+
+# Terminal noise around bluetoothctl's readline prompt, and the prompt itself
+_NOISE = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]|[\x01\x02\r]")
+_PROMPT = re.compile(r"^(\[[^\]]*\]# ?)+")
+_CHG_CONNECTED = re.compile(r"\[CHG\] Device ([0-9A-Fa-f:]{17}) Connected: (yes|no)")
+
+# command -> [(pattern, result)]; the first match ends the command
+_ENDINGS = {
+    "info": [(r"^Connected: yes", True), (r"^Connected: no", False), (r"not available", False)],
+    "connect": [(r"Connection successful", True), (r"already ?connected", True),
+                (r"Failed to connect", False), (r"not available", False)],
+    "disconnect": [(r"Successful disconnected", True), (r"Failed to disconnect", False),
+                   (r"not available", False)],
+}
+
+
+class BtSession:
+    """One long-lived interactive bluetoothctl (see module docstring)."""
+
+    def __init__(self, command="bluetoothctl"):
+        self._cmd_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._connected = {}  # MAC -> bool, from info replies and [CHG] events
+        self._waiter = None   # (endings, result list, output lines) of the running command
+        self._late = []       # (expires, command, mac, endings) of commands that timed out
+        self._closing = False
+        self.alive = True
+        self.events = 0       # [CHG] Connected events seen
+        self._child = pexpect.spawn(command, encoding="utf-8", codec_errors="replace", timeout=None)
+        self._child.delaybeforesend = None  # pexpect's default 50 ms pause per command
+        try:
+            # The prompt shows once bluetoothctl is connected to bluetoothd
+            self._child.expect(r"\]# ", timeout=START_TIMEOUT)
+        except pexpect.ExceptionPexpect:
+            self._child.close(force=True)
+            raise
+        self._thread = threading.Thread(target=self._read, daemon=True, name="bt-session")
+        self._thread.start()
+        log.info(f"[bt] bluetoothctl session started (pid {self._child.pid})")
+
+    # ---- commands ----
+
+    def is_connected(self, mac, timeout=10.0):
+        """Connection state; asks bluetoothctl only until an answer or event is known."""
+        mac = mac.upper()
+        with self._cond:
+            if mac in self._connected:
+                return self._connected[mac]
+        ok, _ = self._run("info", mac, timeout)
+        return bool(ok)
+
+    def connect(self, mac, timeout=8.0):
+        """Connect; returns (ok, output). ok is None if it timed out."""
+        return self._run("connect", mac, timeout)
+
+    def disconnect(self, mac, timeout=3.0):
+        ok, _ = self._run("disconnect", mac, timeout)
+        return bool(ok)
+
+    def close(self):
+        with self._cond:
+            self._closing = True
+            self.alive = False
+            self._cond.notify_all()
+        try:
+            self._child.sendline("quit")
+            self._child.expect(pexpect.EOF, timeout=1)
+        except (pexpect.ExceptionPexpect, OSError):
+            pass
+        self._child.close(force=True)
+
+    def _run(self, command, mac, timeout):
+        mac = mac.upper()
+        endings = [(re.compile(p, re.I), result) for p, result in _ENDINGS[command]]
+        with self._cmd_lock:
+            with self._cond:
+                if not self.alive:
+                    raise EOFError("bluetoothctl session is closed")
+                waiter = (endings, [], [])
+                self._waiter = waiter
+            try:
+                self._child.sendline(f"{command} {mac}")
+                with self._cond:
+                    self._cond.wait_for(lambda: waiter[1] or not self.alive, timeout)
+            finally:
+                with self._cond:
+                    self._waiter = None
+                    if not waiter[1] and self.alive:
+                        self._late.append((time.monotonic() + LATE_REPLY_TTL, command, mac, endings))
+        if not waiter[1] and not self.alive:
+            raise EOFError("bluetoothctl exited")
+        ok = waiter[1][0] if waiter[1] else None
+        with self._cond:
+            self._record(command, mac, ok)
+        return ok, "\n".join(waiter[2])
+
+    def _record(self, command, mac, ok):
+        """Connection state from a command's result (call with _cond held)."""
+        if ok is not None and (command == "info" or ok):
+            # A successful disconnect means not connected
+            self._connected[mac] = ok if command != "disconnect" else False
+
+    # ---- reader thread ----
+
+    def _read(self):
+        while True:
+            try:
+                self._child.expect(r"\n", timeout=READ_POLL)
+            except pexpect.TIMEOUT:
+                if self._closing:
+                    return
+                continue
+            except (pexpect.EOF, OSError):
+                with self._cond:
+                    if not self._closing:
+                        log.warning("[bt] bluetoothctl session ended")
+                    self.alive = False
+                    self._cond.notify_all()
+                return
+            self._line(_PROMPT.sub("", _NOISE.sub("", self._child.before)).strip())
+
+    def _line(self, line):
+        if not line:
+            return
+        with self._cond:
+            m = _CHG_CONNECTED.search(line)
+            if m:
+                self.events += 1
+                self._connected[m.group(1).upper()] = m.group(2) == "yes"
+            if self._late and self._late_reply(line):
+                return
+            waiter = self._waiter
+            if waiter is None or waiter[1]:
+                return
+            waiter[2].append(line)
+            for pattern, result in waiter[0]:
+                if pattern.search(line):
+                    waiter[1].append(result)
+                    self._cond.notify_all()
+                    return
+
+    def _late_reply(self, line):
+        """Hand `line` to the oldest timed-out command it ends; True if one took it."""
+        now = time.monotonic()
+        self._late = [late for late in self._late if late[0] > now]
+        for i, (_, command, mac, endings) in enumerate(self._late):
+            for pattern, result in endings:
+                if pattern.search(line):
+                    del self._late[i]
+                    log.debug(f"[bt] Late reply to {command} {mac}: {line}")
+                    self._record(command, mac, result)
+                    return True
+        return False
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
+    if len(sys.argv) != 2:
+        print("usage: bt_session.py MAC", file=sys.stderr)
+        sys.exit(2)
+    session = BtSession()
+    seen = None
+    try:
+        while session.alive:
+            state = session.is_connected(sys.argv[1])
+            if state != seen:
+                print(f"{time.strftime('%H:%M:%S')} connected: {'yes' if state else 'no'}")
+                seen = state
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        session.close()
@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+Configuration for autoRain - one validated config file for every tool
+
+load() starts from DEFAULTS, merges the first config file found (TOML or
+JSON), applies environment overrides, validates the result and does the
+filesystem probing (audio directory) exactly once. autoRain, led_controller
+and the shell scripts all read the same file, so timings can be tuned per
+box without editing code.
+
+Search order (first existing file wins, missing = built-in defaults):
+  $AUTORAIN_CONFIG, /etc/autorain.toml, /home/orangepi/autorain.toml,
+  <script dir>/configs/autorain.toml
+
+Settings are grouped in sections and read as attributes:
+
+    cfg = config.load()
+    cfg.bluetooth.mac, cfg.palera1n.max_retries, cfg.prompt("ready")
+
+Command line (shell scripts use `shell`):
+  python3 config.py check [FILE]          validate, exit 1 on errors
+  python3 config.py show [FILE]           effective config as TOML
+  python3 config.py get SECTION.KEY       one value
+  python3 config.py shell [SECTION ...]   AUTORAIN_SECTION_KEY=value lines for eval
+"""
+
+import copy
+import json
+import os
+import re
+import shlex
+import sys
+
+CONFIG_ENV = "AUTORAIN_CONFIG"
+
+SEARCH_PATHS = [
+    "/etc/autorain.toml",
+    "/home/orangepi/autorain.toml",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "configs", "autorain.toml"),
+]
+
+DEFAULTS = {
+    "logging": {
+        "file": "/home/orangepi/autoRain.log",  # JSON lines, view with: python3 event_log.py
+        "max_bytes": 1_000_000,
+        "backups": 3,
+        "buffer_seconds": 5.0,  # batch SD-card writes; 0 = write each record
+    },
+    "system": {
+        "pidfile": "/tmp/autorain.pid",  # flock'd while running; also checked by .bash_profile
+        "control_socket": "/tmp/autorain.sock",  # `autoRain.py ctl ...`
+    },
+    "environment": {
+        "path_prefix": "/usr/sbin:/sbin:/usr/local/sbin:/home/orangepi",
+        "pulse_server": "unix:/run/user/1000/pulse/native",
+    },
+    "bluetooth": {
+        "mac": "11:81:AA:11:88:72",
+        "extra_macs": [],            # more speakers, raced against mac (connects only, no power button)
+        "timeout": 60.0,             # Max seconds to wait for BT per round
+        "session": True,             # one interactive bluetoothctl for all commands (bt_session.py)
+        "retry_pause": 5.0,          # between rounds when the speaker never came up
+        "power_backend": "gpiod",    # speaker_power.py gpio backend, or "script" for power_script
+        "power_script": "/usr/local/bin/speaker-power.sh",
+        "power_chip": "gpiochip1",   # speaker power button (speaker_power.py / .sh)
+        "power_line": 79,
+        "power_hold": 3.0,           # seconds the button is held low
+        "power_probe": 3.0,          # connect probe before pressing (the button toggles); 0 = off
+        "power_timeout": 10.0,
+        "power_boot_wait": 3.0,      # after the power toggle
+        "boot_settle": 2.0,          # extra wait before the first connect
+        "connect_attempts": 4,       # connects per power cycle
+        "connect_timeout": 8.0,
+        "connect_settle": 1.0,       # after connect, before checking
+        "disconnect_timeout": 3.0,
+        "disconnect_settle": 0.5,
+        "cycle_pause": 1.0,          # after a failed power cycle
+        "info_timeout": 10.0,
+    },
+    "audio": {
+        "dir": "/home/orangepi/autoRain/audio/sounds",
+        "fallback_dir": "/home/orangepi",
+        "ready": "ready.mp3",
+        "step1": "step1.mp3",
+        "step2": "step2.mp3",
+        "finish": "complete.mp3",
+        "retry": "retry.mp3",
+        "shutdown": "shutdown.mp3",
+        "volume": "2%",
+        "volume_timeout": 2.0,
+        "max_play": 30.0,            # kill mpg123 after this many seconds
+        "keep_warm": "stream",       # keep the BT sink awake in a session: off, stream, suspend
+        "keep_warm_idle": 300.0,     # release the sink after this long without activity
+        "sink_deadline": 45.0,       # go on LED-only if no output is ready by then; 0 = wait forever
+        "wired": True,               # race the headphone jack against the speakers
+        "wired_sink": "alsa_output", # part of the wired sink's name (pactl list short sinks)
+        "jack_glob": "/sys/class/sound/card*/*jack*/status",
+    },
+    "palera1n": {
+        "cmd": "sudo palera1n -l",
+        "max_retries": 3,
+        "expect_timeout": 300.0,     # deadline: waiting for a device
+        "resume_timeout": 60.0,      # same, on a retry with the device already in recovery
+        "normal_deadline": 120.0,    # normal mode until recovery
+        "recovery_deadline": 60.0,   # recovery until the DFU prompt
+        "dfu_deadline": 90.0,        # DFU prompt until PongoOS / kernel boot
+        "idle_timeout": 45.0,        # no output at all during recovery/DFU = stalled
+        "watchdog_poll": 1.0,        # how often deadlines are checked
+        "escalation": ["retry", "usbmuxd", "reset"],  # per consecutive watchdog fire
+        "ready_hold": 2.5,           # minimum time the ready prompt occupies
+        "step1_hold": 5.0,           # hold buttons (DFU step 1)
+        "step2_hold": 10.0,          # release power, keep holding (DFU step 2)
+    },
+    "usbmuxd": {
+        "cmd": "sudo /usr/sbin/usbmuxd -f -p -v",
+        "log": "/home/orangepi/autorain-usbmuxd.txt",
+        "socket": "/var/run/usbmuxd",
+        "stop_settle": 0.5,
+        "socket_wait": 2.0,
+    },
+    "leds": {
+        "chip": "/dev/gpiochip1",
+        "backend": "gpiod",          # gpiod, sim or recorder
+        "led1": [232, 75, 71],       # R, G, B lines; LED1 closest to eth0
+        "led2": [230, 74, 233],
+        "led3": [69, 73, 72],
+        "pwm_period": 0.001,
+        "pwm_engine": "threads",     # threads or frame
+        "frame_rate": 50,
+        "fade": 0.25,
+    },
+    "history": {
+        "db": "/home/orangepi/autoRain-history.db",  # report: autoRain.py stats
+    },
+    "metrics": {
+        "port": 0,  # Prometheus exporter (curl http://<box>:PORT/metrics), 0 = off
+    },
+    "status": {
+        "port": 8080,  # live status page, proxied by nginx on the hotspot; 0 = off
+        "addr": "127.0.0.1",
+    },
+    "profiler": {
+        "interval": 0.005,  # toggled with: kill -USR1 <pid>
+        "dir": "/tmp",
+    },
+}
+
+# Environment variable -> (section, key)
+ENV_OVERRIDES = {
+    "AUTORAIN_METRICS_PORT": ("metrics", "port"),
+    "AUTORAIN_GPIO_BACKEND": ("leds", "backend"),
+}
+
+
+class ConfigError(ValueError):
+    """Invalid config file or value; the message lists every problem."""
+
+
+# ================= VALIDATION =================
+
+def _pins(value):
+    if len(value) != 3 or not all(isinstance(p, int) and p >= 0 for p in value):
+        return "expected [R, G, B] line numbers"
+
+
+def _one_of(*choices):
+    return lambda value: None if value in choices else f"expected one of {', '.join(choices)}"
+
+
+def _match(pattern, what):
+    return lambda value: None if re.fullmatch(pattern, value) else f"expected {what}"
+
+
+def _each_of(*choices):
+    def check(value):
+        if not value or any(v not in choices for v in value):
+            return f"expected a list of {', '.join(choices)}"
+    return check
+
+
+def _each_match(pattern, what):
+    def check(value):
+        if any(not isinstance(v, str) or not re.fullmatch(pattern, v) for v in value):
+            return f"expected a list of {what}"
+    return check
+
+
+def _range(lo, hi=None):
+    def check(value):
+        if value < lo or (hi is not None and value > hi):
+            return f"expected {lo}..{hi}" if hi is not None else f"expected >= {lo}"
+    return check
+
+
+_MAC = r"([0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2}"
+
+# Extra checks on top of the type of the default; numbers are >= 0 unless listed
+CHECKS = {
+    ("bluetooth", "mac"): _match(_MAC, "a MAC address"),
+    ("bluetooth", "extra_macs"): _each_match(_MAC, "MAC addresses"),
+    ("bluetooth", "connect_attempts"): _range(1),
+    ("audio", "volume"): _match(r"\d+%", "a percentage like 2%"),
+    ("audio", "keep_warm"): _one_of("off", "stream", "suspend"),
+    ("palera1n", "watchdog_poll"): _range(0.001, 10),
+    ("palera1n", "escalation"): _each_of("retry", "usbmuxd", "reset"),
+    ("leds", "backend"): _one_of("gpiod", "sim", "recorder"),
+    ("leds", "led1"): _pins,
+    ("leds", "led2"): _pins,
+    ("leds", "led3"): _pins,
+    ("leds", "pwm_engine"): _one_of("threads", "frame"),
+    ("leds", "pwm_period"): _range(0.0001, 0.1),
+    ("leds", "frame_rate"): _range(1, 200),
+    ("metrics", "port"): _range(0, 65535),
+    ("status", "port"): _range(0, 65535),
+    ("profiler", "interval"): _range(0.0005, 1),
+}
+
+
+def _check_value(section, key, value):
+    default = DEFAULTS[section][key]
+    if isinstance(default, bool):
+        ok = isinstance(value, bool)
+    elif isinstance(default, float):
+        ok = isinstance(value, (int, float)) and not isinstance(value, bool)
+        value = float(value) if ok else value
+    elif isinstance(default, int):
+        ok = isinstance(value, int) and not isinstance(value, bool)
+    else:
+        ok = isinstance(value, type(default))
+    if not ok:
+        return value, f"expected {type(default).__name__}, got {type(value).__name__}"
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and value < 0:
+        return value, "must not be negative"
+    check = CHECKS.get((section, key))
+    return value, check(value) if check else None
+
+
+def validate(values, source="config"):
+    """Check a {section: {key: value}} dict against DEFAULTS; returns it normalized."""
+    errors = []
+    out = {}
+    if not isinstance(values, dict):
+        raise ConfigError(f"{source}: expected a table of sections")
+    for section, keys in values.items():
+        if section not in DEFAULTS:
+            errors.append(f"unknown section [{section}]")
+            continue
+        if not isinstance(keys, dict):
+            errors.append(f"[{section}] must be a table")
+            continue
+        for key, value in keys.items():
+            if key not in DEFAULTS[section]:
+                errors.append(f"{section}.{key}: unknown key")
+                continue
+            value, problem = _check_value(section, key, value)
+            if problem:
+                errors.append(f"{section}.{key}: {problem}")
+            else:
+                out.setdefault(section, {})[key] = value
+    if errors:
+        raise ConfigError(f"{source}: " + "; ".join(errors))
+    return out
+
+
+# ================= CONFIG OBJECT =================
+
+class Section:
+    """One config section; keys are attributes."""
+
+    def __init__(self, name, values):
+        self._name = name
+        self.__dict__.update(values)
+
+    def as_dict(self):
+        return {k: v for k, v in vars(self).items() if not k.startswith("_")}
+
+    def __repr__(self):
+        return f"Section({self._name!r}, {self.as_dict()!r})"
+
+
+class Config:
+    """All autoRain settings, one Section per group in DEFAULTS."""
+
+    def __init__(self, values=None, source=None):
+        merged = copy.deepcopy(DEFAULTS)
+        for section, keys in (values or {}).items():
+            merged[section].update(keys)
+        for name, section in merged.items():
+            setattr(self, name, Section(name, section))
+        self.source = source
+
+    def resolve(self):
+        """Probe the filesystem once: fall back to the home dir if the audio dir is missing."""
+        if not os.path.isdir(self.audio.dir):
+            self.audio.dir = self.audio.fallback_dir
+        return self
+
+    def prompt(self, name):
+        """Full path of an audio prompt ("ready", "step1", ...)."""
+        return os.path.join(self.audio.dir, getattr(self.audio, name))
+
+    def as_dict(self):
+        return {name: s.as_dict() for name, s in vars(self).items() if isinstance(s, Section)}
+
+
+# ================= LOADING =================
+
+def find_config(environ=None):
+    """Path of the config file to use, or None for built-in defaults."""
+    env = os.environ if environ is None else environ
+    if env.get(CONFIG_ENV):
+        return env[CONFIG_ENV]
+    for path in SEARCH_PATHS:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def read_file(path):
+    """Parse a TOML or JSON config file into a dict (not validated)."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if path.endswith(".json"):
+        try:
+            return json.loads(data)
+        except ValueError as e:
+            raise ConfigError(f"{path}: {e}")
+    try:
+        import tomllib
+    except ImportError:
+        try:
+            import tomli as tomllib  # Python < 3.11
+        except ImportError:
+            raise ConfigError(f"{path}: TOML needs Python 3.11+ or tomli; use a .json file instead")
+    try:
+        return tomllib.loads(data.decode())
+    except (tomllib.TOMLDecodeError, UnicodeDecodeError) as e:
+        raise ConfigError(f"{path}: {e}")
+
+
+def load(path=None, environ=None):
+    """
+    Build the validated Config for this run.
+
+    Args:
+        path: config file (None = search, see module docstring)
+        environ: environment for overrides (None = os.environ)
+    """
+    env = os.environ if environ is None else environ
+    path = path or find_config(env)
+
+    values = validate(read_file(path), path) if path else {}
+
+    overrides = {}
+    for var, (section, key) in ENV_OVERRIDES.items():
+        if var in env:
+            raw = env[var]
+            default = DEFAULTS[section][key]
+            try:
+                overrides.setdefault(section, {})[key] = type(default)(raw)
+            except ValueError:
+                raise ConfigError(f"{var}={raw!r}: expected {type(default).__name__}")
+    for section, keys in validate(overrides, "environment").items():
+        values.setdefault(section, {}).update(keys)
+
+    return Config(values, source=path).resolve()
+
+
+# ================= OUTPUT =================
+
+def _toml_value(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, list):
+        return "[" + ", ".join(_toml_value(v) for v in value) + "]"
+    return json.dumps(value)
+
+
+def to_toml(cfg):
+    lines = []
+    for section, keys in cfg.as_dict().items():
+        lines.append(f"[{section}]")
+        lines.extend(f"{k} = {_toml_value(v)}" for k, v in keys.items())
+        lines.append("")
+    return "\n".join(lines)
+
+
+def _shell_value(value):
+    if isinstance(value, list):
+        return " ".join(str(v) for v in value)
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    return str(value)
+
+
+def shell_exports(cfg, sections=None):
+    """AUTORAIN_<SECTION>_<KEY>=value lines, safe to eval in bash."""
+    lines = []
+    for section, keys in cfg.as_dict().items():
+        if sections and section not in sections:
+            continue
+        for key, value in keys.items():
+            name = f"AUTORAIN_{section}_{key}".upper()
+            lines.append(f"{name}={shlex.quote(_shell_value(value))}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="config.py", description="autoRain configuration")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("check", "show"):
+        p = sub.add_parser(name)
+        p.add_argument("file", nargs="?")
+    p = sub.add_parser("get")
+    p.add_argument("key", help="SECTION.KEY")
+    p = sub.add_parser("shell")
+    p.add_argument("sections", nargs="*")
+    args = parser.parse_args(argv)
+
+    try:
+        cfg = load(getattr(args, "file", None))
+    except (ConfigError, OSError) as e:
+        print(f"config error: {e}", file=sys.stderr)
+        return 1
+
+    if args.command == "check":
+        print(f"{cfg.source or 'built-in defaults'}: OK")
+    elif args.command == "show":
+        print(to_toml(cfg), end="")
+    elif args.command == "get":
+        section, _, key = args.key.partition(".")
+        try:
+            print(_shell_value(getattr(getattr(cfg, section), key)))
+        except AttributeError:
+            print(f"config error: unknown key {args.key}", file=sys.stderr)
+            return 1
+    elif args.command == "shell":
+        print(shell_exports(cfg, args.sections))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Control socket for autoRain - inspect and nudge the running instance
+
+The running autoRain listens on a UNIX stream socket (system.control_socket).
+Each connection carries one JSON request line and gets one JSON reply line:
+
+    {"cmd": "replay", "args": ["step1"]}   ->   {"ok": true, ...}
+                                            or  {"ok": false, "error": "..."}
+
+The process registers its commands with command(name, func, help); func
+gets the request args and returns a dict merged into the reply. Commands
+run on the server thread, so they must only queue work (LED post, audio
+Popen, setting an Event), never block.
+
+Client:
+
+    autoRain.py ctl status
+    autoRain.py ctl metrics
+    autoRain.py ctl replay step1
+    autoRain.py ctl restart
+    autoRain.py ctl led palera1n_error
+"""
+
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+
+log = logging.getLogger("autorain.control")
+
+MAX_REQUEST = 64 * 1024
+CLIENT_TIMEOUT = 5.0
+
+_commands = {}
+_server = None
+
+
+# ================= SERVER =================
+
+def command(name, func, help=""):
+    """Register a control command."""
+    _commands[name] = (func, help)
+
+
+def _help(*args):
+    return {"commands": {name: help for name, (_, help) in sorted(_commands.items())}}
+
+
+command("help", _help, "list commands")
+
+
+def _dispatch(line):
+    try:
+        request = json.loads(line)
+        name = request["cmd"]
+        args = [str(a) for a in request.get("args", [])]
+    except (ValueError, KeyError, TypeError) as e:
+        return {"ok": False, "error": f"bad request: {e}"}
+    entry = _commands.get(name)
+    if entry is None:
+        return {"ok": False, "error": f"unknown command {name} (try help)"}
+    try:
+        reply = entry[0](*args) or {}
+    except TypeError as e:
+        return {"ok": False, "error": f"{name}: {e}"}
+    except Exception as e:
+        log.warning(f"[control] {name} failed: {e}")
+        return {"ok": False, "error": f"{name} failed: {e}"}
+    reply.setdefault("ok", True)
+    return reply
+
+
+def _read_line(conn):
+    data = b""
+    while b"\n" not in data and len(data) < MAX_REQUEST:
+        chunk = conn.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    return data.split(b"\n", 1)[0].decode("utf-8", "replace")
+
+
+def _serve(sock):
+    while True:
+        try:
+            conn, _ = sock.accept()
+        except OSError:
+            return  # socket closed by stop_server()
+        with conn:
+            try:
+                conn.settimeout(CLIENT_TIMEOUT)
+                reply = _dispatch(_read_line(conn))
+                conn.sendall(json.dumps(reply, default=str).encode() + b"\n")
+            except OSError as e:
+                log.debug(f"[control] Client error: {e}")
+
+
+def start_server(path):
+    """Listen on `path` from a daemon thread (caller must hold the instance lock)."""
+    global _server
+
+    if _server is not None:
+        return _server
+    # A leftover socket file can only be from a dead instance: we hold the lock
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM | socket.SOCK_CLOEXEC)
+    sock.bind(path)
+    os.chmod(path, 0o660)
+    sock.listen(4)
+    _server = (sock, path)
+    threading.Thread(target=_serve, args=(sock,), daemon=True, name="control").start()
+    log.info(f"[control] Listening on {path}")
+    return _server
+
+
+def stop_server():
+    global _server
+
+    if _server is None:
+        return
+    sock, path = _server
+    _server = None
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    sock.close()
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# ================= CLIENT =================
+
+def request(path, cmd, *args, timeout=CLIENT_TIMEOUT):
+    """Send one command to a running instance and return its reply dict."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall(json.dumps({"cmd": cmd, "args": list(args)}).encode() + b"\n")
+        data = b""
+        while not data.endswith(b"\n"):
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    return json.loads(data)
+
+
+def _print_status(reply):
+    print(f"pid {reply['pid']}  up {reply['uptime_s']:.1f}s  config {reply['config']}")
+    print(f"stage {reply['stage']} for {reply['stage_s']:.1f}s")
+    for s in reply.get("stages", []):
+        duration = "-" if s["duration"] is None else f"{s['duration']:.1f}s"
+        print(f"  {s['prev_stage'] or '':<14} -> {s['stage']:<14} {duration:>8}")
+
+
+def main(argv, path):
+    """`autoRain.py ctl CMD [ARGS...]`; exit status 0 if the command succeeded."""
+    if not argv or argv[0] in ("-h", "--help"):
+        print("usage: autoRain.py ctl COMMAND [ARGS...]   (ctl help lists commands)")
+        return 0 if argv else 2
+    try:
+        reply = request(path, *argv)
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(f"autoRain is not running (no listener on {path})", file=sys.stderr)
+        return 1
+    except (OSError, ValueError) as e:
+        print(f"control request failed: {e}", file=sys.stderr)
+        return 1
+
+    if not reply.get("ok"):
+        print(reply.get("error", "failed"), file=sys.stderr)
+        return 1
+    if argv[0] == "status":
+        _print_status(reply)
+    elif argv[0] == "metrics":
+        print(reply["text"], end="")
+    elif argv[0] == "help":
+        for name, help in reply["commands"].items():
+            print(f"  {name:<10} {help}")
+    else:
+        print(json.dumps({k: v for k, v in reply.items() if k != "ok"}) if len(reply) > 1 else "ok")
+    return 0
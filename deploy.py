@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Deploy autoRain to one or many boxes - only what changed
+
+Each box keeps a manifest (MANIFEST_PATH) of the sha256 of every file
+deploy.py installed. A deploy hashes the source tree, compares it with the
+box's manifest and ships only the differing files as one tar stream. On
+the box each file is written to a temp file and renamed into place, then
+only the units whose files changed are restarted (or reloaded), after a
+daemon-reload if a unit file changed. A box that is up to date is not
+touched at all. Files whose unit action failed or was deferred (autoRain
+busy with a device) are left out of the manifest, so the next deploy
+ships them again and retries the action.
+
+    python3 deploy.py pi@box1 pi@box2 docker://box3 --jobs 8
+    python3 deploy.py /tmp/fakebox            # local directory standing in for /
+    python3 deploy.py pi@box1 --dry-run       # show what would change
+    python3 deploy.py pi@box1 --force-restart # restart autoRain even mid-jailbreak
+
+Targets:
+    user@host, ssh://user@host   over ssh, applied with sudo -n
+    docker://container           docker exec, as root
+    /some/dir                    local directory used as the box's /; unit
+                                 actions are appended to <dir>/deploy-actions.log
+                                 instead of calling systemctl ("/" itself runs them)
+"""
+
+import argparse
+import concurrent.futures
+import glob
+import hashlib
+import io
+import json
+import os
+import shlex
+import subprocess
+import sys
+import tarfile
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+MANIFEST_PATH = "/var/lib/autorain/deploy-manifest.json"
+ACTIONS_LOG = "deploy-actions.log"
+
+# autorain.service is not restarted while a device is mid-jailbreak (per
+# `ctl status` on its control socket, config system.control_socket) unless
+# --force-restart is given; the next deploy restarts it
+AUTORAIN_UNIT = "autorain.service"
+CONTROL_SOCKET = "/tmp/autorain.sock"
+BUSY_STAGES = {"normal_mode", "recovery", "dfu", "booting"}
+
+# Modules autoRain.py imports (directly or via led_controller); changing
+# one of these restarts autorain.service
+RUNTIME_MODULES = [
+    "audio_queue.py", "autoRain.py", "bt_session.py", "config.py", "control.py", "event_log.py",
+    "gpio_backend.py", "led_buffer.py", "led_controller.py", "led_timeline.py", "metrics.py",
+    "profiler.py", "run_history.py", "sd_notify.py", "sink_select.py", "speaker_power.py",
+    "status_web.py",
+]
+
+# The checkout on the box (services run scripts and audio from here);
+# mirrored with relative paths, nothing restarted
+CHECKOUT = "/home/orangepi/autoRain"
+CHECKOUT_FILES = ["*.py", "*.md", "scripts/*", "configs/*", "configs/options-enabled/*",
+                  "audio/sounds/*", "bluetooth/*", "system-configs/bash/*"]
+
+# (source globs relative to the repo, destination, units to restart)
+# A destination ending in "/" is a directory; otherwise a single file path.
+# "unit:reload" reloads instead of restarting.
+INSTALL = [
+    (RUNTIME_MODULES, "/home/orangepi/", ["autorain.service"]),
+    (["configs/autorain.service"], "/etc/systemd/system/", ["autorain.service"]),
+    (["configs/captive-portal"], "/etc/nginx/sites-available/", ["nginx.service:reload"]),
+    (["configs/shellinabox"], "/etc/default/", ["shellinabox.service"]),
+    (["configs/options-enabled/*"], "/etc/shellinabox/options-enabled/", ["shellinabox.service"]),
+    (["configs/create-ap-hotspot.service"], "/etc/systemd/system/", ["create-ap-hotspot.service"]),
+    (["configs/jailbreakbox-manager.service"], "/etc/systemd/system/", ["jailbreakbox-manager.service"]),
+    (["scripts/jailbreakbox-manager.sh"], "/home/orangepi/", ["jailbreakbox-manager.service"]),
+    (["scripts/speaker_power.sh", "scripts/check_bluetooth.sh", "scripts/setup-captive-portal-dns.sh"],
+     "/usr/local/bin/", []),
+    (["system-configs/bash/bash_profile"], "/home/orangepi/.bash_profile", []),
+]
+
+
+# ================= SOURCE TREE =================
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def plan(source=ROOT, install=INSTALL, checkout=CHECKOUT, checkout_files=CHECKOUT_FILES):
+    """
+    Files to install from the source tree.
+
+    Returns {dest path: {"src", "sha256", "mode", "units"}}; a file installed
+    to several places gets one entry per destination.
+    """
+    files = {}
+    hashes = {}
+    mirror = [([p], os.path.join(checkout, os.path.dirname(p), ""), []) for p in checkout_files]
+    for patterns, dest, units in mirror + install:
+        for pattern in patterns:
+            for src in sorted(glob.glob(os.path.join(source, pattern))):
+                if not os.path.isfile(src):
+                    continue
+                target = dest + os.path.basename(src) if dest.endswith("/") else dest
+                if src not in hashes:
+                    hashes[src] = _sha256(src)
+                entry = files.setdefault(target, {"src": src, "sha256": hashes[src],
+                                                  "mode": os.stat(src).st_mode & 0o777, "units": []})
+                entry["units"] = sorted(set(entry["units"]) | set(units))
+    return files
+
+
+def diff(files, manifest):
+    """Destination paths whose content or mode differs from the box's manifest."""
+    changed = []
+    for dest, entry in files.items():
+        old = manifest.get(dest)
+        if old is None or old.get("sha256") != entry["sha256"] or old.get("mode") != entry["mode"]:
+            changed.append(dest)
+    return changed
+
+
+# ================= ON THE BOX =================
+
+def _owner(path):
+    """uid/gid of the nearest existing ancestor, for new files and dirs."""
+    while not os.path.exists(path):
+        path = os.path.dirname(path)
+    st = os.stat(path)
+    return st.st_uid, st.st_gid
+
+
+def _autorain_busy(root, socket_path=CONTROL_SOCKET):
+    """autoRain's stage if a device is mid-jailbreak, else None (also if not running)."""
+    import socket
+
+    path = os.path.join(root, socket_path.lstrip("/"))
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(2.0)
+            sock.connect(path)
+            sock.sendall(json.dumps({"cmd": "status", "args": []}).encode() + b"\n")
+            data = b""
+            while not data.endswith(b"\n"):
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                data += chunk
+        stage = json.loads(data).get("stage")
+    except (OSError, ValueError, AttributeError):
+        return None
+    return stage if stage in BUSY_STAGES else None
+
+
+def _run_units(root, units, unit_files_changed, force_restart=False):
+    """
+    Restart/reload units; in a stand-in directory only log the actions.
+
+    Returns (actions, failed, deferred): deferred holds the autoRain restart
+    skipped because a device is mid-jailbreak.
+    """
+    deferred = []
+    if not force_restart and AUTORAIN_UNIT in units:
+        stage = _autorain_busy(root)
+        if stage:
+            units = [u for u in units if u != AUTORAIN_UNIT]
+            deferred.append(f"restart {AUTORAIN_UNIT} (autoRain busy: {stage})")
+    actions = (["daemon-reload"] if unit_files_changed else []) + [
+        f"{u.partition(':')[2] or 'restart'} {u.partition(':')[0]}" for u in units]
+    if os.path.realpath(root) != "/":
+        with open(os.path.join(root, ACTIONS_LOG), "a") as f:
+            f.writelines(f"systemctl {a}\n" for a in actions)
+        return actions, [], deferred
+    failed = []
+    for action in actions:
+        if subprocess.run(["systemctl"] + action.split(), capture_output=True).returncode != 0:
+            failed.append(action)
+    return actions, failed, deferred
+
+
+def apply(staging, root="/", force_restart=False):
+    """
+    Install a staged deploy (run on the box).
+
+    staging holds plan.json and files/<dest path>. Returns a summary dict.
+    """
+    with open(os.path.join(staging, "plan.json")) as f:
+        staged = json.load(f)
+    as_root = os.geteuid() == 0
+
+    for dest in staged["changed"]:
+        entry = staged["files"][dest]
+        path = os.path.join(root, dest.lstrip("/"))
+        parent = os.path.dirname(path)
+        if not os.path.isdir(parent):
+            uid, gid = _owner(parent)
+            os.makedirs(parent)
+            if as_root:
+                os.chown(parent, uid, gid)
+        tmp = path + ".deploy-tmp"
+        with open(os.path.join(staging, "files", dest.lstrip("/")), "rb") as src, open(tmp, "wb") as out:
+            out.write(src.read())
+            out.flush()
+            os.fsync(out.fileno())
+        os.chmod(tmp, entry["mode"])
+        if as_root:
+            os.chown(tmp, *_owner(parent))
+        os.replace(tmp, path)
+
+    unit_files = any(d.startswith("/etc/systemd/system/") for d in staged["changed"])
+    actions, failed, deferred = _run_units(root, staged["units"], unit_files, force_restart)
+
+    # Manifest last, without the changed files whose unit action did not
+    # happen: an interrupted deploy, a failed or a deferred restart is
+    # redone next time
+    undone = {a.split()[1] for a in failed + deferred if " " in a}
+    reload_failed = "daemon-reload" in failed
+    files = {}
+    for dest, entry in staged["manifest"].items():
+        if dest in staged["changed"]:
+            units = {u.partition(":")[0] for u in staged["files"][dest]["units"]}
+            if units & undone or (reload_failed and dest.startswith("/etc/systemd/system/")):
+                continue
+        files[dest] = entry
+    manifest = os.path.join(root, MANIFEST_PATH.lstrip("/"))
+    os.makedirs(os.path.dirname(manifest), exist_ok=True)
+    with open(manifest + ".tmp", "w") as f:
+        json.dump({"deployed": time.time(), "files": files}, f, indent=1)
+    os.replace(manifest + ".tmp", manifest)
+    return {"changed": len(staged["changed"]), "actions": actions, "failed": failed, "deferred": deferred}
+
+
+# ================= TARGETS =================
+
+class Target:
+    """Where a box is and how to run commands on it."""
+
+    def __init__(self, spec):
+        self.spec = spec
+        if spec.startswith("docker://"):
+            self.prefix, self.sudo, self.root = ["docker", "exec", "-i", spec[len("docker://"):]], False, "/"
+        elif spec.startswith("/") or spec.startswith("."):
+            self.prefix, self.sudo, self.root = [], False, os.path.abspath(spec)
+        else:
+            host = spec[len("ssh://"):] if spec.startswith("ssh://") else spec
+            self.prefix, self.sudo, self.root = ["ssh", "-o", "BatchMode=yes", host], True, "/"
+
+    def run(self, script, stdin=None, timeout=300):
+        """Run a shell snippet on the box."""
+        return subprocess.run(self.prefix + ["sh", "-c", script] if self.prefix else ["sh", "-c", script],
+                              input=stdin, capture_output=True, timeout=timeout)
+
+    def manifest(self):
+        path = os.path.join(self.root, MANIFEST_PATH.lstrip("/"))
+        result = self.run(f"cat {shlex.quote(path)} 2>/dev/null || true")
+        if result.returncode != 0:
+            raise OSError(result.stderr.decode(errors="replace").strip() or "cannot reach box")
+        try:
+            return json.loads(result.stdout or b"{}").get("files", {})
+        except ValueError:
+            return {}  # damaged manifest: redeploy everything
+
+
+def _bundle(files, changed):
+    """tar stream with deploy.py, plan.json and the changed files."""
+    units = sorted({u for d in changed for u in files[d]["units"]})
+    staged = {
+        "changed": changed,
+        "units": units,
+        "files": {d: {"mode": files[d]["mode"], "units": files[d]["units"]} for d in changed},
+        "manifest": {d: {"sha256": e["sha256"], "mode": e["mode"]} for d, e in files.items()},
+    }
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w") as tar:
+        tar.add(os.path.abspath(__file__), "deploy.py")
+        data = json.dumps(staged).encode()
+        info = tarfile.TarInfo("plan.json")
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+        for dest in changed:
+            tar.add(files[dest]["src"], "files/" + dest.lstrip("/"))
+    return buf.getvalue(), units
+
+
+def deploy(target, files, dry_run=False, force_restart=False):
+    """Deploy to one target. Returns a result dict."""
+    started = time.monotonic()
+    result = {"target": target.spec, "changed": [], "actions": [], "failed": [], "deferred": [], "bytes": 0}
+    try:
+        changed = diff(files, target.manifest())
+        result["changed"] = changed
+        if changed and not dry_run:
+            bundle, units = _bundle(files, changed)
+            result["bytes"] = len(bundle)
+            sudo = "sudo -n " if target.sudo else ""
+            script = (f'd=$(mktemp -d) && tar -xf - -C "$d" && '
+                      f'{sudo}python3 "$d/deploy.py" apply "$d" --root {shlex.quote(target.root)}'
+                      f'{" --force-restart" if force_restart else ""}; '
+                      f'rc=$?; rm -rf "$d"; exit $rc')
+            proc = target.run(script, stdin=bundle)
+            if proc.returncode != 0:
+                lines = proc.stderr.decode(errors="replace").strip().splitlines()
+                raise OSError(lines[-1] if lines else f"apply exited {proc.returncode}")
+            summary = json.loads(proc.stdout.decode().strip().splitlines()[-1])
+            result["actions"], result["failed"] = summary["actions"], summary["failed"]
+            result["deferred"] = summary["deferred"]
+    except (OSError, ValueError, subprocess.TimeoutExpired) as e:
+        result["error"] = str(e)
+    result["seconds"] = round(time.monotonic() - started, 3)
+    return result
+
+
+def _print_result(r, dry_run):
+    if "error" in r:
+        print(f"{r['target']}: FAILED - {r['error']}")
+        return
+    if not r["changed"]:
+        print(f"{r['target']}: up to date ({r['seconds']:.1f}s)")
+        return
+    verb = "would change" if dry_run else "changed"
+    print(f"{r['target']}: {verb} {len(r['changed'])} files, {r['bytes'] / 1024:.0f} KB sent, "
+          f"{r['seconds']:.1f}s")
+    for dest in r["changed"]:
+        print(f"    {dest}")
+    for action in r["actions"]:
+        print(f"    systemctl {action}" + ("  FAILED" if action in r["failed"] else ""))
+    for action in r["deferred"]:
+        print(f"    systemctl {action}  DEFERRED to the next deploy")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["apply"]:
+        # On the box, called by deploy() through the tar stream
+        p = argparse.ArgumentParser(prog="deploy.py apply")
+        p.add_argument("staging")
+        p.add_argument("--root", default="/")
+        p.add_argument("--force-restart", action="store_true")
+        args = p.parse_args(argv[1:])
+        print(json.dumps(apply(args.staging, args.root, args.force_restart)))
+        return 0
+
+    parser = argparse.ArgumentParser(prog="deploy.py", description="Deploy autoRain to boxes, changed files only")
+    parser.add_argument("targets", nargs="+", help="user@host, docker://name or a local directory")
+    parser.add_argument("--jobs", type=int, default=8, help="boxes deployed in parallel")
+    parser.add_argument("--dry-run", action="store_true", help="only show what would change")
+    parser.add_argument("--source", default=ROOT, help="source tree (default: this checkout)")
+    parser.add_argument("--force-restart", action="store_true",
+                        help="restart autoRain even while a device is mid-jailbreak")
+    args = parser.parse_args(argv)
+
+    files = plan(args.source)
+    targets = [Target(spec) for spec in args.targets]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        results = list(pool.map(lambda t: deploy(t, files, args.dry_run, args.force_restart), targets))
+    for r in results:
+        _print_result(r, args.dry_run)
+    return 1 if any("error" in r or r["failed"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Event Log for autoRain - structured, non-blocking logging
+
+Callers only put records on a queue (QueueHandler); a QueueListener thread
+formats and writes them, so a slow SD card never stalls DFU handling.
+
+  file     - one JSON object per line, size- or time-rotated; optional RAM
+             buffering writes records in one batch every N seconds
+             (WARNING and above are written immediately)
+  console  - the familiar "time [LEVEL] message" text on stdout
+
+Structured fields are passed with `extra`:
+
+    log.info("[palera1n] DFU mode", extra={"stage": "dfu", "duration": 12.3})
+
+Run `python3 event_log.py [FILE]` to print a JSON log as readable text.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+
+# Keys every LogRecord has; anything else on a record came from `extra`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+TEXT_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+
+_listener = None
+
+
+# ================= FORMATTERS =================
+
+class JsonFormatter(logging.Formatter):
+    """One compact JSON object per record."""
+
+    def format(self, record):
+        event = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                event[key] = value
+        if record.exc_info:
+            event["exc"] = self.formatException(record.exc_info)
+        return json.dumps(event, default=str, separators=(",", ":"))
+
+
+# ================= HANDLERS =================
+
+class IntervalMemoryHandler(logging.handlers.MemoryHandler):
+    """MemoryHandler that also flushes every `interval` seconds."""
+
+    def __init__(self, target, interval=5.0, capacity=1000, flush_level=logging.WARNING):
+        super().__init__(capacity, flushLevel=flush_level, target=target, flushOnClose=True)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="log-flush")
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def close(self):
+        self._stop.set()
+        target = self.target  # MemoryHandler.close() flushes, then drops it
+        super().close()
+        if target is not None:
+            target.close()
+
+
+class LogWriter:
+    """File-like object turning written text into log records, line by line."""
+
+    def __init__(self, logger, level=logging.INFO):
+        self.logger = logger
+        self.level = level
+        self._partial = ""
+
+    def write(self, data):
+        lines = (self._partial + data).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            line = line.rstrip("\r")
+            if line.strip():
+                self.logger.log(self.level, line)
+
+    def flush(self):
+        if self._partial.strip():
+            self.logger.log(self.level, self._partial.rstrip("\r"))
+        self._partial = ""
+
+
+# ================= SETUP =================
+
+def setup_logging(log_file, level=logging.INFO, max_bytes=1_000_000, backups=3,
+                  rotate_when=None, buffer_seconds=0.0, json_file=True, console=True):
+    """
+    Route all logging through a queue to a background writer thread.
+
+    Args:
+        log_file: path of the log file (None = console only)
+        max_bytes: rotate when the file reaches this size (size rotation)
+        backups: rotated files to keep
+        rotate_when: e.g. "midnight" for time rotation instead of size
+        buffer_seconds: >0 = keep records in RAM and write them in batches
+        json_file: JSON lines (True) or the console text format (False)
+        console: also print text records to stdout
+    """
+    global _listener
+
+    if _listener is not None:
+        return _listener
+
+    handlers = []
+
+    if log_file:
+        if rotate_when:
+            file_handler = logging.handlers.TimedRotatingFileHandler(
+                log_file, when=rotate_when, backupCount=backups
+            )
+        else:
+            file_handler = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=max_bytes, backupCount=backups
+            )
+        file_handler.setFormatter(JsonFormatter() if json_file else logging.Formatter(TEXT_FORMAT))
+        if buffer_seconds > 0:
+            file_handler = IntervalMemoryHandler(file_handler, interval=buffer_seconds)
+        handlers.append(file_handler)
+
+    if console:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        handlers.append(console_handler)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging():
+    """Write out everything still queued or buffered and close the files."""
+    global _listener
+
+    if _listener is None:
+        return
+    _listener.stop()
+    for h in _listener.handlers:
+        try:
+            h.flush()
+            h.close()
+        except Exception:
+            pass
+    _listener = None
+
+
+# ================= VIEWER =================
+
+def _format_line(line):
+    try:
+        event = json.loads(line)
+    except ValueError:
+        return line.rstrip("\n")
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(event.pop("ts", 0)))
+    level = event.pop("level", "")
+    msg = event.pop("msg", "")
+    event.pop("logger", None)
+    extra = " ".join(f"{k}={v}" for k, v in event.items())
+    return f"{stamp} [{level}] {msg}" + (f"  ({extra})" if extra else "")
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "/home/orangepi/autoRain.log"
+    try:
+        with open(path) as f:
+            for line in f:
+                print(_format_line(line))
+    except (BrokenPipeError, KeyboardInterrupt):
+        pass
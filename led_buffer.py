@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+LED Color Buffer for autoRain - lock-free shared LED state
+
+Fixed 17-byte layout:
+  [0:8]   sequence counter (uint64 little endian, odd while a write is in progress)
+  [8:17]  channel bytes: LED1 R,G,B  LED2 R,G,B  LED3 R,G,B
+
+Readers use a seqlock: read the counter, copy the channels, read the counter
+again and retry if it was odd or moved. Writers are serialized by a writer
+lock, so the PWM threads never take a lock on their hot path.
+
+Backed by an anonymous mmap (threads) or multiprocessing.shared_memory when
+a name is given, so another process can attach to the same buffer by name.
+"""
+
+import mmap
+import struct
+import threading
+import time
+
+# ================= LAYOUT =================
+
+LED_COUNT = 3
+CHANNELS = LED_COUNT * 3
+SEQ_OFFSET = 0
+DATA_OFFSET = 8
+BUFFER_SIZE = DATA_OFFSET + CHANNELS
+
+_SEQ = struct.Struct("<Q")
+_COLOR_KEYS = {'r': 0, 'g': 1, 'b': 2}
+
+
+def channel_index(led_id, color_key):
+    """Map (led_id 1-3, 'r'/'g'/'b') to a channel index 0-8."""
+    return (led_id - 1) * 3 + _COLOR_KEYS[color_key]
+
+
+def _clamp(v):
+    return max(0, min(255, int(v)))
+
+
+# ================= BUFFER =================
+
+class ColorBuffer:
+    """Seqlock-protected RGB targets for all LEDs."""
+
+    def __init__(self, name=None, create=True, lock=None):
+        """
+        Args:
+            name: shared memory name, None = private anonymous mapping
+            create: create the shared segment (False = attach to existing)
+            lock: writer lock, pass a multiprocessing.Lock if several
+                  processes write; defaults to a threading.Lock
+        """
+        self._shm = None
+        self._mmap = None
+
+        if name is None:
+            self._mmap = mmap.mmap(-1, BUFFER_SIZE)
+            self._buf = memoryview(self._mmap)
+        else:
+            from multiprocessing import shared_memory
+            self._shm = shared_memory.SharedMemory(
+                name=name, create=create, size=BUFFER_SIZE if create else 0
+            )
+            self._buf = self._shm.buf
+
+        self.name = name
+        self._write_lock = lock or threading.Lock()
+        self._data = self._buf[DATA_OFFSET:BUFFER_SIZE]
+
+        if create:
+            self._buf[:BUFFER_SIZE] = bytes(BUFFER_SIZE)
+
+    # ----- writers -----
+
+    def _begin(self):
+        seq = _SEQ.unpack_from(self._buf, SEQ_OFFSET)[0] + 1
+        _SEQ.pack_into(self._buf, SEQ_OFFSET, seq)
+        return seq
+
+    def _end(self, seq):
+        _SEQ.pack_into(self._buf, SEQ_OFFSET, seq + 1)
+
+    def write_led(self, led_id, r, g, b):
+        """Set one LED (1-3) to an RGB color (0-255 each)."""
+        start = (led_id - 1) * 3
+        values = bytes((_clamp(r), _clamp(g), _clamp(b)))
+        with self._write_lock:
+            seq = self._begin()
+            self._data[start:start + 3] = values
+            self._end(seq)
+
+    def write_all(self, values):
+        """Set all 9 channels at once (LED1 RGB, LED2 RGB, LED3 RGB)."""
+        values = bytes(_clamp(v) for v in values)
+        if len(values) != CHANNELS:
+            raise ValueError(f"expected {CHANNELS} channel values, got {len(values)}")
+        with self._write_lock:
+            seq = self._begin()
+            self._data[:] = values
+            self._end(seq)
+
+    def clear(self):
+        """Set every channel to 0."""
+        self.write_all(bytes(CHANNELS))
+
+    # ----- readers -----
+
+    @property
+    def sequence(self):
+        """Current write sequence (even = stable)."""
+        return _SEQ.unpack_from(self._buf, SEQ_OFFSET)[0]
+
+    def channel(self, index):
+        """Read a single channel; a one-byte read is never torn, so no retry."""
+        return self._data[index]
+
+    def read(self):
+        """Consistent snapshot of all 9 channels as bytes."""
+        while True:
+            seq = _SEQ.unpack_from(self._buf, SEQ_OFFSET)[0]
+            if seq & 1:
+                time.sleep(0)  # writer mid-update, let it finish
+                continue
+            data = bytes(self._data)
+            if _SEQ.unpack_from(self._buf, SEQ_OFFSET)[0] == seq:
+                return data
+
+    def read_led(self, led_id):
+        """Consistent (r, g, b) for one LED."""
+        start = (led_id - 1) * 3
+        data = self.read()
+        return data[start], data[start + 1], data[start + 2]
+
+    # ----- lifetime -----
+
+    def close(self):
+        """Detach from the underlying memory."""
+        self._data.release()
+        if self._shm is not None:
+            self._shm.close()
+        else:
+            self._buf.release()
+            self._mmap.close()
+
+    def unlink(self):
+        """Destroy the shared segment (owner only)."""
+        if self._shm is not None:
+            self._shm.unlink()
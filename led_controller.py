@@ -5,47 +5,84 @@ LED Controller for autoRain - Orange Pi Zero 2 RGB LED Control with Smooth PWM
 Working software PWM using per-pin threads with gpiod.
 Supports rainbow chase effect with configurable speed.
 
+Effects are led_timeline descriptions (keyframes, easing, chase) drawn by one
+renderer thread at FRAME_RATE; every effect and stage function returns
+immediately and consecutive animations cross-fade.
+
+Callers on timing-sensitive threads use post(): commands go on a queue and
+a single worker thread applies them in order, dropping stage commands that
+a newer stage command has already superseded.
+
+GPIO access goes through gpio_backend, so the controller also runs off the
+board: AUTORAIN_GPIO_BACKEND=recorder (in-memory) or sim (gpio-sim chip).
+
+Pins, backend and timing come from the [leds] section of the autoRain
+config file via configure(); the values below are the defaults.
+
 LED Pin Configuration (from led-pins.conf):
   LED1 (Closest to eth0): R=232, G=75, B=71
   LED2 (Middle):          R=230, G=74, B=233
   LED3 (Farthest):        R=69,  G=73, B=72
 """
 
-import gpiod
+import os
+import math
 import time
 import threading
-import colorsys
+import collections
 import logging
 import atexit
 
+import gpio_backend
+from led_buffer import ColorBuffer, channel_index
+from led_timeline import (
+    Chase, Clip, Keyframes, Renderer, Sequence, Solid,
+    ease_in_out, hue_to_rgb, step,
+)
+
 log = logging.getLogger("autorain.led")
 
 # ================= LED PIN CONFIGURATION =================
 
 GPIO_CHIP = "/dev/gpiochip1"
 
+# "gpiod" (hardware), "sim" (gpio-sim/mockup chip) or "recorder" (in-memory)
+GPIO_BACKEND = os.environ.get(gpio_backend.BACKEND_ENV, gpio_backend.DEFAULT_BACKEND)
+
 LED1_R, LED1_G, LED1_B = 232, 75, 71
 LED2_R, LED2_G, LED2_B = 230, 74, 233
 LED3_R, LED3_G, LED3_B = 69, 73, 72
 
 ALL_PINS = [LED1_R, LED1_G, LED1_B, LED2_R, LED2_G, LED2_B, LED3_R, LED3_G, LED3_B]
 
+# (led_id, pin, color_key) for every PWM channel
+LED_PINS = [
+    (1, LED1_R, 'r'), (1, LED1_G, 'g'), (1, LED1_B, 'b'),
+    (2, LED2_R, 'r'), (2, LED2_G, 'g'), (2, LED2_B, 'b'),
+    (3, LED3_R, 'r'), (3, LED3_G, 'g'), (3, LED3_B, 'b'),
+]
+
+# ================= PWM CONFIGURATION =================
+
+PWM_PERIOD = 0.001  # seconds (1 kHz)
+
+# "threads" = one thread per pin, "frame" = one thread driving all pins
+PWM_ENGINE = "threads"
+
 # ================= GLOBAL STATE =================
 
-_chip = None
+_backend = None
 _lines = None
+_ACTIVE = True
+_INACTIVE = False
 _running = False
 _pwm_threads = []
-_lock = threading.Lock()
-_animation_thread = None
-_animation_stop = threading.Event()
 
-# Per-LED RGB targets (0-255)
-_targets = {
-    1: {'r': 0, 'g': 0, 'b': 0},
-    2: {'r': 0, 'g': 0, 'b': 0},
-    3: {'r': 0, 'g': 0, 'b': 0},
-}
+# PWM loop timing for pwm_stats(); updated lock-free, it is only statistics
+_pwm_stats = {"periods": 0, "jitter_sum": 0.0, "jitter_max": 0.0}
+
+# Per-LED RGB targets (0-255), read lock-free by the PWM threads
+_buffer = ColorBuffer()
 
 
 # ================= GPIO INIT =================
@@ -61,49 +98,44 @@ def _release_sysfs_pins():
 
 
 def _init_gpio():
-    """Initialize GPIO chip and request all LED lines."""
-    global _chip, _lines
+    """Open the GPIO backend and request all LED lines."""
+    global _backend, _lines, _ACTIVE, _INACTIVE
     
     if _lines is not None:
         return True
     
-    _release_sysfs_pins()
-    
     try:
-        _chip = gpiod.Chip(GPIO_CHIP)
-        config = gpiod.LineSettings(
-            direction=gpiod.line.Direction.OUTPUT,
-            output_value=gpiod.line.Value.INACTIVE
-        )
-        _lines = _chip.request_lines(
-            consumer="autorain-led",
-            config={pin: config for pin in ALL_PINS}
-        )
-        log.info("[led] GPIO initialized")
+        if GPIO_BACKEND == "gpiod":
+            _release_sysfs_pins()
+        _backend = gpio_backend.get_backend(GPIO_BACKEND, chip=GPIO_CHIP)
+        _ACTIVE, _INACTIVE = _backend.ACTIVE, _backend.INACTIVE
+        _lines = _backend.request_outputs(ALL_PINS, consumer="autorain-led")
+        log.info(f"[led] GPIO initialized ({_backend.name})")
         return True
     except Exception as e:
-        log.error(f"[led] GPIO init failed: {e}")
+        log.error(f"[led] GPIO init failed ({GPIO_BACKEND}): {e}")
+        _backend = None
         return False
 
 
 def _cleanup_gpio():
     """Release GPIO resources."""
-    global _chip, _lines
+    global _backend, _lines
     
     if _lines:
         try:
-            _lines.set_values({pin: gpiod.line.Value.INACTIVE for pin in ALL_PINS})
+            _lines.set_values({pin: _INACTIVE for pin in ALL_PINS})
             _lines.release()
         except:
             pass
         _lines = None
     
-    if _chip:
+    if _backend:
         try:
-            _chip.close()
+            _backend.close()
         except:
             pass
-        _chip = None
+        _backend = None
 
 
 # ================= PWM ENGINE =================
@@ -112,140 +144,294 @@ def _pwm_thread(led_id, pin, color_key):
     """Per-pin PWM thread - toggles based on target value."""
     global _running
     
+    index = channel_index(led_id, color_key)
+    stats = _pwm_stats
+    last = None
+    
     while _running:
-        with _lock:
-            val = _targets[led_id][color_key]
+        val = _buffer.channel(index)
         
         if _lines is None:
             time.sleep(0.01)
             continue
         
+        now = time.perf_counter()
+        if last is not None:
+            jitter = abs(now - last - PWM_PERIOD)
+            stats["periods"] += 1
+            stats["jitter_sum"] += jitter
+            if jitter > stats["jitter_max"]:
+                stats["jitter_max"] = jitter
+        last = now
+        
         try:
             if val > 0:
-                _lines.set_values({pin: gpiod.line.Value.ACTIVE})
-                time.sleep(val / 255 * 0.001)
+                _lines.set_values({pin: _ACTIVE})
+                time.sleep(val / 255 * PWM_PERIOD)
             if val < 255:
-                _lines.set_values({pin: gpiod.line.Value.INACTIVE})
-                time.sleep((255 - val) / 255 * 0.001)
+                _lines.set_values({pin: _INACTIVE})
+                time.sleep((255 - val) / 255 * PWM_PERIOD)
         except:
-            time.sleep(0.001)
+            time.sleep(PWM_PERIOD)
 
 
-def start_pwm():
-    """Start PWM engine with per-pin threads."""
+def _pwm_frame():
+    """
+    Single-thread PWM - all pins share one period.
+    
+    Every pin that is on goes ACTIVE at the start of the period, then pins
+    are switched off in order of duty, one set_values call per distinct edge.
+    """
+    global _running
+    
+    channels = [(pin, channel_index(led_id, color_key)) for led_id, pin, color_key in LED_PINS]
+    active = _ACTIVE
+    inactive = _INACTIVE
+    stats = _pwm_stats
+    last = None
+    
+    while _running:
+        if _lines is None:
+            time.sleep(0.01)
+            continue
+        
+        data = _buffer.read()
+        
+        # Group pins by the point in the period where they switch off
+        edges = {}
+        for pin, index in channels:
+            val = data[index]
+            if 0 < val < 255:
+                edges.setdefault(val, []).append(pin)
+        
+        try:
+            start = time.perf_counter()
+            _lines.set_values({pin: active if data[index] else inactive for pin, index in channels})
+            
+            if last is not None:
+                jitter = abs(start - last - PWM_PERIOD)
+                stats["periods"] += 1
+                stats["jitter_sum"] += jitter
+                if jitter > stats["jitter_max"]:
+                    stats["jitter_max"] = jitter
+            last = start
+            
+            for val in sorted(edges):
+                delay = start + val / 255 * PWM_PERIOD - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                _lines.set_values({pin: inactive for pin in edges[val]})
+            
+            delay = start + PWM_PERIOD - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        except:
+            time.sleep(PWM_PERIOD)
+
+
+def start_pwm(engine=None):
+    """
+    Start PWM engine.
+    
+    Args:
+        engine: "threads" or "frame", None = PWM_ENGINE
+    """
     global _running, _pwm_threads
     
     if _running:
         return True
     
+    engine = engine or PWM_ENGINE
+    if engine not in ("threads", "frame"):
+        log.error(f"[led] Unknown PWM engine: {engine}")
+        return False
+    
     if not _init_gpio():
         return False
     
     _running = True
     _pwm_threads = []
     
-    # Create thread for each LED pin
-    led_pins = [
-        (1, LED1_R, 'r'), (1, LED1_G, 'g'), (1, LED1_B, 'b'),
-        (2, LED2_R, 'r'), (2, LED2_G, 'g'), (2, LED2_B, 'b'),
-        (3, LED3_R, 'r'), (3, LED3_G, 'g'), (3, LED3_B, 'b'),
-    ]
-    
-    for led_id, pin, color_key in led_pins:
-        t = threading.Thread(
-            target=_pwm_thread,
-            args=(led_id, pin, color_key),
-            daemon=True
-        )
+    if engine == "frame":
+        t = threading.Thread(target=_pwm_frame, daemon=True, name="led-pwm")
         _pwm_threads.append(t)
         t.start()
-    
-    log.info("[led] PWM started (9 threads)")
+    else:
+        # Create thread for each LED pin
+        for led_id, pin, color_key in LED_PINS:
+            t = threading.Thread(
+                target=_pwm_thread,
+                args=(led_id, pin, color_key),
+                daemon=True,
+                name=f"led-pwm-{pin}"
+            )
+            _pwm_threads.append(t)
+            t.start()
+    
+    log.info(f"[led] PWM started ({engine}, {len(_pwm_threads)} threads)")
     return True
 
 
-def stop_pwm():
-    """Stop PWM engine."""
+def pwm_stats():
+    """
+    PWM loop health since start.
+    
+    Returns dict: periods, jitter_sum and jitter_max (seconds of deviation
+    from PWM_PERIOD), cpu_seconds used by the PWM threads.
+    """
+    stats = dict(_pwm_stats)
+    
+    cpu = 0.0
+    ticks = os.sysconf("SC_CLK_TCK")
+    for t in _pwm_threads:
+        try:
+            with open(f"/proc/self/task/{t.native_id}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            cpu += (int(fields[11]) + int(fields[12])) / ticks
+        except (OSError, IndexError, TypeError):
+            pass
+    stats["cpu_seconds"] = cpu
+    return stats
+
+
+def stop_pwm(timeout=0.1):
+    """Stop PWM engine and wait for its threads to exit."""
     global _running
     _running = False
+    for t in _pwm_threads:
+        t.join(timeout=timeout)
     all_off()
     log.info("[led] PWM stopped")
 
 
 # ================= COLOR CONTROL =================
+#
+# Direct writes: they stop the running effect first (the renderer would
+# overwrite them on its next frame) and last until the next play().
+
+def _write_direct(write, *args):
+    _renderer.cancel()
+    write(*args)
+    _renderer.frame = tuple(_buffer.read())  # a later play() fades from here
+
 
 def set_led(led_id, r, g, b):
     """Set single LED color (0-255 each)."""
-    with _lock:
-        _targets[led_id]['r'] = max(0, min(255, int(r)))
-        _targets[led_id]['g'] = max(0, min(255, int(g)))
-        _targets[led_id]['b'] = max(0, min(255, int(b)))
+    _write_direct(_buffer.write_led, led_id, r, g, b)
 
 
 def set_all(r, g, b):
     """Set all LEDs to same color."""
-    set_led(1, r, g, b)
-    set_led(2, r, g, b)
-    set_led(3, r, g, b)
+    _write_direct(_buffer.write_all, (r, g, b) * 3)
 
 
 def all_off():
     """Turn all LEDs off."""
-    with _lock:
-        for led_id in _targets:
-            _targets[led_id] = {'r': 0, 'g': 0, 'b': 0}
+    _write_direct(_buffer.clear)
     
     if _lines:
         try:
-            _lines.set_values({pin: gpiod.line.Value.INACTIVE for pin in ALL_PINS})
+            _lines.set_values({pin: _INACTIVE for pin in ALL_PINS})
         except:
             pass
 
 
-def hue_to_rgb(hue):
-    """Convert hue (0.0-1.0) to RGB (0-255)."""
-    r, g, b = colorsys.hsv_to_rgb(hue % 1.0, 1.0, 1.0)
-    return int(r * 255), int(g * 255), int(b * 255)
+# ================= ANIMATION ENGINE =================
+
+FRAME_RATE = 50          # renderer frames per second
+TRANSITION_FADE = 0.25   # default cross-fade between stage animations (s)
 
+_renderer = Renderer(_buffer.write_all, fps=FRAME_RATE)
 
-# ================= ANIMATION ENGINE =================
 
-def _stop_animation():
-    """Signal current animation to stop."""
-    _animation_stop.set()
+def play(effect, fade=0.0):
+    """Show an effect (see led_timeline); returns immediately."""
+    _renderer.play(effect, fade)
+    return effect
 
 
-def _wait_animation(timeout=1.0):
-    """Wait for animation thread to finish."""
-    global _animation_thread
-    if _animation_thread and _animation_thread.is_alive():
-        _animation_thread.join(timeout=timeout)
+def stop_animation(fade=0.0):
+    """Fade LEDs to black and leave them off."""
+    _renderer.clear(fade)
 
 
-def _start_animation(func, *args, **kwargs):
-    """Start animation in background thread."""
-    global _animation_thread
+# ================= EFFECTS =================
+
+def flash_effect(r, g, b, times=2, duration=0.3):
+    """Color on for `duration`, off for half that, `times` times."""
+    keys = []
+    t = 0.0
+    for _ in range(times):
+        keys.append((t, (r, g, b), step))
+        t += duration
+        keys.append((t, (0, 0, 0), step))
+        t += duration / 2
+    keys.append((t, (0, 0, 0), step))
+    return Keyframes(keys)
+
+
+def pulse_effect(r, g, b, speed=50):
+    """Breathe between 10% and 100% brightness; speed 1-100."""
+    period = 2 * math.pi * 0.02 / (0.05 + speed / 500.0)
+    dim = (r * 0.1, g * 0.1, b * 0.1)
+    return Keyframes([
+        (0, dim),
+        (period / 2, (r, g, b), ease_in_out),
+        (period, dim, ease_in_out),
+    ], loop=True)
+
+
+def chase_effect(speed=None, duration=None):
+    """Rainbow chase; speed None follows set_chase_speed() live."""
+    return Chase(speed=get_chase_speed if speed is None else speed, duration=duration)
+
+
+def test_colors_effect():
+    """Red, blue, green double flashes."""
+    gap = Solid((0, 0, 0), duration=0.2)
+    return Sequence([
+        flash_effect(255, 0, 0, 2, 0.4), gap,
+        flash_effect(0, 0, 255, 2, 0.4), gap,
+        flash_effect(0, 255, 0, 2, 0.4),
+    ])
+
+
+def celebration_effect():
+    """5 s of very fast rainbow, color flashes, green flashes, green glow."""
+    rainbow = Chase(offset=0.0, duration=5.0, rate=3.0)  # 0.03 hue per 10 ms
     
-    _stop_animation()
-    _wait_animation()
+    colors = [
+        (255, 0, 0),     # Red
+        (255, 128, 0),   # Orange
+        (255, 255, 0),   # Yellow
+        (0, 255, 0),     # Green
+        (0, 255, 255),   # Cyan
+        (0, 0, 255),     # Blue
+        (128, 0, 255),   # Purple
+        (255, 0, 255),   # Magenta
+        (255, 255, 255), # White
+    ]
+    keys = []
+    t = 0.0
+    for _ in range(3):
+        for color in colors:
+            keys.append((t, color, step))
+            t += 0.12
+            keys.append((t, (0, 0, 0), step))
+            t += 0.05
+    keys.append((t, (0, 0, 0), step))
     
-    _animation_stop.clear()
-    _animation_thread = threading.Thread(
-        target=func, args=args, kwargs=kwargs,
-        daemon=True, name="led-anim"
-    )
-    _animation_thread.start()
-
+    return Sequence([
+        rainbow,
+        Keyframes(keys),
+        flash_effect(0, 255, 0, 5),
+        Solid((0, 150, 0)),
+    ])
 
-# ================= EFFECTS =================
 
 def flash_color(r, g, b, times=2, duration=0.3):
     """Flash all LEDs a color."""
-    for _ in range(times):
-        set_all(r, g, b)
-        time.sleep(duration)
-        all_off()
-        time.sleep(duration / 2)
+    play(flash_effect(r, g, b, times, duration))
 
 
 def flash_red(times=2):
@@ -263,30 +449,12 @@ def flash_blue(times=2):
 def test_colors():
     """Flash red, blue, green to test LEDs."""
     log.info("[led] Color test")
-    flash_color(255, 0, 0, 2, 0.4)
-    time.sleep(0.2)
-    flash_color(0, 0, 255, 2, 0.4)
-    time.sleep(0.2)
-    flash_color(0, 255, 0, 2, 0.4)
+    return play(test_colors_effect())
 
 
 def fade_to(r, g, b, steps=64, delay=0.015):
-    """Smoothly fade all LEDs to a color."""
-    with _lock:
-        r1 = _targets[1]['r']
-        g1 = _targets[1]['g']
-        b1 = _targets[1]['b']
-    
-    for i in range(steps + 1):
-        if _animation_stop.is_set():
-            return
-        t = i / steps
-        set_all(
-            int(r1 + (r - r1) * t),
-            int(g1 + (g - g1) * t),
-            int(b1 + (b - b1) * t)
-        )
-        time.sleep(delay)
+    """Smoothly fade all LEDs to a color (over steps * delay seconds)."""
+    play(Solid((r, g, b)), fade=steps * delay)
 
 
 # ================= RAINBOW CHASE =================
@@ -315,78 +483,20 @@ def rainbow_chase(speed=None, duration=None):
         speed: 1-100, higher = faster. None = use dynamic _chase_speed
         duration: seconds to run, None = forever
     """
-    global _chase_speed
-    
-    hue = 0.0
-    offset = 0.15  # Hue difference between LEDs
-    delay = 0.02
-    
-    start = time.time()
-    
-    while not _animation_stop.is_set():
-        # Use dynamic speed if not specified
-        if speed is None:
-            with _chase_speed_lock:
-                current_speed = _chase_speed
-        else:
-            current_speed = speed
-        
-        # Speed controls hue increment (0.001 to 0.02)
-        hue_step = 0.001 + (current_speed / 100.0) * 0.019
-        
-        r1, g1, b1 = hue_to_rgb(hue)
-        r2, g2, b2 = hue_to_rgb(hue + offset)
-        r3, g3, b3 = hue_to_rgb(hue + offset * 2)
-        
-        set_led(1, r1, g1, b1)
-        set_led(2, r2, g2, b2)
-        set_led(3, r3, g3, b3)
-        
-        hue += hue_step
-        time.sleep(delay)
-        
-        if duration and (time.time() - start) >= duration:
-            break
+    return play(chase_effect(speed, duration), TRANSITION_FADE)
 
 
 def rainbow_fade(speed=50, duration=None):
     """Rainbow fade - all LEDs same color, cycling through spectrum."""
-    hue = 0.0
-    hue_step = 0.001 + (speed / 100.0) * 0.019
-    delay = 0.02
-    
-    start = time.time()
-    
-    while not _animation_stop.is_set():
-        r, g, b = hue_to_rgb(hue)
-        set_all(r, g, b)
-        
-        hue += hue_step
-        time.sleep(delay)
-        
-        if duration and (time.time() - start) >= duration:
-            break
+    return play(Chase(speed=speed, offset=0.0, duration=duration), TRANSITION_FADE)
 
 
 def pulse_color(r, g, b, speed=50, duration=None):
     """Pulse a color (breathe effect)."""
-    import math
-    
-    phase = 0.0
-    phase_step = 0.05 + (speed / 500.0)
-    delay = 0.02
-    
-    start = time.time()
-    
-    while not _animation_stop.is_set():
-        brightness = 0.1 + 0.9 * (0.5 + 0.5 * math.sin(phase))
-        set_all(int(r * brightness), int(g * brightness), int(b * brightness))
-        
-        phase += phase_step
-        time.sleep(delay)
-        
-        if duration and (time.time() - start) >= duration:
-            break
+    effect = pulse_effect(r, g, b, speed)
+    if duration:
+        effect = Clip(effect, duration)
+    return play(effect, TRANSITION_FADE)
 
 
 # ================= BOOT STAGE ANIMATIONS =================
@@ -396,123 +506,213 @@ def boot_starting():
     log.info("[led] Boot starting")
     if not _running:
         start_pwm()
-        time.sleep(0.2)
-    test_colors()
-    _start_animation(rainbow_chase, speed=70)
+    play(Sequence([test_colors_effect(), chase_effect(speed=70)]))
 
 
 def boot_bt_waiting():
     """Waiting for Bluetooth - blue pulse."""
     log.info("[led] BT waiting")
-    _start_animation(pulse_color, 0, 100, 255, speed=40)
+    play(pulse_effect(0, 100, 255, speed=40), TRANSITION_FADE)
 
 
 def boot_bt_connected():
     """Bluetooth connected - green flash, then faster chase."""
     log.info("[led] BT connected")
-    _stop_animation()
-    _wait_animation()
-    flash_green(3)
     set_chase_speed(65)  # Speed up chase
-    _start_animation(rainbow_chase)  # Uses dynamic speed
+    play(Sequence([flash_effect(0, 255, 0, 3), chase_effect()]))  # Uses dynamic speed
 
 
 def boot_wifi_connected():
     """WiFi connected - start rainbow chase."""
     log.info("[led] WiFi connected - rainbow chase")
     set_chase_speed(50)
-    _start_animation(rainbow_chase)
+    rainbow_chase()
 
 
 def boot_ready():
     """System ready for palera1n."""
     log.info("[led] Ready")
     set_chase_speed(65)
-    _start_animation(rainbow_chase)
+    rainbow_chase()
 
 
 def palera1n_waiting():
     """Waiting for iOS device - cyan pulse."""
     log.info("[led] Waiting for device")
-    _start_animation(pulse_color, 0, 255, 255, speed=30)
+    play(pulse_effect(0, 255, 255, speed=30), TRANSITION_FADE)
 
 
 def palera1n_device_detected():
     """iOS device detected - speed up chase significantly."""
     log.info("[led] Device detected - fast chase!")
     set_chase_speed(85)
-    _start_animation(rainbow_chase)
+    rainbow_chase()
 
 
 def palera1n_dfu_step1():
     """DFU step 1 - yellow pulse."""
     log.info("[led] DFU step 1")
-    _start_animation(pulse_color, 255, 200, 0, speed=60)
+    play(pulse_effect(255, 200, 0, speed=60), TRANSITION_FADE)
 
 
 def palera1n_dfu_step2():
     """DFU step 2 - orange fast pulse."""
     log.info("[led] DFU step 2")
-    _start_animation(pulse_color, 255, 100, 0, speed=80)
+    play(pulse_effect(255, 100, 0, speed=80), TRANSITION_FADE)
 
 
 def palera1n_booting():
     """Kernel booting - SUPER FAST rainbow!"""
     log.info("[led] Booting kernel - FAST!")
     set_chase_speed(100)  # Maximum speed!
-    _start_animation(rainbow_chase)
+    rainbow_chase()
 
 
 def palera1n_complete():
     """Jailbreak complete - victory celebration!"""
     log.info("[led] Complete! Victory celebration!")
-    _stop_animation()
-    _wait_animation()
-    
-    # 5 seconds of SUPER FAST rainbow
-    log.info("[led] 5 seconds of fast rainbow...")
-    start = time.time()
-    hue = 0.0
-    while time.time() - start < 5:
-        r, g, b = hue_to_rgb(hue)
-        set_all(r, g, b)
-        hue += 0.03  # Very fast
-        time.sleep(0.01)
-    
-    # Now LOUD color blinking - flash through all colors
-    log.info("[led] Color flash celebration!")
-    colors = [
-        (255, 0, 0),     # Red
-        (255, 128, 0),   # Orange
-        (255, 255, 0),   # Yellow
-        (0, 255, 0),     # Green
-        (0, 255, 255),   # Cyan
-        (0, 0, 255),     # Blue
-        (128, 0, 255),   # Purple
-        (255, 0, 255),   # Magenta
-        (255, 255, 255), # White
-    ]
-    
-    # Flash through colors 3 times
-    for _ in range(3):
-        for r, g, b in colors:
-            set_all(r, g, b)
-            time.sleep(0.12)
-            all_off()
-            time.sleep(0.05)
-    
-    # Final green glow
-    flash_green(5)
-    set_all(0, 150, 0)
+    play(celebration_effect())
+
+
+def celebration_seconds():
+    """How long the celebration runs before settling on its green glow."""
+    return celebration_effect().starts[-1]
 
 
 def palera1n_error():
     """Error - red flash and pulse."""
     log.info("[led] Error!")
-    _stop_animation()
-    _wait_animation()
-    flash_color(255, 0, 0, 5, 0.2)
-    _start_animation(pulse_color, 255, 0, 0, speed=40)
+    play(Sequence([flash_effect(255, 0, 0, 5, 0.2), pulse_effect(255, 0, 0, speed=40)]))
+
+
+# ================= COMMAND QUEUE =================
+
+# Stage transitions: each one fully defines what the LEDs show, so a pending
+# stage command is pointless once a newer one is queued behind it.
+STAGE_COMMANDS = frozenset([
+    "boot_starting", "boot_bt_waiting", "boot_bt_connected", "boot_wifi_connected",
+    "boot_ready", "palera1n_waiting", "palera1n_device_detected", "palera1n_dfu_step1",
+    "palera1n_dfu_step2", "palera1n_booting", "palera1n_complete", "palera1n_error",
+])
+
+_commands = collections.deque()
+_commands_cond = threading.Condition()
+_command_thread = None
+_commands_busy = False
+_commands_stop = False
+_coalesced = 0
+
+
+def _command_worker():
+    """Apply queued commands one at a time."""
+    global _commands_busy
+    
+    while True:
+        with _commands_cond:
+            _commands_busy = False
+            _commands_cond.notify_all()
+            while not _commands and not _commands_stop:
+                _commands_cond.wait()
+            if not _commands:
+                return
+            func_name, args, kwargs = _commands.popleft()
+            _commands_busy = True
+        
+        func = globals().get(func_name)
+        if not callable(func):
+            log.debug(f"[led] Unknown command: {func_name}")
+            continue
+        try:
+            func(*args, **kwargs)
+        except Exception as e:
+            log.debug(f"[led] {func_name} error: {e}")
+
+
+def post(func_name, *args, **kwargs):
+    """
+    Queue an LED command by function name; returns immediately.
+    
+    A stage command (STAGE_COMMANDS) removes any stage commands still
+    waiting in the queue, since the LEDs would only flash through them.
+    """
+    global _command_thread, _coalesced, _commands_stop
+    
+    with _commands_cond:
+        if func_name in STAGE_COMMANDS and _commands:
+            pending = len(_commands)
+            kept = [c for c in _commands if c[0] not in STAGE_COMMANDS]
+            if len(kept) != pending:
+                _coalesced += pending - len(kept)
+                _commands.clear()
+                _commands.extend(kept)
+        _commands.append((func_name, args, kwargs))
+        
+        if _command_thread is None:
+            _commands_stop = False
+            _command_thread = threading.Thread(target=_command_worker, daemon=True, name="led-cmd")
+            _command_thread.start()
+        _commands_cond.notify()
+
+
+def flush(timeout=1.0):
+    """Wait until every queued command has been applied. Returns True if idle."""
+    deadline = time.monotonic() + timeout
+    with _commands_cond:
+        while _commands or _commands_busy:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or _command_thread is None:
+                return False
+            _commands_cond.wait(remaining)
+    return True
+
+
+def _stop_commands(timeout=1.0):
+    """Drain the queue and stop the worker."""
+    global _command_thread, _commands_stop
+    
+    thread = _command_thread
+    if thread is None or thread is threading.current_thread():
+        return
+    with _commands_cond:
+        _commands_stop = True
+        _commands_cond.notify_all()
+    thread.join(timeout=timeout)
+    _command_thread = None
+
+
+# ================= CONFIGURATION =================
+
+def configure(leds):
+    """
+    Apply the [leds] config section (config.Section or dict).
+    
+    Must be called before start_pwm(); returns False if PWM is running.
+    """
+    global GPIO_CHIP, GPIO_BACKEND, ALL_PINS, LED_PINS
+    global PWM_PERIOD, PWM_ENGINE, FRAME_RATE, TRANSITION_FADE
+    
+    if _running:
+        log.warning("[led] configure() ignored while PWM is running")
+        return False
+    
+    values = leds.as_dict() if hasattr(leds, "as_dict") else dict(leds)
+    GPIO_CHIP = values.get("chip", GPIO_CHIP)
+    GPIO_BACKEND = values.get("backend", GPIO_BACKEND)
+    PWM_PERIOD = values.get("pwm_period", PWM_PERIOD)
+    PWM_ENGINE = values.get("pwm_engine", PWM_ENGINE)
+    FRAME_RATE = values.get("frame_rate", FRAME_RATE)
+    TRANSITION_FADE = values.get("fade", TRANSITION_FADE)
+    _renderer.fps = FRAME_RATE
+    
+    pins = {led_id: values.get(f"led{led_id}") for led_id in (1, 2, 3)}
+    if all(pins.values()):
+        LED_PINS = [
+            (led_id, pin, key)
+            for led_id, rgb in pins.items()
+            for pin, key in zip(rgb, "rgb")
+        ]
+        ALL_PINS = [pin for _, pin, _ in LED_PINS]
+    return True
 
 
 # ================= CLEANUP =================
@@ -521,8 +721,8 @@ def cleanup():
     """Clean shutdown."""
     global _running
     log.info("[led] Cleanup")
-    _stop_animation()
-    _wait_animation(0.5)
+    _stop_commands()
+    _renderer.stop()
     _running = False
     time.sleep(0.05)
     all_off()
@@ -539,6 +739,11 @@ if __name__ == "__main__":
     
     logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
     
+    import config
+    import profiler
+    configure(config.load().leds)
+    profiler.install()
+    
     print("LED Controller")
     print("=" * 40)
     
@@ -549,7 +754,7 @@ if __name__ == "__main__":
     
     try:
         if cmd == "test":
-            test_colors()
+            time.sleep(test_colors().duration)
         elif cmd == "red":
             set_all(255, 0, 0)
             time.sleep(3)
@@ -561,10 +766,15 @@ if __name__ == "__main__":
             time.sleep(3)
         elif cmd == "chase":
             print("Rainbow chase (Ctrl+C to stop)...")
-            rainbow_chase(speed=50, duration=30)
+            rainbow_chase(speed=50)
+            time.sleep(30)
         elif cmd == "fade":
             print("Rainbow fade (Ctrl+C to stop)...")
-            rainbow_fade(speed=50, duration=30)
+            rainbow_fade(speed=50)
+            time.sleep(30)
+        elif cmd == "complete":
+            palera1n_complete()
+            time.sleep(celebration_seconds() + 1)
         elif cmd == "boot":
             boot_starting()
             time.sleep(5)
@@ -575,7 +785,7 @@ if __name__ == "__main__":
             boot_ready()
             time.sleep(5)
         else:
-            print("Commands: test, red, green, blue, chase, fade, boot")
+            print("Commands: test, red, green, blue, chase, fade, complete, boot")
     except KeyboardInterrupt:
         print("\nStopped")
     
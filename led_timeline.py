@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+LED Timeline Engine for autoRain - declarative effects, one renderer
+
+Effects are descriptions evaluated at a time offset, not loops:
+  Solid      - a fixed frame
+  Keyframes  - colors at points in time with an easing per segment, optionally looping
+  Chase      - rotating rainbow, speed may change while it runs
+  Sequence   - effects played back to back (the last one holds or loops)
+  Clip       - any effect cut to a duration, then holding its last frame
+
+A single Renderer thread samples the current effect at a fixed frame rate
+and writes the frame out. play() only swaps the effect and returns at once;
+the previous effect keeps animating while it cross-fades into the new one,
+so nothing ever has to be stopped or joined.
+
+A frame is a flat 9-tuple: LED1 R,G,B  LED2 R,G,B  LED3 R,G,B (0-255).
+"""
+
+import bisect
+import colorsys
+import logging
+import math
+import threading
+import time
+
+log = logging.getLogger("autorain.led")
+
+LED_COUNT = 3
+OFF = (0,) * (LED_COUNT * 3)
+
+
+# ================= COLORS =================
+
+def hue_to_rgb(hue):
+    """Convert hue (0.0-1.0) to RGB (0-255)."""
+    r, g, b = colorsys.hsv_to_rgb(hue % 1.0, 1.0, 1.0)
+    return int(r * 255), int(g * 255), int(b * 255)
+
+
+def to_frame(color):
+    """(r, g, b) for all LEDs, or ((r, g, b), (r, g, b), (r, g, b)) per LED."""
+    if len(color) == 3 and isinstance(color[0], (tuple, list)):
+        return tuple(int(v) for rgb in color for v in rgb)
+    if len(color) == 3:
+        return tuple(int(v) for v in color) * LED_COUNT
+    return tuple(int(v) for v in color)
+
+
+def mix(a, b, t):
+    """Blend two frames, t=0 -> a, t=1 -> b."""
+    return tuple(int(x + (y - x) * t + 0.5) for x, y in zip(a, b))
+
+
+def scale(frame, k):
+    return tuple(int(v * k) for v in frame)
+
+
+# ================= EASING =================
+
+def linear(t):
+    return t
+
+
+def ease_in(t):
+    return t * t
+
+
+def ease_out(t):
+    return 1 - (1 - t) * (1 - t)
+
+
+def ease_in_out(t):
+    return 0.5 - 0.5 * math.cos(math.pi * t)
+
+
+def step(t):
+    """Hold the previous keyframe, jump at the end of the segment."""
+    return 1.0 if t >= 1.0 else 0.0
+
+
+EASINGS = {
+    "linear": linear,
+    "ease_in": ease_in,
+    "ease_out": ease_out,
+    "ease_in_out": ease_in_out,
+    "step": step,
+}
+
+
+# ================= EFFECTS =================
+
+class Solid:
+    """A fixed color; duration only matters inside a Sequence."""
+
+    def __init__(self, color, duration=None):
+        self.frame = to_frame(color)
+        self.duration = duration
+
+    def render(self, t):
+        return self.frame
+
+
+class Keyframes:
+    """
+    Colors at points in time.
+
+    keyframes: [(time, color), (time, color, easing), ...] sorted by time;
+    the easing (name or function) shapes the segment arriving at that key.
+    With loop=True the timeline repeats every `duration` seconds.
+    """
+
+    def __init__(self, keyframes, loop=False):
+        if not keyframes:
+            raise ValueError("at least one keyframe required")
+        self.times = []
+        self.frames = []
+        self.easings = []
+        for key in keyframes:
+            easing = key[2] if len(key) > 2 else linear
+            self.times.append(float(key[0]))
+            self.frames.append(to_frame(key[1]))
+            self.easings.append(EASINGS[easing] if isinstance(easing, str) else easing)
+        self.loop = loop
+        self.length = self.times[-1]
+        self.duration = None if loop else self.length
+
+    def render(self, t):
+        if self.loop and self.length > 0:
+            t %= self.length
+        i = bisect.bisect_right(self.times, t)
+        if i == 0:
+            return self.frames[0]
+        if i >= len(self.times):
+            return self.frames[-1]
+        t0, t1 = self.times[i - 1], self.times[i]
+        k = self.easings[i]((t - t0) / (t1 - t0)) if t1 > t0 else 1.0
+        return mix(self.frames[i - 1], self.frames[i], k)
+
+
+class Chase:
+    """
+    Rainbow rotation; each LED `offset` further round the hue wheel.
+
+    speed is 1-100 or a callable returning it, so the rate can change while
+    the effect runs (hue is integrated, not recomputed from t). `rate`
+    overrides speed with a fixed number of hue turns per second.
+    """
+
+    def __init__(self, speed=50, offset=0.15, duration=None, brightness=1.0, rate=None):
+        self.speed = speed
+        self.rate = rate
+        self.offset = offset
+        self.duration = duration
+        self.brightness = brightness
+        self._hue = 0.0
+        self._last_t = 0.0
+
+    def hue_rate(self):
+        """Hue turns per second for the current speed."""
+        if self.rate is not None:
+            return self.rate
+        speed = self.speed() if callable(self.speed) else self.speed
+        return (0.001 + (speed / 100.0) * 0.019) / 0.02
+
+    def render(self, t):
+        if self.duration is not None:
+            t = min(t, self.duration)
+        if t > self._last_t:
+            self._hue += self.hue_rate() * (t - self._last_t)
+            self._last_t = t
+        frame = ()
+        for i in range(LED_COUNT):
+            frame += hue_to_rgb(self._hue + self.offset * i)
+        return scale(frame, self.brightness) if self.brightness != 1.0 else frame
+
+
+class Sequence:
+    """Effects played one after another; an open-ended effect must come last."""
+
+    def __init__(self, effects):
+        self.effects = list(effects)
+        self.starts = []
+        total = 0.0
+        for effect in self.effects:
+            self.starts.append(total)
+            if effect.duration is None:
+                total = None
+                break
+            total += effect.duration
+        self.duration = total
+
+    def render(self, t):
+        for start, effect in zip(reversed(self.starts), reversed(self.effects[:len(self.starts)])):
+            if t >= start:
+                return effect.render(t - start)
+        return self.effects[0].render(0.0)
+
+
+class Clip:
+    """Play `effect` for `duration` seconds, then hold its last frame."""
+
+    def __init__(self, effect, duration):
+        self.effect = effect
+        self.duration = duration
+
+    def render(self, t):
+        return self.effect.render(min(t, self.duration))
+
+
+# ================= RENDERER =================
+
+class Renderer:
+    """Samples the current effect at a fixed frame rate and writes frames."""
+
+    def __init__(self, write, fps=50, clock=time.monotonic):
+        """
+        Args:
+            write: callable(frame) that outputs a 9-tuple frame
+            fps: frames per second
+            clock: monotonic time source (seconds)
+        """
+        self.write = write
+        self.fps = fps
+        self.clock = clock
+        self.frame = OFF
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # held while a frame is rendered and written
+        self._effect = None
+        self._start = 0.0
+        self._from = None
+        self._from_start = 0.0
+        self._fade_start = 0.0
+        self._fade = 0.0
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def effect(self):
+        return self._effect
+
+    def play(self, effect, fade=0.0):
+        """Switch to `effect`, cross-fading over `fade` seconds. Never blocks."""
+        now = self.clock()
+        with self._lock:
+            if self._from is not None and now - self._fade_start < self._fade:
+                # Already mid-fade: start the new fade from what is on screen
+                self._from, self._from_start = Solid(self.frame), now
+            elif self._effect is not None:
+                self._from, self._from_start = self._effect, self._start
+            else:
+                self._from, self._from_start = Solid(self.frame), now
+            self._effect = effect
+            self._start = now
+            self._fade_start = now
+            self._fade = fade
+        self.start()
+
+    def clear(self, fade=0.0):
+        """Fade to black and stop animating."""
+        self.play(Solid(OFF), fade)
+
+    def cancel(self):
+        """
+        Stop animating and write nothing more until the next play(), so a
+        direct write to the output stays. Returns once a frame already
+        being written is done.
+        """
+        with self._lock:
+            self._effect = None
+            self._from = None
+        with self._write_lock:
+            pass
+
+    def render(self, now):
+        """Compute the frame for time `now` (seconds on self.clock)."""
+        with self._lock:
+            effect, start = self._effect, self._start
+            source, source_start = self._from, self._from_start
+            fade_start, fade = self._fade_start, self._fade
+        if effect is None:
+            return None
+        frame = effect.render(now - start)
+        if source is not None and fade > 0 and now - fade_start < fade:
+            frame = mix(source.render(now - source_start), frame, (now - fade_start) / fade)
+        return frame
+
+    def _run(self):
+        interval = 1.0 / self.fps
+        next_tick = self.clock()
+        while not self._stop.is_set():
+            with self._write_lock:
+                frame = self.render(next_tick)
+                if frame is not None and frame != self.frame:
+                    self.frame = frame
+                    try:
+                        self.write(frame)
+                    except Exception as e:
+                        log.debug(f"[led] Frame write failed: {e}")
+            next_tick += interval
+            delay = next_tick - self.clock()
+            if delay < 0:
+                # Fell behind - drop frames instead of bursting to catch up
+                next_tick = self.clock()
+                delay = 0
+            self._stop.wait(delay)
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="led-render")
+        self._thread.start()
+
+    def stop(self, timeout=0.5):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        self._thread = None
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Metrics for autoRain - Prometheus / OpenMetrics exporter, no dependencies
+
+Counters, gauges and histograms live in one registry; start_server() serves
+them over plain HTTP from a daemon thread:
+
+    curl http://<box>:9464/metrics
+
+The Prometheus text format (0.0.4) is returned by default, OpenMetrics when
+the scraper asks for application/openmetrics-text. Recording a value is a
+dict update under a lock, cheap enough for the palera1n loop.
+
+Run `python3 metrics.py [PORT]` to serve the process metrics for testing.
+"""
+
+import bisect
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger("autorain.metrics")
+
+DEFAULT_PORT = 9464
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_server = None
+
+
+# ================= METRIC TYPES =================
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+
+def _labels_text(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _num(v):
+    if v == float("inf"):
+        return "+Inf"
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return repr(v) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    """
+    Base metric.
+
+    func: optional callable evaluated at scrape time instead of stored
+    values, returning a number (no labels) or {label values tuple: number}.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name, help, labels=(), func=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self.func = func
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def samples(self):
+        """[(suffix, label values, extra labels, value), ...]"""
+        if self.func is not None:
+            return self._callback_samples()
+        with self._lock:
+            return [("", k, (), v) for k, v in self._values.items()]
+
+    def _callback_samples(self):
+        try:
+            result = self.func()
+        except Exception as e:
+            log.debug(f"[metrics] {self.name} callback failed: {e}")
+            return []
+        if result is None:
+            return []
+        if isinstance(result, dict):
+            return [("", tuple(str(x) for x in k), (), v) for k, v in result.items()]
+        return [("", (), (), result)]
+
+
+class Counter(_Metric):
+    """Monotonic count; name should end in _total."""
+
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """Value that goes up and down."""
+
+    type = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Bucketed observations with sum and count."""
+
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def time(self, **labels):
+        """Context manager observing the elapsed time of a block."""
+        return _Timer(self, labels)
+
+    def samples(self):
+        out = []
+        with self._lock:
+            items = [(k, (list(e[0]), e[1], e[2])) for k, e in self._values.items()]
+        for key, (counts, total, count) in items:
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                running += n
+                out.append(("_bucket", key, (("le", _num(float(bound))),), running))
+            out.append(("_sum", key, (), total))
+            out.append(("_count", key, (), count))
+        return out
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.monotonic() - self.start, **self.labels)
+
+
+# ================= REGISTRY =================
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Add a metric; registering the same name again returns the existing one."""
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"metric {metric.name} already registered as {existing.type}")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def render(self, openmetrics=False):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for m in metrics:
+            family = m.name
+            if openmetrics and m.type == "counter" and family.endswith("_total"):
+                family = family[:-len("_total")]
+            lines.append(f"# HELP {family} {m.help}")
+            lines.append(f"# TYPE {family} {m.type}")
+            for suffix, key, extra, value in m.samples():
+                lines.append(f"{m.name}{suffix}{_labels_text(m.labelnames, key, extra)} {_num(value)}")
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help, labels=(), func=None):
+    return REGISTRY.register(Counter(name, help, labels, func))
+
+
+def gauge(name, help, labels=(), func=None):
+    return REGISTRY.register(Gauge(name, help, labels, func))
+
+
+def histogram(name, help, labels=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, help, labels, buckets))
+
+
+# ================= PROCESS METRICS =================
+
+def _proc_stat():
+    with open("/proc/self/stat") as f:
+        return f.read().rsplit(")", 1)[1].split()
+
+
+def _cpu_seconds():
+    fields = _proc_stat()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _rss_bytes():
+    return int(_proc_stat()[21]) * os.sysconf("SC_PAGE_SIZE")
+
+
+_START_TIME = time.time()
+
+counter("process_cpu_seconds_total", "Total user and system CPU time in seconds", func=_cpu_seconds)
+gauge("process_resident_memory_bytes", "Resident memory size in bytes", func=_rss_bytes)
+gauge("process_start_time_seconds", "Start time of the process since epoch", func=lambda: _START_TIME)
+gauge("process_threads", "Number of threads", func=threading.active_count)
+
+
+# ================= HTTP SERVER =================
+
+def _handler_class():
+    # http.server pulls in email/html/mimetypes; only import it when serving
+    from http.server import BaseHTTPRequestHandler
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] == "/metrics":
+                openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+                body = REGISTRY.render(openmetrics).encode()
+                ctype = ("application/openmetrics-text; version=1.0.0; charset=utf-8" if openmetrics
+                         else "text/plain; version=0.0.4; charset=utf-8")
+                status = 200
+            elif self.path == "/healthz":
+                body, ctype, status = b"ok\n", "text/plain", 200
+            else:
+                body, ctype, status = b"not found\n", "text/plain", 404
+            self.send_response(status)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return _Handler
+
+
+def start_server(port=DEFAULT_PORT, addr="0.0.0.0"):
+    """Serve /metrics from a daemon thread. Returns the server (port 0 = any free port)."""
+    global _server
+
+    if _server is not None:
+        return _server
+    from http.server import ThreadingHTTPServer
+    _server = ThreadingHTTPServer((addr, port), _handler_class())
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, daemon=True, name="metrics-http").start()
+    log.info(f"[metrics] Serving on http://{addr}:{_server.server_address[1]}/metrics")
+    return _server
+
+
+def stop_server():
+    global _server
+
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
+    start_server(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
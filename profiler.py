@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Sampling Profiler for autoRain - toggled by signal, flame graph output
+
+While running, a sampler thread snapshots every thread's stack with
+sys._current_frames() at a fixed rate and counts identical stacks. When it
+is stopped it writes collapsed stacks ("thread;outer;...;inner count"),
+ready for flamegraph.pl or speedscope:
+
+    kill -USR1 <pid>     # start sampling
+    kill -USR1 <pid>     # stop, writes /tmp/autorain-profile-<pid>-<time>.folded
+    flamegraph.pl /tmp/autorain-profile-*.folded > profile.svg
+
+When off, the only cost is the installed signal handler.
+
+StartupTrace (autoRain.py --startup-trace) times every module import, like
+`python3 -X importtime`, plus named startup phases up to the first LED.
+"""
+
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+
+log = logging.getLogger("autorain.profiler")
+
+DEFAULT_INTERVAL = 0.005  # seconds between samples (200 Hz)
+DEFAULT_OUTPUT_DIR = "/tmp"
+
+_profiler = None
+
+
+class SamplingProfiler:
+    """Counts collapsed stacks of all threads until stopped."""
+
+    def __init__(self, interval=DEFAULT_INTERVAL, output_dir=DEFAULT_OUTPUT_DIR, lines=False):
+        """
+        Args:
+            interval: seconds between samples
+            output_dir: where .folded files are written
+            lines: include line numbers in frames (finer, larger output)
+        """
+        self.interval = interval
+        self.output_dir = output_dir
+        self.lines = lines
+        self.samples = 0
+        self.last_output = None
+        self._counts = {}
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _frame_name(self, frame):
+        code = frame.f_code
+        name = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+        return f"{name}:{frame.f_lineno}" if self.lines else name
+
+    def _sample(self, own_ident):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_name(frame))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            key = ";".join(reversed(stack))
+            self._counts[key] = self._counts.get(key, 0) + 1
+        self.samples += 1
+
+    def _run(self):
+        own = threading.get_ident()
+        started = time.monotonic()
+        next_tick = started
+        while not self._stop.is_set():
+            self._sample(own)
+            next_tick += self.interval
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                next_tick = time.monotonic()
+                delay = 0
+            self._stop.wait(delay)
+        self.last_output = self.write()
+        log.info(f"[profiler] Stopped after {time.monotonic() - started:.1f}s, "
+                 f"{self.samples} samples -> {self.last_output}")
+
+    def start(self):
+        if self.running:
+            return
+        self._counts = {}
+        self.samples = 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="profiler")
+        self._thread.start()
+        log.info(f"[profiler] Sampling every {self.interval * 1000:.1f} ms")
+
+    def stop(self, wait=False):
+        """Stop sampling; the sampler thread writes the output as it exits."""
+        self._stop.set()
+        if wait and self._thread is not None:
+            self._thread.join()
+
+    def toggle(self):
+        if self.running:
+            self.stop()
+        else:
+            self.start()
+
+    def collapsed(self):
+        """Collapsed-stack text, heaviest stacks first."""
+        items = sorted(self._counts.items(), key=lambda kv: -kv[1])
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    def write(self, path=None):
+        if path is None:
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            path = os.path.join(self.output_dir, f"autorain-profile-{os.getpid()}-{stamp}.folded")
+        try:
+            with open(path, "w") as f:
+                f.write(self.collapsed())
+        except OSError as e:
+            log.warning(f"[profiler] Cannot write {path}: {e}")
+            return None
+        return path
+
+
+def install(signum=signal.SIGUSR1, interval=DEFAULT_INTERVAL, output_dir=DEFAULT_OUTPUT_DIR):
+    """Toggle a process-wide profiler with `signum` (call from the main thread)."""
+    global _profiler
+
+    _profiler = SamplingProfiler(interval, output_dir)
+    signal.signal(signum, lambda sig, frame: _profiler.toggle())
+    log.info(f"[profiler] kill -{signal.Signals(signum).name[3:]} {os.getpid()} to start/stop sampling")
+    return _profiler
+
+
+# ================= STARTUP TRACE =================
+
+def _process_age():
+    """Seconds since the kernel started this process (10 ms resolution)."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _TimedLoader:
+    """Wraps a module loader to time exec_module()."""
+
+    def __init__(self, loader, trace):
+        self._loader = loader
+        self._trace = trace
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._trace._enter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._trace._leave(module.__name__)
+
+
+class StartupTrace:
+    """
+    Per-module import times and named startup phases.
+
+    Creating one installs an import hook (main thread only); stop() removes
+    it. phase(name) marks the end of a startup step.
+    """
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        age = _process_age()
+        self.phases = [("interpreter", age or 0.0)]
+        self.offset = age or 0.0
+        self.imports = []  # (module, self seconds, cumulative seconds, depth)
+        self._stack = []
+        self._main = threading.main_thread()
+        sys.meta_path.insert(0, self)
+
+    def find_spec(self, name, path=None, target=None):
+        if threading.current_thread() is not self._main:
+            return None
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, self)
+        return spec
+
+    def _enter(self):
+        self._stack.append([time.perf_counter(), 0.0])
+
+    def _leave(self, name):
+        start, children = self._stack.pop()
+        total = time.perf_counter() - start
+        if self._stack:
+            self._stack[-1][1] += total
+        self.imports.append((name, total - children, total, len(self._stack)))
+
+    def phase(self, name):
+        """Mark the end of startup step `name`."""
+        self.phases.append((name, self.offset + time.perf_counter() - self.t0))
+
+    def stop(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def report(self, top=20):
+        """Phase timeline and the slowest imports as text."""
+        lines = ["startup trace (ms since process start)"]
+        prev = 0.0
+        for name, at in self.phases:
+            lines.append(f"  {name:<24}{at * 1000:9.1f}  +{(at - prev) * 1000:.1f}")
+            prev = at
+        lines.append(f"imports: {len(self.imports)} modules, self / cumulative ms, slowest first")
+        slowest = sorted(self.imports, key=lambda i: -i[2])[:top]
+        for name, own, total, depth in slowest:
+            lines.append(f"  {own * 1000:8.1f} {total * 1000:9.1f}  {'  ' * depth}{name}")
+        return "\n".join(lines)
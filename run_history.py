@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Run History for autoRain - per-session records in SQLite
+
+Each autoRain session (one device) is a row in `runs`; every stage
+transition is a row in `stages` with the time spent in the stage before it.
+Writes go through a background thread so the palera1n loop never waits on
+the SD card.
+
+Report:
+  python3 autoRain.py stats [--db PATH] [--hours N] [--json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+import urllib.parse
+
+log = logging.getLogger("autorain.history")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id            INTEGER PRIMARY KEY,
+    started       REAL NOT NULL,
+    finished      REAL,
+    outcome       TEXT,
+    retries       INTEGER NOT NULL DEFAULT 0,
+    retry_prompts INTEGER NOT NULL DEFAULT 0,
+    bt_connect_s  REAL,
+    total_s       REAL
+);
+CREATE TABLE IF NOT EXISTS stages (
+    run_id     INTEGER NOT NULL REFERENCES runs(id),
+    stage      TEXT NOT NULL,
+    prev_stage TEXT,
+    at         REAL NOT NULL,
+    duration   REAL,
+    attempt    INTEGER
+);
+CREATE TABLE IF NOT EXISTS retries (
+    run_id  INTEGER NOT NULL REFERENCES runs(id),
+    reason  TEXT NOT NULL,
+    stage   TEXT,
+    attempt INTEGER,
+    cost_s  REAL,
+    at      REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_started ON runs(started);
+CREATE INDEX IF NOT EXISTS idx_runs_outcome ON runs(outcome);
+CREATE INDEX IF NOT EXISTS idx_stages_run ON stages(run_id);
+CREATE INDEX IF NOT EXISTS idx_stages_prev ON stages(prev_stage);
+CREATE INDEX IF NOT EXISTS idx_retries_run ON retries(run_id);
+"""
+
+
+def connect(path):
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(SCHEMA)
+    return db
+
+
+def connect_readonly(path):
+    """Open an existing database without creating or changing it."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"no run history at {path}")
+    return sqlite3.connect(f"file:{urllib.parse.quote(os.path.abspath(path))}?mode=ro", uri=True)
+
+
+# ================= RECORDER =================
+
+class RunHistory:
+    """Records one session; every method returns without touching the disk."""
+
+    def __init__(self, path):
+        self.path = path
+        self.run_id = None
+        self.started = None
+        self.finished = False
+        self._queue = queue.SimpleQueue()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._writer, daemon=True, name="history")
+        self._thread.start()
+
+    def _writer(self):
+        try:
+            db = connect(self.path)
+        except sqlite3.Error as e:
+            log.warning(f"[history] Cannot open {self.path}: {e}")
+            self._ready.set()
+            return
+        self._ready.set()
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            sql, params = item
+            try:
+                if sql == "start":
+                    self.run_id = db.execute(
+                        "INSERT INTO runs (started) VALUES (?)", params
+                    ).lastrowid
+                else:
+                    db.execute(sql, (*params, self.run_id))
+                db.commit()
+            except sqlite3.Error as e:
+                log.warning(f"[history] Write failed: {e}")
+        db.close()
+
+    def _submit(self, sql, *params):
+        self._queue.put((sql, params))
+
+    def start_run(self):
+        self.started = time.time()
+        self._submit("start", self.started)
+
+    def record_stage(self, stage, prev_stage=None, at=None, duration=None, attempt=None):
+        self._submit(
+            "INSERT INTO stages (stage, prev_stage, at, duration, attempt, run_id) VALUES (?, ?, ?, ?, ?, ?)",
+            stage, prev_stage, at or time.time(), duration, attempt,
+        )
+
+    def add_retry(self, prompted=False, reason=None, stage=None, attempt=None, cost=None):
+        """Count a retry; with a reason it is also kept with its stage and cost (s)."""
+        self._submit(
+            "UPDATE runs SET retries = retries + 1, retry_prompts = retry_prompts + ? WHERE id = ?",
+            1 if prompted else 0,
+        )
+        if reason is not None:
+            self._submit(
+                "INSERT INTO retries (reason, stage, attempt, cost_s, at, run_id) VALUES (?, ?, ?, ?, ?, ?)",
+                reason, stage, attempt, cost, time.time(),
+            )
+
+    def set_bt_connect(self, seconds):
+        self._submit("UPDATE runs SET bt_connect_s = ? WHERE id = ?", seconds)
+
+    def finish(self, outcome):
+        if self.finished or self.started is None:
+            return
+        self.finished = True
+        now = time.time()
+        self._submit(
+            "UPDATE runs SET finished = ?, outcome = ?, total_s = ? WHERE id = ?",
+            now, outcome, now - self.started,
+        )
+
+    def close(self, timeout=2.0):
+        """Write everything queued and close the database."""
+        self._queue.put(None)
+        self._thread.join(timeout=timeout)
+
+
+# ================= REPORT =================
+
+def percentile(values, pct):
+    """Linear-interpolated percentile of a list, None if empty."""
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def _summary(values):
+    return {
+        "n": len(values),
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else None,
+    }
+
+
+def report(path, hours=None):
+    """Aggregate statistics for finished runs (optionally only the last N hours)."""
+    db = connect_readonly(path)
+    since = time.time() - hours * 3600 if hours else 0
+
+    runs = db.execute(
+        "SELECT started, finished, outcome, retries, retry_prompts, bt_connect_s, total_s "
+        "FROM runs WHERE started >= ? AND finished IS NOT NULL ORDER BY started",
+        (since,),
+    ).fetchall()
+
+    stage_rows = db.execute(
+        "SELECT s.prev_stage, s.duration FROM stages s JOIN runs r ON r.id = s.run_id "
+        "WHERE r.started >= ? AND s.prev_stage IS NOT NULL AND s.duration IS NOT NULL",
+        (since,),
+    ).fetchall()
+
+    retry_rows = db.execute(
+        "SELECT t.reason, t.cost_s FROM retries t JOIN runs r ON r.id = t.run_id "
+        "WHERE r.started >= ? AND t.cost_s IS NOT NULL",
+        (since,),
+    ).fetchall()
+    db.close()
+
+    successes = [r for r in runs if r[2] == "success"]
+    span_h = (runs[-1][1] - runs[0][0]) / 3600 if runs else 0
+
+    stages = {}
+    for stage, duration in stage_rows:
+        stages.setdefault(stage, []).append(duration)
+
+    retry_costs = {}
+    for reason, cost in retry_rows:
+        retry_costs.setdefault(reason, []).append(cost)
+
+    return {
+        "runs": len(runs),
+        "successes": len(successes),
+        "success_rate": len(successes) / len(runs) if runs else None,
+        "devices_per_hour": len(successes) / span_h if span_h > 0 else None,
+        "retries": sum(r[3] for r in runs),
+        "retry_prompts": sum(r[4] for r in runs),
+        "total_s": _summary([r[6] for r in runs if r[6] is not None]),
+        "success_total_s": _summary([r[6] for r in successes if r[6] is not None]),
+        "bt_connect_s": _summary([r[5] for r in runs if r[5] is not None]),
+        "retries_per_run": _summary([r[3] for r in runs]),
+        "stage_s": {name: _summary(v) for name, v in sorted(stages.items())},
+        "retry_cost_s": {reason: _summary(v) for reason, v in sorted(retry_costs.items())},
+    }
+
+
+def _fmt(v):
+    if v is None:
+        return "-"
+    return f"{v:.2f}" if isinstance(v, float) else str(v)
+
+
+def print_report(stats):
+    print(f"Runs:            {stats['runs']}")
+    print(f"Successes:       {stats['successes']}")
+    rate = stats["success_rate"]
+    print(f"Success rate:    {'-' if rate is None else f'{rate * 100:.1f}%'}")
+    print(f"Devices/hour:    {_fmt(stats['devices_per_hour'])}")
+    print(f"Retries:         {stats['retries']} ({stats['retry_prompts']} retry prompts played)")
+    print()
+    print(f"{'seconds':<24}{'n':>5}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}")
+    rows = [
+        ("total", stats["total_s"]),
+        ("total (success)", stats["success_total_s"]),
+        ("bt connect", stats["bt_connect_s"]),
+    ] + [(f"stage {k}", v) for k, v in stats["stage_s"].items()] \
+      + [(f"retry {k}", v) for k, v in stats["retry_cost_s"].items()]
+    for name, s in rows:
+        print(f"{name:<24}{s['n']:>5}{_fmt(s['p50']):>9}{_fmt(s['p90']):>9}"
+              f"{_fmt(s['p99']):>9}{_fmt(s['max']):>9}")
+
+
+def main(argv, path):
+    """`autoRain.py stats`; path is the default database (config history.db)."""
+    parser = argparse.ArgumentParser(prog="autoRain.py stats", description="autoRain run statistics")
+    parser.add_argument("--db", default=path, help=f"history database (default {path})")
+    parser.add_argument("--hours", type=float, help="only runs started in the last N hours")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args(argv)
+
+    try:
+        stats = report(args.db, args.hours)
+    except FileNotFoundError as e:
+        print(e, file=sys.stderr)
+        return 1
+    except sqlite3.Error as e:
+        print(f"cannot read run history {args.db}: {e}", file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps(stats, indent=2))
+    else:
+        print_report(stats)
+    return 0
+
+
+if __name__ == "__main__":
+    import config
+
+    try:
+        db_path = config.load().history.db
+    except (config.ConfigError, OSError) as e:
+        print(f"run_history: {e} - using built-in defaults", file=sys.stderr)
+        db_path = config.DEFAULTS["history"]["db"]
+    sys.exit(main(sys.argv[1:], db_path))
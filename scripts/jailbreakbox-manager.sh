@@ -15,10 +15,14 @@ STARTUP_DELAY=60
 NETWORK_MANAGER_WAIT=60
 KNOWN_WIFI_SSID="lasagna|IoT|Service|gamestream"
 
-# LED GPIO pins
-LED1_R=230 LED1_G=71 LED1_B=74
-LED2_R=233 LED2_G=72 LED2_B=75
-LED3_R=69  LED3_G=72 LED3_B=233
+# LED GPIO pins - shared with led_controller.py through the autoRain config
+# file ([leds] in autorain.toml); the fallbacks match its defaults
+AUTORAIN_DIR="${AUTORAIN_DIR:-/home/orangepi/autoRain}"
+eval "$(python3 "$AUTORAIN_DIR/config.py" shell leds 2>/dev/null)"
+LED_CHIP="${AUTORAIN_LEDS_CHIP:-/dev/gpiochip1}"
+read -r LED1_R LED1_G LED1_B <<< "${AUTORAIN_LEDS_LED1:-232 75 71}"
+read -r LED2_R LED2_G LED2_B <<< "${AUTORAIN_LEDS_LED2:-230 74 233}"
+read -r LED3_R LED3_G LED3_B <<< "${AUTORAIN_LEDS_LED3:-69 73 72}"
 
 # State and logging
 STATE_DIR="/var/run/jailbreakbox-manager"
@@ -114,18 +118,28 @@ stop_ap() {
 # LED CONTROL
 # =============================================
 
+# led_set VALUE PIN... - drive the given lines high (1) or low (0)
+led_set() {
+    local value=$1 args=() pin
+    shift
+    for pin in "$@"; do
+        args+=("$pin=$value")
+    done
+    gpioset "$LED_CHIP" "${args[@]}" 2>/dev/null
+}
+
 leds_all_off() {
-    gpioset gpiochip1 230=0 71=0 72=0 73=0 74=0 75=0 69=0 233=0 2>/dev/null
+    led_set 0 $LED1_R $LED1_G $LED1_B $LED2_R $LED2_G $LED2_B $LED3_R $LED3_G $LED3_B
 }
 
-led1_on() { gpioset gpiochip1 230=1 71=1 74=1 2>/dev/null; }
-led1_off() { gpioset gpiochip1 230=0 71=0 74=0 2>/dev/null; }
+led1_on() { led_set 1 $LED1_R $LED1_G $LED1_B; }
+led1_off() { led_set 0 $LED1_R $LED1_G $LED1_B; }
 
-led2_on() { gpioset gpiochip1 233=1 72=1 75=1 2>/dev/null; }
-led2_off() { gpioset gpiochip1 233=0 72=0 75=0 2>/dev/null; }
+led2_on() { led_set 1 $LED2_R $LED2_G $LED2_B; }
+led2_off() { led_set 0 $LED2_R $LED2_G $LED2_B; }
 
-led3_on() { gpioset gpiochip1 69=1 73=1 233=1 2>/dev/null; }
-led3_off() { gpioset gpiochip1 69=0 73=0 233=0 2>/dev/null; }
+led3_on() { led_set 1 $LED3_R $LED3_G $LED3_B; }
+led3_off() { led_set 0 $LED3_R $LED3_G $LED3_B; }
 
 pulse_green() {
     log "Starting green pulse (hotspot mode)"
@@ -136,7 +150,7 @@ pulse_green() {
     local direction=1
     
     while true; do
-        gpioset gpiochip1 $LED2_G=$((brightness * 5 / 100)) \
+        gpioset "$LED_CHIP" $LED2_G=$((brightness * 5 / 100)) \
                      $LED2_R=0 $LED2_B=0 2>/dev/null
         
         brightness=$((brightness + direction))
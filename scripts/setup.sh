@@ -28,6 +28,10 @@ cp "$SCRIPT_DIR/power/speaker-power.service" /etc/systemd/system/
 cp "$SCRIPT_DIR/scripts/autoRain-wait.service" /etc/systemd/system/
 cp "$SCRIPT_DIR/scripts/network-check.service" /etc/systemd/system/
 cp "$SCRIPT_DIR/scripts/shellinabox-keeper.service" /etc/systemd/system/
+cp "$SCRIPT_DIR/configs/autorain.service" /etc/systemd/system/
+
+# autorain.service needs the orangepi user manager (PipeWire) without a login
+loginctl enable-linger orangepi
 
 systemctl daemon-reload
 
@@ -37,6 +41,7 @@ systemctl enable speaker-power.service
 systemctl enable autoRain-wait.service
 systemctl enable network-check.service
 systemctl enable shellinabox-keeper.service
+systemctl enable autorain.service
 
 echo "[5/6] Starting services..."
 systemctl start bluetooth-detect.service
@@ -52,6 +57,7 @@ echo "  - Bluetooth Detection: systemctl status bluetooth-detect.service"
 echo "  - Auto Rain Wait: systemctl status autoRain-wait.service"
 echo "  - Network Check: systemctl status network-check.service"
 echo "  - Shellinabox Keeper: systemctl status shellinabox-keeper.service"
+echo "  - autoRain: systemctl status autorain.service (starts on next boot)"
 echo ""
 echo "Workflow:"
 echo "  1. Power on → Kernel loads → Bluetooth starts"
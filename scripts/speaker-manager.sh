@@ -3,8 +3,11 @@
 # Handles speaker power cycle, connection, and audio routing
 # Prioritizes headphone jack if detected, otherwise uses Bluetooth speaker
 
-SPEAKER_MAC="11:81:AA:11:88:72"
-SPEAKER_POWER="/usr/local/bin/speaker-power.sh"
+# Speaker settings come from the autoRain config file ([bluetooth])
+AUTORAIN_DIR="${AUTORAIN_DIR:-/home/orangepi/autoRain}"
+eval "$(python3 "$AUTORAIN_DIR/config.py" shell bluetooth 2>/dev/null)"
+SPEAKER_MAC="${AUTORAIN_BLUETOOTH_MAC:-11:81:AA:11:88:72}"
+SPEAKER_POWER="${AUTORAIN_BLUETOOTH_POWER_SCRIPT:-/usr/local/bin/speaker-power.sh}"
 LOG_FILE="/home/orangepi/speaker-manager.log"
 
 log() {
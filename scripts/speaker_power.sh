@@ -3,16 +3,21 @@
 # Hold low for 3 seconds to toggle power, then release high
 
 BIN="/usr/bin/gpioset"
-GPIOCHIP="gpiochip1"
-LINE="79"
+
+# Line and hold time from the autoRain config file ([bluetooth] power_*)
+AUTORAIN_DIR="${AUTORAIN_DIR:-/home/orangepi/autoRain}"
+eval "$(python3 "$AUTORAIN_DIR/config.py" shell bluetooth 2>/dev/null)"
+GPIOCHIP="${AUTORAIN_BLUETOOTH_POWER_CHIP:-gpiochip1}"
+LINE="${AUTORAIN_BLUETOOTH_POWER_LINE:-79}"
+HOLD="${AUTORAIN_BLUETOOTH_POWER_HOLD:-3}"
 
 log() {
     echo "$(date '+%F %T') [speaker-power] $*" >> /home/orangepi/speaker-power.log
 }
 
-# Simple power toggle: press and hold for 3 seconds
-log "Pressing power button (hold for 3s)..."
+# Simple power toggle: press and hold
+log "Pressing power button (hold for ${HOLD}s)..."
 $BIN "$GPIOCHIP" "$LINE=0"
-sleep 3
+sleep "$HOLD"
 $BIN "$GPIOCHIP" "$LINE=1"
 log "Power toggle complete"
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+sd_notify for autoRain - systemd readiness, status and watchdog, no dependencies
+
+When autoRain runs as autorain.service (Type=notify) systemd passes a
+datagram socket in $NOTIFY_SOCKET. Through it we report:
+
+  READY=1     startup finished (LEDs up, waiting for the speaker)
+  STATUS=...  current stage, shown by `systemctl status autorain`
+  WATCHDOG=1  still alive; without it for WatchdogSec systemd restarts us
+  STOPPING=1  clean shutdown in progress
+
+Outside systemd (console, tmux, simulator) every call is a no-op.
+"""
+
+import logging
+import os
+import socket
+
+log = logging.getLogger("autorain.sd_notify")
+
+_socket = None
+_address = None
+
+
+def _connect():
+    """Open the notify socket once; False when not started by systemd."""
+    global _socket, _address
+
+    if _socket is not None:
+        return True
+    address = os.environ.get("NOTIFY_SOCKET")
+    if not address or address[0] not in "@/":
+        return False
+    if address[0] == "@":
+        address = "\0" + address[1:]  # abstract namespace
+    try:
+        _socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM | socket.SOCK_CLOEXEC)
+    except OSError as e:
+        log.debug(f"[sd_notify] Cannot create socket: {e}")
+        return False
+    _address = address
+    return True
+
+
+def notify(*assignments):
+    """Send VAR=value lines to systemd. Returns True if sent."""
+    if not _connect():
+        return False
+    try:
+        _socket.sendto("\n".join(assignments).encode(), _address)
+        return True
+    except OSError as e:
+        log.debug(f"[sd_notify] Send failed: {e}")
+        return False
+
+
+def ready(status=None):
+    return notify("READY=1", *([f"STATUS={status}"] if status else []))
+
+
+def status(text):
+    # One line only: a newline would start a new assignment
+    return notify(f"STATUS={text.splitlines()[0] if text else ''}")
+
+
+def stopping():
+    return notify("STOPPING=1")
+
+
+def watchdog_interval():
+    """WatchdogSec in seconds if systemd is watching this process, else None."""
+    usec = os.environ.get("WATCHDOG_USEC")
+    pid = os.environ.get("WATCHDOG_PID")
+    if not usec or (pid and pid != str(os.getpid())):
+        return None
+    try:
+        return int(usec) / 1e6
+    except ValueError:
+        return None
+
+
+def watchdog():
+    """Pet the watchdog; call from the main loop, never from a helper thread."""
+    if watchdog_interval() is None:
+        return False
+    return notify("WATCHDOG=1")
+
+
+if __name__ == "__main__":
+    import sys
+
+    # e.g. systemd-run --user -p Type=notify python3 sd_notify.py READY=1
+    sys.exit(0 if notify(*sys.argv[1:]) else 1)
@@ -0,0 +1,840 @@
+#!/usr/bin/env python3
+"""
+Simulator for autoRain - the whole pipeline without phone, speaker or board
+
+Runs the real autoRain.main() against fake tools in a scratch directory:
+
+  bluetoothctl, speaker-power.sh  - a speaker that toggles power, boots and
+                                    accepts connects per the scenario
+  pactl, mpg123                   - volume is recorded, prompts "play" for
+                                    their scenario duration; the speaker's
+                                    sink is listed while it is connected
+  headphone jack                  - a sysfs-like status file that reads
+                                    "plug" from the scenario's plugged_at
+  usbmuxd, sudo, pgrep            - socket appears after a delay; sudo just
+                                    runs the command; pgrep only sees fakes
+  palera1n                        - prints the strings run_palera1n()
+                                    expects, waits for Enter, hangs or exits,
+                                    one script per attempt
+
+autoRain's clock is replaced by a VirtualClock running `scale` times faster
+than real time and the fake tools share it, so a 60 s jailbreak runs in a
+few seconds while every duration (stages, run history, tool calls) is
+reported in virtual seconds. LEDs use the recorder GPIO backend.
+
+Process start-up of each fake tool (~10-20 ms real) is multiplied by the
+scale too; keep the scale moderate (default 20) when timings matter.
+
+Usage:
+  python3 simulator.py list
+  python3 simulator.py run [--scenario fast_dfu] [--scale 20] [--json out.json] [--keep DIR]
+"""
+
+import json
+import os
+import sys
+import time
+
+SCALE_ENV = "AUTORAIN_SIM_SCALE"
+EPOCH_ENV = "AUTORAIN_SIM_EPOCH"
+DIR_ENV = "AUTORAIN_SIM_DIR"
+
+DEFAULT_SCALE = 20.0
+
+# Subprocess/pexpect timeouts are real seconds; never shrink them below this
+MIN_REAL_TIMEOUT = 1.0
+
+TOOLS = ["bluetoothctl", "pactl", "mpg123", "pacat", "usbmuxd", "speaker-power.sh", "palera1n", "pgrep"]
+
+# ================= SCENARIOS =================
+#
+# speaker:  mac (the only device bluetoothctl knows), initially_on, press (speaker-power.sh hold), min_press (shortest
+#           hold that toggles), boot (power-on until connectable), connect
+#           (duration of a connect), page (until a connect to a powered-off
+#           speaker fails), fail_connects (connects refused after boot)
+# audio:    prompt file -> play time
+# sink:     suspend_after (idle seconds until the BT sink suspends), resume
+#           (seconds of a prompt lost while a suspended sink wakes up)
+# wired:    plugged_at (seconds until the headphone jack reads "plug";
+#           None = never)
+# usbmuxd:  start (until the socket exists)
+# palera1n: one script per attempt (the last one repeats); steps are
+#           ["say", delay, text], ["enter"], ["hang"], ["exit", code]
+
+SPEAKER = {"mac": "11:81:AA:11:88:72", "initially_on": False, "press": 3.0, "min_press": 1.0, "boot": 4.0, "connect": 0.5, "page": 5.12,
+           "fail_connects": 0}
+
+AUDIO = {"ready.mp3": 2.0, "step1.mp3": 4.0, "step2.mp3": 8.0, "complete.mp3": 3.0,
+         "retry.mp3": 2.0, "shutdown.mp3": 2.0}
+
+SINK = {"suspend_after": 5.0, "resume": 0.8}
+
+WIRED = {"plugged_at": None}
+
+DFU_OK = [
+    ["say", 0.5, "Waiting for devices"],
+    ["say", 4.0, "Entering recovery mode"],
+    ["say", 6.0, "Press Enter when ready for DFU mode"],
+    ["enter"],
+    ["say", 12.0, "Device entered DFU mode successfully"],
+    ["say", 8.0, "Found PongoOS USB Device"],
+    ["say", 2.0, "Booting Kernel..."],
+    ["hang"],
+]
+
+DFU_MISSED = [
+    ["say", 0.5, "Waiting for devices"],
+    ["say", 4.0, "Entering recovery mode"],
+    ["say", 6.0, "Press Enter when ready for DFU mode"],
+    ["enter"],
+    ["say", 20.0, "Timed out waiting for download mode"],
+    ["hang"],
+]
+
+# Second attempt: the device is already in recovery mode
+DFU_OK_RECOVERY = [
+    ["say", 0.5, "Waiting for devices"],
+    ["say", 1.0, "Press Enter when ready for DFU mode"],
+    ["enter"],
+    ["say", 12.0, "Device entered DFU mode successfully"],
+    ["say", 8.0, "Found PongoOS USB Device"],
+    ["say", 2.0, "Booting Kernel..."],
+    ["hang"],
+]
+
+NORMAL_MODE_LOOP = [
+    ["say", 0.5, "Waiting for devices"],
+    ["say", 3.0, "Entering normal mode"],
+    ["say", 25.0, "Entering normal mode"],
+    ["say", 25.0, "Entering recovery mode"],
+    ["say", 6.0, "Press Enter when ready for DFU mode"],
+    ["enter"],
+    ["say", 12.0, "Device entered DFU mode successfully"],
+    ["say", 8.0, "Found PongoOS USB Device"],
+    ["say", 2.0, "Booting Kernel..."],
+    ["hang"],
+]
+
+SCENARIOS = {
+    "fast_dfu": {
+        "description": "speaker connects on the first cycle, DFU succeeds first time",
+        "palera1n": [DFU_OK],
+    },
+    "missed_dfu": {
+        "description": "DFU window missed once, retry from recovery succeeds",
+        "palera1n": [DFU_MISSED, DFU_OK_RECOVERY],
+    },
+    "slow_speaker": {
+        "description": "speaker needs 9 s to boot and refuses the first connect",
+        "speaker": {"boot": 9.0, "fail_connects": 1},
+        "palera1n": [DFU_OK],
+    },
+    "normal_mode_loop": {
+        "description": "device reboots to normal mode twice before recovery",
+        "palera1n": [NORMAL_MODE_LOOP],
+    },
+    "palera1n_crash": {
+        "description": "palera1n exits unexpectedly once",
+        "palera1n": [[["say", 0.5, "Waiting for devices"], ["exit", 1]], DFU_OK_RECOVERY],
+    },
+    "dfu_stall": {
+        "description": "palera1n hangs silently after the DFU prompt once",
+        "palera1n": [[["say", 0.5, "Waiting for devices"], ["say", 4.0, "Entering recovery mode"],
+                      ["say", 6.0, "Press Enter when ready for DFU mode"], ["enter"], ["hang"]],
+                     DFU_OK_RECOVERY],
+    },
+    "speaker_on": {
+        "description": "speaker already powered and connectable at start",
+        "speaker": {"initially_on": True},
+        "palera1n": [DFU_OK],
+    },
+    "speaker_dead": {
+        "description": "speaker never connects, no jack: LED-only after the sink deadline",
+        "speaker": {"fail_connects": 999},
+        "palera1n": [DFU_OK],
+    },
+    "jack_plugged": {
+        "description": "headphones plugged in at start, the speaker is off",
+        "wired": {"plugged_at": 0.0},
+        "palera1n": [DFU_OK],
+    },
+    "late_jack": {
+        "description": "speaker never connects, headphones plugged in mid-run",
+        "speaker": {"fail_connects": 999},
+        "wired": {"plugged_at": 60.0},
+        "palera1n": [DFU_MISSED, DFU_OK_RECOVERY],
+    },
+}
+
+
+def scenario(name_or_dict):
+    """Full scenario dict (defaults filled in) from a name or partial dict."""
+    spec = SCENARIOS[name_or_dict] if isinstance(name_or_dict, str) else name_or_dict
+    return {
+        "description": spec.get("description", ""),
+        "speaker": dict(SPEAKER, **spec.get("speaker", {})),
+        "audio": dict(AUDIO, **spec.get("audio", {})),
+        "sink": dict(SINK, **spec.get("sink", {})),
+        "wired": dict(WIRED, **spec.get("wired", {})),
+        "usbmuxd": dict({"start": 0.3}, **spec.get("usbmuxd", {})),
+        "palera1n": spec.get("palera1n", [DFU_OK]),
+    }
+
+
+# ================= VIRTUAL CLOCK =================
+
+class VirtualClock:
+    """
+    Stand-in for the time module: virtual time runs `scale` times faster.
+
+    monotonic()/time()/perf_counter() return virtual seconds, sleep() takes
+    virtual seconds; everything else is delegated to the real time module.
+    """
+
+    def __init__(self, scale=DEFAULT_SCALE, epoch=None):
+        self.scale = scale
+        self.epoch = time.monotonic() if epoch is None else epoch
+        self._wall0 = time.time() - (time.monotonic() - self.epoch)
+
+    def elapsed(self):
+        return (time.monotonic() - self.epoch) * self.scale
+
+    def monotonic(self):
+        return self.epoch + self.elapsed()
+
+    def perf_counter(self):
+        return self.monotonic()
+
+    def time(self):
+        return self._wall0 + self.elapsed()
+
+    def sleep(self, seconds):
+        time.sleep(max(0.0, seconds) / self.scale)
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+# ================= FAKE TOOLS =================
+#
+# Each fake is `python3 -S simulator.py tool NAME ARGS...`; shared state
+# lives in state.json in the simulation directory, guarded by flock.
+
+class _Env:
+    def __init__(self):
+        self.dir = os.environ[DIR_ENV]
+        self.clock = VirtualClock(float(os.environ[SCALE_ENV]), float(os.environ[EPOCH_ENV]))
+        with open(os.path.join(self.dir, "scenario.json")) as f:
+            self.scenario = json.load(f)
+
+    def now(self):
+        return self.clock.elapsed()
+
+    def log_call(self, tool, args, **fields):
+        entry = {"t": round(self.now(), 3), "tool": tool, "args": args}
+        entry.update(fields)
+        with open(os.path.join(self.dir, "calls.jsonl"), "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def update(self, func):
+        """Apply func(state) under the state lock; returns its result."""
+        import fcntl
+
+        with open(os.path.join(self.dir, "state.json"), "r+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            state = json.load(f)
+            result = func(state)
+            f.seek(0)
+            f.truncate()
+            json.dump(state, f)
+        return result
+
+    def register(self, tool):
+        def add(state):
+            state["pids"].setdefault(tool, []).append(os.getpid())
+        self.update(add)
+
+
+def _speaker_ready(state, now, speaker):
+    s = state["speaker"]
+    return s["powered"] and now - s["on_at"] >= speaker["boot"]
+
+
+def _bt_command(env, args, timeout=None):
+    """One bluetoothctl command against the simulated speaker; (status, output lines)."""
+    speaker = env.scenario["speaker"]
+    cmd = args[0] if args else ""
+    mac = args[1] if len(args) > 1 else ""
+    if mac and mac.upper() != speaker["mac"].upper():
+        return 1, [f"Device {mac} not available"]
+
+    if cmd == "info":
+        connected = env.update(lambda st: st["speaker"]["connected"])
+        return 0, [f"Device {mac} (public)", f"\tConnected: {'yes' if connected else 'no'}"]
+
+    if cmd == "connect":
+        powered = env.update(lambda st: st["speaker"]["powered"])
+        duration = speaker["connect"] if powered else speaker["page"]
+        if timeout is not None and timeout < duration:
+            env.clock.sleep(timeout)
+            return 1, ["Timed out"]
+        env.clock.sleep(duration)
+
+        def connect(state):
+            s = state["speaker"]
+            if s["connected"]:
+                return "already"
+            if not _speaker_ready(state, env.now(), speaker):
+                return "fail"
+            s["connects"] += 1
+            if s["connects"] <= speaker["fail_connects"]:
+                return "fail"
+            s["connected"] = True
+            return "ok"
+
+        result = env.update(connect)
+        if result == "fail":
+            return 1, ["Failed to connect: org.bluez.Error.Failed"]
+        return 0, ["Connection successful" if result == "ok" else "Already connected"]
+
+    if cmd == "disconnect":
+        env.update(lambda st: st["speaker"].update(connected=False))
+        return 0, ["Successful disconnected"]
+
+    return 0, []
+
+
+def _bt_shell(env):
+    """Interactive bluetoothctl: prompt, commands from stdin, [CHG] events."""
+    import threading
+
+    out = threading.Lock()
+    macs = set()
+    prompt = "[bluetooth]# "
+
+    def say(*lines):
+        with out:
+            sys.stdout.write("".join(f"\r{line}\n" for line in lines) + prompt)
+            sys.stdout.flush()
+
+    def watch():
+        seen = None
+        while True:
+            connected = env.update(lambda st: st["speaker"]["connected"])
+            if seen is not None and connected != seen:
+                say(*(f"[CHG] Device {mac} Connected: {'yes' if connected else 'no'}" for mac in sorted(macs)))
+            seen = connected
+            time.sleep(0.05)
+
+    threading.Thread(target=watch, daemon=True).start()
+    say("Agent registered")
+    for line in sys.stdin:
+        args = line.split()
+        if not args:
+            say()
+            continue
+        if args[0] in ("quit", "exit"):
+            return 0
+        env.log_call("bluetoothctl", ["(session)"] + args)
+        if len(args) > 1:
+            macs.add(args[1])
+        if args[0] == "connect":
+            say(f"Attempting to connect to {args[1] if len(args) > 1 else ''}")
+        say(*_bt_command(env, args)[1])
+    return 0
+
+
+def fake_bluetoothctl(env, args):
+    if not args:
+        return _bt_shell(env)
+    env.log_call("bluetoothctl", args)
+    timeout = None
+    if args[:1] == ["--timeout"]:
+        timeout, args = float(args[1]), args[2:]
+    status, lines = _bt_command(env, args, timeout)
+    for line in lines:
+        print(line)
+    return status
+
+
+def _toggle_speaker(env):
+    def toggle(state):
+        s = state["speaker"]
+        s["powered"] = not s["powered"]
+        s["connected"] = False
+        s["connects"] = 0
+        s["on_at"] = env.now()
+        return s["powered"]
+    return env.update(toggle)
+
+
+def fake_speaker_power(env, args):
+    env.log_call("speaker-power.sh", args)
+    env.clock.sleep(env.scenario["speaker"]["press"])
+    powered = _toggle_speaker(env)
+    env.log_call("speaker-power.sh", args, powered=powered)
+    return 0
+
+
+class SpeakerButton:
+    """
+    gpio_backend backend for speaker_power.py, in the autoRain process:
+    releasing the button after at least min_press toggles the speaker.
+    """
+
+    name = "simulator"
+    ACTIVE = True
+    INACTIVE = False
+
+    def __init__(self, chip=None):
+        self.env = _Env()
+        self._pressed_at = None
+
+    def request_outputs(self, pins, consumer, value=False):
+        return self
+
+    def set_values(self, values):
+        for pin, value in values.items():
+            now = self.env.now()
+            if not value:
+                self._pressed_at = now
+                self.env.log_call("gpio", [str(pin), "0"])
+            elif self._pressed_at is not None:
+                held, self._pressed_at = now - self._pressed_at, None
+                powered = _toggle_speaker(self.env) if held >= self.env.scenario["speaker"]["min_press"] else None
+                self.env.log_call("gpio", [str(pin), "1"], held=round(held, 3), powered=powered)
+
+    def release(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _alive(pids):
+    for pid in pids:
+        try:
+            os.kill(pid, 0)
+        except OSError:
+            continue
+        return True
+    return False
+
+
+def _wake_sink(env):
+    def wake(state):
+        state["sink"]["busy_until"] = max(state["sink"]["busy_until"], env.now())
+    env.update(wake)
+
+
+def fake_pactl(env, args):
+    env.log_call("pactl", args)
+    if args[:1] == ["suspend-sink"] and args[-1:] == ["0"]:
+        _wake_sink(env)
+    if args == ["list", "short", "sinks"]:
+        sinks = ["alsa_output.platform-sound.analog-stereo"]
+        if env.update(lambda st: st["speaker"]["connected"]):
+            key = env.scenario["speaker"]["mac"].upper().replace(":", "_")
+            sinks.append(f"bluez_sink.{key}.a2dp_sink")
+        for i, sink in enumerate(sinks):
+            print(f"{i}\t{sink}\tmodule-x\ts16le 2ch 44100Hz\tSUSPENDED")
+    return 0
+
+
+def fake_mpg123(env, args):
+    path = args[-1] if args else ""
+    duration = env.scenario["audio"].get(os.path.basename(path), 1.0)
+    sink = env.scenario["sink"]
+
+    def start(state):
+        # Suspended unless a keep-warm stream is open or something played
+        # recently (a killed mpg123 leaves busy_until late: close enough)
+        now = env.now()
+        cold = (not _alive(state["pids"].get("pacat", []))
+                and now - state["sink"]["busy_until"] >= sink["suspend_after"])
+        state["sink"]["busy_until"] = max(state["sink"]["busy_until"], now + duration)
+        return cold
+
+    clipped = sink["resume"] if env.update(start) else 0.0
+    env.log_call("mpg123", args, duration=duration, clipped=clipped)
+    env.clock.sleep(duration)
+    return 0
+
+
+def fake_pacat(env, args):
+    import signal
+
+    env.register("pacat")
+    env.log_call("pacat", args)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        while True:
+            time.sleep(3600)
+    finally:
+        _wake_sink(env)  # the sink idles from now on
+
+
+def fake_usbmuxd(env, args):
+    env.register("usbmuxd")
+    env.log_call("usbmuxd", args)
+    env.clock.sleep(env.scenario["usbmuxd"]["start"])
+    open(os.path.join(env.dir, "usbmuxd.sock"), "w").close()
+    while True:
+        time.sleep(3600)
+
+
+def fake_pgrep(env, args):
+    pattern = args[-1] if args else ""
+    pids = env.update(lambda st: dict(st["pids"]))
+    found = 0
+    for tool, tool_pids in pids.items():
+        if pattern not in tool:
+            continue
+        for pid in tool_pids:
+            if _alive([pid]):
+                print(pid)
+                found += 1
+    return 0 if found else 1
+
+
+def fake_palera1n(env, args):
+    import termios
+
+    env.register("palera1n")
+    scripts = env.scenario["palera1n"]
+
+    def next_run(state):
+        state["palera1n_runs"] += 1
+        return state["palera1n_runs"] - 1
+
+    attempt = env.update(next_run)
+    steps = scripts[min(attempt, len(scripts) - 1)]
+    env.log_call("palera1n", args, attempt=attempt)
+
+    for step in steps:
+        kind = step[0]
+        if kind == "say":
+            env.clock.sleep(step[1])
+            print(f" - [{time.strftime('%m/%d/%y %H:%M:%S')}] <Info>: {step[2]}", flush=True)
+            env.log_call("palera1n", [], said=step[2], attempt=attempt)
+        elif kind == "enter":
+            # A fresh prompt: input typed earlier does not count
+            try:
+                termios.tcflush(sys.stdin, termios.TCIFLUSH)
+            except termios.error:
+                pass
+            sys.stdin.readline()
+            env.log_call("palera1n", [], pressed="enter", attempt=attempt)
+        elif kind == "hang":
+            while True:
+                time.sleep(3600)
+        elif kind == "exit":
+            return step[1]
+    return 0
+
+
+FAKES = {
+    "bluetoothctl": fake_bluetoothctl,
+    "speaker-power.sh": fake_speaker_power,
+    "pactl": fake_pactl,
+    "mpg123": fake_mpg123,
+    "pacat": fake_pacat,
+    "usbmuxd": fake_usbmuxd,
+    "pgrep": fake_pgrep,
+    "palera1n": fake_palera1n,
+}
+
+
+def run_tool(name, args):
+    try:
+        return FAKES[name](_Env(), args)
+    except (KeyboardInterrupt, BrokenPipeError):
+        return 1
+
+
+# ================= HARNESS =================
+
+# Config keys that are real-time subprocess/pexpect timeouts
+_REAL_TIMEOUTS = {
+    "bluetooth": ["info_timeout", "connect_timeout", "power_timeout", "disconnect_timeout"],
+    "audio": ["volume_timeout", "max_play"],
+}
+
+# Polling intervals in real seconds, scaled without a floor
+_REAL_INTERVALS = {
+    "palera1n": ["watchdog_poll"],
+}
+
+
+def _write_tools(sim_dir):
+    bin_dir = os.path.join(sim_dir, "bin")
+    os.makedirs(bin_dir, exist_ok=True)
+    me = os.path.abspath(__file__)
+    for name in TOOLS:
+        path = os.path.join(bin_dir, name)
+        with open(path, "w") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" -S "{me}" tool {name} "$@"\n')
+        os.chmod(path, 0o755)
+    sudo = os.path.join(bin_dir, "sudo")
+    with open(sudo, "w") as f:
+        f.write('#!/bin/sh\nexec "$@"\n')
+    os.chmod(sudo, 0o755)
+    return bin_dir
+
+
+def _jack_path(sim_dir):
+    return os.path.join(sim_dir, "jack", "status")
+
+
+def _plug_jack(sim_dir, state="plug"):
+    with open(_jack_path(sim_dir), "w") as f:
+        f.write(state + "\n")
+
+
+def sim_config(sim_dir, bin_dir, scale, overrides=None):
+    """Config values pointing autoRain at the fakes in sim_dir."""
+    import config
+
+    values = {
+        "system": {"pidfile": os.path.join(sim_dir, "autorain.pid"),
+                   "control_socket": os.path.join(sim_dir, "autorain.sock")},
+        "environment": {"path_prefix": bin_dir},
+        "logging": {"file": os.path.join(sim_dir, "autoRain.log"), "buffer_seconds": 0.0},
+        "bluetooth": {"power_script": os.path.join(bin_dir, "speaker-power.sh"), "power_backend": "simulator"},
+        "audio": {"dir": os.path.join(sim_dir, "audio"), "jack_glob": _jack_path(sim_dir)},
+        "palera1n": {"cmd": f"sudo {bin_dir}/palera1n -l"},
+        "usbmuxd": {
+            "cmd": f"sudo {bin_dir}/usbmuxd -f -p -v",
+            "log": os.path.join(sim_dir, "usbmuxd.txt"),
+            "socket": os.path.join(sim_dir, "usbmuxd.sock"),
+        },
+        "leds": {"backend": "recorder"},
+        "history": {"db": os.path.join(sim_dir, "history.db")},
+        "metrics": {"port": 0},
+        "status": {"port": 0},
+        "profiler": {"dir": sim_dir},
+    }
+    for section, keys in (overrides or {}).items():
+        values.setdefault(section, {}).update(keys)
+    for section, keys in _REAL_TIMEOUTS.items():
+        for key in keys:
+            virtual = values.get(section, {}).get(key, config.DEFAULTS[section][key])
+            values.setdefault(section, {})[key] = max(virtual / scale, MIN_REAL_TIMEOUT)
+    for section, keys in _REAL_INTERVALS.items():
+        for key in keys:
+            virtual = values.get(section, {}).get(key, config.DEFAULTS[section][key])
+            values.setdefault(section, {})[key] = virtual / scale
+    return config.validate(values, "simulator")
+
+
+def _read_results(sim_dir):
+    import sqlite3
+
+    results = {"outcome": None, "total_s": None, "retries": 0, "bt_connect_s": None, "stages": []}
+    db_path = os.path.join(sim_dir, "history.db")
+    if os.path.exists(db_path):
+        db = sqlite3.connect(db_path)
+        row = db.execute(
+            "SELECT id, outcome, total_s, retries, retry_prompts, bt_connect_s FROM runs ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        if row:
+            run_id, results["outcome"], results["total_s"], results["retries"], \
+                results["retry_prompts"], results["bt_connect_s"] = row
+            results["stages"] = [
+                {"stage": s, "prev_stage": p, "duration": d, "attempt": a}
+                for s, p, d, a in db.execute(
+                    "SELECT stage, prev_stage, duration, attempt FROM stages WHERE run_id = ? ORDER BY at",
+                    (run_id,),
+                )
+            ]
+        db.close()
+
+    calls = []
+    calls_path = os.path.join(sim_dir, "calls.jsonl")
+    if os.path.exists(calls_path):
+        with open(calls_path) as f:
+            calls = [json.loads(line) for line in f if line.strip()]
+    results["calls"] = calls
+    return results
+
+
+def prepare(spec, sim_dir, connected=False):
+    """
+    Write the fake tools, prompt files, scenario and initial state to sim_dir.
+
+    Returns the bin dir holding the fakes. The fakes also need DIR_ENV,
+    SCALE_ENV and EPOCH_ENV in their environment.
+    """
+    os.makedirs(os.path.join(sim_dir, "audio"), exist_ok=True)
+    for name in spec["audio"]:
+        open(os.path.join(sim_dir, "audio", name), "w").close()
+
+    bin_dir = _write_tools(sim_dir)
+    os.makedirs(os.path.dirname(_jack_path(sim_dir)), exist_ok=True)
+    _plug_jack(sim_dir, "plug" if spec["wired"]["plugged_at"] == 0 else "unplug")
+    with open(os.path.join(sim_dir, "scenario.json"), "w") as f:
+        json.dump(spec, f, indent=2)
+    with open(os.path.join(sim_dir, "state.json"), "w") as f:
+        json.dump({
+            "speaker": {"powered": spec["speaker"]["initially_on"], "on_at": -3600.0,
+                        "connected": connected, "connects": 0},
+            "sink": {"busy_until": -3600.0},
+            "palera1n_runs": 0,
+            "pids": {},
+        }, f)
+    for name in ("calls.jsonl", "usbmuxd.sock"):
+        if os.path.exists(os.path.join(sim_dir, name)):
+            os.remove(os.path.join(sim_dir, name))
+    return bin_dir
+
+
+def run(scenario_spec="fast_dfu", scale=DEFAULT_SCALE, sim_dir=None, config_overrides=None, limit=900.0):
+    """
+    Run autoRain.main() once against a scenario, in this process.
+
+    Args:
+        scenario_spec: SCENARIOS name or scenario dict
+        scale: virtual seconds per real second
+        sim_dir: scratch directory (None = temporary, removed afterwards)
+        config_overrides: {section: {key: value}} on top of the sim config
+        limit: virtual seconds before main() is interrupted
+
+    Returns a dict with outcome, total_s, stages (virtual seconds), calls
+    and real_s. Call it once per process: autoRain keeps module state.
+    """
+    import _thread
+    import shutil
+    import tempfile
+    import threading
+
+    spec = scenario(scenario_spec)
+    keep = sim_dir is not None
+    sim_dir = os.path.abspath(sim_dir) if keep else tempfile.mkdtemp(prefix="autorain-sim-")
+    bin_dir = prepare(spec, sim_dir)
+
+    config_path = os.path.join(sim_dir, "autorain.json")
+    with open(config_path, "w") as f:
+        json.dump(sim_config(sim_dir, bin_dir, scale, config_overrides), f, indent=2)
+
+    clock = VirtualClock(scale)
+    os.environ.update({
+        DIR_ENV: sim_dir,
+        SCALE_ENV: repr(scale),
+        EPOCH_ENV: repr(clock.epoch),
+        "AUTORAIN_CONFIG": config_path,
+    })
+    os.environ.pop("AUTORAIN_GPIO_BACKEND", None)
+    os.environ.pop("AUTORAIN_METRICS_PORT", None)
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import audio_queue
+    import autoRain
+    import gpio_backend
+    import run_history
+    import sink_select
+    import speaker_power
+
+    autoRain.time = clock
+    audio_queue.time = clock
+    audio_queue.KEEP_WARM_CHECK /= scale  # real-time poll, like _REAL_INTERVALS
+    run_history.time = clock
+    speaker_power.time = clock
+    sink_select.time = clock
+    sink_select.WAIT_POLL /= scale
+    gpio_backend.BACKENDS["simulator"] = SpeakerButton
+    autoRain._stage["since"] = clock.time()
+
+    watchdog = threading.Timer(limit / scale, _thread.interrupt_main)
+    watchdog.daemon = True
+    watchdog.start()
+    plug = threading.Timer((spec["wired"]["plugged_at"] or 0) / scale, _plug_jack, (sim_dir,))
+    plug.daemon = True
+    if spec["wired"]["plugged_at"]:
+        plug.start()
+
+    started = time.monotonic()
+    interrupted = False
+    try:
+        autoRain.main()
+    except KeyboardInterrupt:
+        interrupted = True
+        autoRain.cleanup()
+    finally:
+        watchdog.cancel()
+        plug.cancel()
+    real_s = time.monotonic() - started
+
+    results = _read_results(sim_dir)
+    if interrupted:
+        results["outcome"] = "interrupted"
+    results.update({
+        "scenario": scenario_spec if isinstance(scenario_spec, str) else "custom",
+        "scale": scale,
+        "virtual_s": round(clock.elapsed(), 3),
+        "real_s": round(real_s, 3),
+        "sim_dir": sim_dir if keep else None,
+    })
+    if not keep:
+        shutil.rmtree(sim_dir, ignore_errors=True)
+    return results
+
+
+def print_results(results):
+    print(f"scenario {results['scenario']}: {results['outcome']} in {results['virtual_s']:.1f} s virtual "
+          f"({results['real_s']:.1f} s real, x{results['scale']:g}), {results['retries']} retries")
+    for s in results["stages"]:
+        duration = "-" if s["duration"] is None else f"{s['duration']:.2f}"
+        print(f"  {s['prev_stage'] or '':<14} -> {s['stage']:<14} {duration:>8} s")
+
+
+# ================= MAIN =================
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="simulator.py", description="autoRain pipeline simulator")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="list scenarios")
+    p = sub.add_parser("run", help="run autoRain.main() against a scenario")
+    p.add_argument("--scenario", default="fast_dfu", help="scenario name")
+    p.add_argument("--scenario-file", help="scenario JSON file (overrides --scenario)")
+    p.add_argument("--scale", type=float, default=DEFAULT_SCALE, help="virtual seconds per real second")
+    p.add_argument("--limit", type=float, default=900.0, help="virtual seconds before giving up")
+    p.add_argument("--keep", metavar="DIR", help="simulate in DIR and keep it (logs, history, calls)")
+    p.add_argument("--json", metavar="PATH", help="write results as JSON")
+    p.add_argument("--set", action="append", default=[], metavar="SECTION.KEY=VALUE",
+                   help="config override (VALUE as JSON, else a string); repeatable")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for name, spec in SCENARIOS.items():
+            print(f"{name:<18} {spec['description']}")
+        return 0
+
+    spec = args.scenario
+    if args.scenario_file:
+        with open(args.scenario_file) as f:
+            spec = json.load(f)
+    overrides = {}
+    for item in args.set:
+        name, _, value = item.partition("=")
+        section, _, key = name.partition(".")
+        if not key:
+            parser.error(f"--set {item}: expected SECTION.KEY=VALUE")
+        try:
+            value = json.loads(value)
+        except ValueError:
+            pass
+        overrides.setdefault(section, {})[key] = value
+    results = run(spec, args.scale, args.keep, config_overrides=overrides, limit=args.limit)
+    print_results(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0 if results["outcome"] == "success" else 1
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "tool":
+        sys.exit(run_tool(sys.argv[2], sys.argv[3:]))
+    sys.exit(main())
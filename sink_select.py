@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Audio output selection for autoRain - every output at once, first ready wins
+
+autoRain used to wait for one Bluetooth speaker, retrying forever, before
+the jailbreak could start. Instead every candidate output is tried at the
+same time, each by its own probe thread:
+
+  bt:MAC   a configured speaker (the main one with power cycles, extra
+           ones by plain connects)
+  wired    the headphone jack, once its sysfs jack status reads "plug"
+
+The first probe to report ready wins, on_ready(name) is called and the
+other probes are told to stop. A caller that cannot wait any longer goes
+on without audio (LEDs only); the race keeps running and on_ready still
+fires when an output turns up later, so audio can be switched on mid-run.
+
+Routing helpers (list_sinks, route) use pactl, like speaker-manager.sh.
+"""
+
+import glob
+import logging
+import subprocess
+import threading
+import time
+
+import metrics
+
+log = logging.getLogger("autorain.audio")
+
+WAIT_POLL = 0.05    # seconds; SinkRace.wait() re-checks its deadline this often
+JACK_POLL = 0.5     # seconds between headphone jack checks
+JACK_GLOB = "/sys/class/sound/card*/*jack*/status"
+
+SELECTED = metrics.counter(
+    "autorain_audio_sink_selected_total", "Audio outputs that won the race (late: after the deadline)",
+    ["kind", "late"])
+
+
+# ================= RACE =================
+
+class SinkRace:
+    """Run candidate probes concurrently; the first ready output wins."""
+
+    def __init__(self, candidates, on_ready=None):
+        """
+        Args:
+            candidates: [(name, probe)]; probe(stop) blocks until its output is
+                ready (True), it gives up (False) or stop (an Event) is set
+            on_ready: called with the winning name, on the winner's thread,
+                before wait() returns
+        """
+        self.candidates = list(candidates)
+        self.on_ready = on_ready
+        self.winner = None
+        self.late = False
+        self._stop = threading.Event()
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._running = 0
+        self._started = None
+
+    def start(self):
+        self._started = time.monotonic()
+        self._running = len(self.candidates)
+        if not self.candidates:
+            self._done.set()
+        for name, probe in self.candidates:
+            threading.Thread(target=self._probe, args=(name, probe), daemon=True,
+                             name=f"sink-{name}").start()
+        return self
+
+    @property
+    def finished(self):
+        """True once every probe has given up without a winner."""
+        return self._done.is_set() and self.winner is None
+
+    def wait(self, timeout=None):
+        """
+        Winning name, or None if nothing was ready within timeout seconds
+        or the race is finished (returns at once from then on).
+        """
+        end = None if timeout is None else time.monotonic() + timeout
+        while not self._done.wait(WAIT_POLL):
+            if end is not None and time.monotonic() >= end:
+                return None
+        return self.winner
+
+    def detach(self):
+        """
+        The caller stops waiting and goes on without audio; a later winner
+        is reported as late. Returns the winner if one has just won.
+        """
+        with self._lock:
+            self.late = self.winner is None
+            winner = self.winner
+        if winner is not None:
+            self._done.wait()  # let its on_ready finish first
+        return winner
+
+    def stop(self):
+        self._stop.set()
+
+    def _probe(self, name, probe):
+        try:
+            ready = probe(self._stop)
+        except Exception as e:
+            log.warning(f"[audio] {name} probe failed: {e}")
+            ready = False
+        with self._lock:
+            self._running -= 1
+            won = ready and self.winner is None and not self._stop.is_set()
+            if won:
+                self.winner = name
+            elif self._running == 0 and self.winner is None:
+                self._done.set()  # every probe gave up
+        if not won:
+            return
+        self._stop.set()
+        elapsed = time.monotonic() - self._started
+        SELECTED.inc(kind=name.split(":")[0], late="yes" if self.late else "no")
+        log.info(f"[audio] {name} ready after {elapsed:.1f}s{' (late)' if self.late else ''}")
+        try:
+            if self.on_ready:
+                self.on_ready(name)
+        finally:
+            self._done.set()
+
+
+# ================= WIRED =================
+
+def jack_plugged(pattern=JACK_GLOB):
+    """True if any sysfs jack status under pattern reads "plug"."""
+    for path in glob.glob(pattern):
+        try:
+            with open(path) as f:
+                if f.read().strip() == "plug":
+                    return True
+        except OSError:
+            continue
+    return False
+
+
+def wait_for_jack(stop, pattern=JACK_GLOB):
+    """Probe for SinkRace: ready once the headphone jack is plugged."""
+    while not stop.is_set():
+        if jack_plugged(pattern):
+            return True
+        time.sleep(JACK_POLL)
+    return False
+
+
+# ================= ROUTING =================
+
+def bt_sink_key(mac):
+    """Part of the PulseAudio/PipeWire sink name of a Bluetooth device."""
+    return mac.upper().replace(":", "_")
+
+
+def list_sinks(env=None, timeout=2.0):
+    """Sink names from `pactl list short sinks` ([] on error)."""
+    try:
+        result = subprocess.run(["pactl", "list", "short", "sinks"], env=env,
+                                capture_output=True, text=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        log.debug(f"[audio] pactl list failed: {e}")
+        return []
+    return [line.split("\t")[1] for line in result.stdout.splitlines() if line.count("\t") >= 1]
+
+
+def route(key, env=None, timeout=2.0):
+    """Make the first sink whose name contains key the default; returns its name or None."""
+    for sink in list_sinks(env, timeout):
+        if key in sink:
+            try:
+                subprocess.run(["pactl", "set-default-sink", sink], env=env,
+                               capture_output=True, timeout=timeout)
+            except (OSError, subprocess.TimeoutExpired) as e:
+                log.warning(f"[audio] Could not select {sink}: {e}")
+                return None
+            log.info(f"[audio] Default sink: {sink}")
+            return sink
+    log.warning(f"[audio] No sink matching {key}")
+    return None
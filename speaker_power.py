@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Speaker power button for autoRain - one held GPIO line, timed presses
+
+The speaker's power button is wired to GPIO 79 on gpiochip1: high is
+released, low is pressed, and a ~3 s press toggles power. speaker-power.sh
+did that with sudo + bash + two gpioset forks per press; SpeakerPower
+requests the line once (driven high, i.e. released) and keeps it for the
+life of the process, so a press is two set_values() calls timed on the
+monotonic clock.
+
+The button is a toggle: pressing an already-on speaker turns it off.
+SpeakerPower only remembers what it did (on is None until a caller has
+verified the state); autoRain checks whether the speaker is already on
+before pressing and presses twice to restart a speaker it knows is on.
+
+Run `python3 speaker_power.py [--backend recorder] [--hold 3]` to press once.
+"""
+
+import logging
+import threading
+import time
+
+import gpio_backend
+import metrics
+
+log = logging.getLogger("autorain.speaker")
+
+CONSUMER = "autorain-speaker"
+SPIN = 0.002  # seconds before the release that are busy-waited instead of slept
+
+PRESSES = metrics.counter("autorain_speaker_presses_total", "Speaker power button presses")
+PRESS_ERROR = metrics.histogram(
+    "autorain_speaker_press_error_seconds", "Actual minus requested power button hold",
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.1, 0.5))
+
+
+def chip_path(chip):
+    """gpiochip1 -> /dev/gpiochip1 (paths are left alone)."""
+    return chip if chip.startswith("/") else "/dev/" + chip
+
+
+class SpeakerPower:
+    """The power button line, requested once (see module docstring)."""
+
+    def __init__(self, backend=None, chip="gpiochip1", line=79, hold=3.0):
+        """
+        Args:
+            backend: gpio_backend name (None = $AUTORAIN_GPIO_BACKEND or gpiod)
+            chip: GPIO chip name or /dev path
+            line: button line offset on the chip
+            hold: default press length in seconds
+        """
+        self.line = line
+        self.hold = hold
+        self.on = None  # True/False once known; flipped by every press
+        self._lock = threading.Lock()
+        self._backend = gpio_backend.get_backend(backend, chip=chip_path(chip))
+        # Released (high) from the moment we own the line
+        self._lines = self._backend.request_outputs([line], CONSUMER, value=True)
+
+    def press(self, hold=None):
+        """
+        Hold the button down for `hold` seconds (default self.hold).
+
+        Returns the measured hold in seconds.
+        """
+        hold = self.hold if hold is None else hold
+        with self._lock:
+            start = time.monotonic()
+            self._lines.set_values({self.line: self._backend.INACTIVE})
+            try:
+                end = start + hold
+                while True:
+                    remaining = end - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    time.sleep(remaining - SPIN if remaining > SPIN else 0)
+            finally:
+                self._lines.set_values({self.line: self._backend.ACTIVE})
+            held = time.monotonic() - start
+        PRESSES.inc()
+        PRESS_ERROR.observe(held - hold)
+        if self.on is not None:
+            self.on = not self.on
+        log.info(f"[bt] Power button held {held:.3f}s (speaker now "
+                 f"{'unknown' if self.on is None else 'on' if self.on else 'off'})")
+        return held
+
+    def close(self):
+        """Release the line (it stops being driven)."""
+        with self._lock:
+            if self._lines is not None:
+                self._lines.release()
+                self._lines = None
+            self._backend.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import config
+
+    cfg = config.load()
+    parser = argparse.ArgumentParser(description="press the speaker power button once")
+    parser.add_argument("--backend", help="gpio backend (default: config bluetooth.power_backend)")
+    parser.add_argument("--hold", type=float, default=cfg.bluetooth.power_hold, help="seconds")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
+    backend = args.backend or cfg.bluetooth.power_backend
+    power = SpeakerPower(None if backend == "script" else backend,
+                         cfg.bluetooth.power_chip, cfg.bluetooth.power_line, args.hold)
+    try:
+        power.press()
+    finally:
+        power.close()
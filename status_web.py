@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Status page for autoRain - live progress over the captive portal
+
+A phone on the box's hotspot is sent here by nginx (configs/captive-portal)
+and follows the jailbreak in real time:
+
+    GET /          status page (plain HTML + EventSource, no assets)
+    GET /events    server-sent events: stage, countdown, retry
+    GET /state     current state as JSON
+
+publish() appends to one ring of recent events and wakes all viewers with
+a single Condition.notify_all(); each viewer thread just sends what it has
+not seen yet, so there is no per-client queue and no polling. A viewer
+that reconnects with Last-Event-ID gets the events it missed, or a fresh
+snapshot if they have already left the ring.
+
+Run `python3 status_web.py [PORT]` to serve a demo event stream.
+"""
+
+import collections
+import json
+import logging
+import threading
+import time
+
+log = logging.getLogger("autorain.status_web")
+
+DEFAULT_PORT = 8080
+RING_SIZE = 256
+KEEPALIVE = 15.0  # seconds between SSE comments on an idle stream
+MAX_VIEWERS = 32
+
+_cond = threading.Condition()
+_ring = collections.deque(maxlen=RING_SIZE)  # (id, event, data)
+_next_id = 1
+_state = {"stage": "starting", "message": "Starting...", "since": time.time(),
+          "countdown": None, "retries": 0}
+_viewers = 0
+_server = None
+
+
+# ================= EVENTS =================
+
+def publish(event, data):
+    """Record an event for all viewers; never blocks on them."""
+    global _next_id
+
+    with _cond:
+        if event == "stage":
+            _state.update(stage=data.get("stage"), message=data.get("message"),
+                          since=time.time(), countdown=None)
+        elif event == "countdown":
+            _state["countdown"] = dict(data, ends=time.monotonic() + data["seconds"])
+        elif event == "retry":
+            _state["retries"] += 1
+        _ring.append((_next_id, event, json.dumps(data, default=str)))
+        _next_id += 1
+        _cond.notify_all()
+
+
+def stage(name, message, **fields):
+    publish("stage", dict(fields, stage=name, message=message))
+
+
+def countdown(label, seconds):
+    """Start a countdown shown on the page (e.g. the DFU button holds)."""
+    publish("countdown", {"label": label, "seconds": seconds})
+
+
+def snapshot():
+    """Current state with the remaining countdown time."""
+    with _cond:
+        state = dict(_state)
+        if state["countdown"] is not None:
+            remaining = state["countdown"]["ends"] - time.monotonic()
+            state["countdown"] = (None if remaining <= 0 else
+                                  {"label": state["countdown"]["label"], "seconds": round(remaining, 1)})
+        state["stage_s"] = round(time.time() - state.pop("since"), 1)
+        return state
+
+
+def viewers():
+    return _viewers
+
+
+def _events_after(last_id):
+    """Events newer than last_id, or None if some were dropped from the ring."""
+    if _ring and last_id < _ring[0][0] - 1:
+        return None
+    return [e for e in _ring if e[0] > last_id]
+
+
+# ================= PAGE =================
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>autoRain</title>
+<style>
+body { font-family: sans-serif; background: #111; color: #eee; text-align: center; margin: 0; padding: 2em 1em; }
+#stage { font-size: 1.1em; color: #8cf; text-transform: uppercase; letter-spacing: .1em; }
+#message { font-size: 1.6em; margin: .5em 0 1em; }
+#count { font-size: 5em; font-weight: bold; color: #fc4; }
+#label { font-size: 1.2em; min-height: 1.5em; }
+#log { color: #888; font-size: .9em; margin-top: 2em; list-style: none; padding: 0; }
+a { color: #8cf; }
+</style></head>
+<body>
+<div id="stage">connecting</div>
+<div id="message"></div>
+<div id="count"></div>
+<div id="label"></div>
+<ul id="log"></ul>
+<p><a href="http://192.168.12.1:4200/">terminal</a></p>
+<script>
+var ends = null, $ = function (id) { return document.getElementById(id); };
+function show(s) {
+  $("stage").textContent = s.stage || "";
+  $("message").textContent = s.message || "";
+  countdown(s.countdown);
+}
+function countdown(c) {
+  ends = c ? Date.now() + c.seconds * 1000 : null;
+  $("label").textContent = c ? c.label : "";
+  tick();
+}
+function tick() {
+  var left = ends ? Math.ceil((ends - Date.now()) / 1000) : 0;
+  $("count").textContent = left > 0 ? left : "";
+  if (left <= 0) { ends = null; $("label").textContent = ""; }
+}
+function note(text) {
+  var li = document.createElement("li");
+  li.textContent = new Date().toLocaleTimeString() + "  " + text;
+  $("log").insertBefore(li, $("log").firstChild);
+}
+setInterval(tick, 250);
+var es = new EventSource("events");
+es.addEventListener("snapshot", function (e) { show(JSON.parse(e.data)); });
+es.addEventListener("stage", function (e) { var s = JSON.parse(e.data); show(s); note(s.message); });
+es.addEventListener("countdown", function (e) { countdown(JSON.parse(e.data)); });
+es.addEventListener("retry", function (e) { note("retry: " + JSON.parse(e.data).reason); });
+es.onerror = function () { $("stage").textContent = "reconnecting"; };
+</script>
+</body></html>
+"""
+
+
+# ================= HTTP SERVER =================
+
+def _handler_class():
+    # Same lazy import as metrics.py: http.server is only needed when serving
+    from http.server import BaseHTTPRequestHandler
+
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path in ("/", "/index.html"):
+                self._send(200, "text/html; charset=utf-8", PAGE.encode())
+            elif path == "/state":
+                self._send(200, "application/json", json.dumps(snapshot()).encode())
+            elif path == "/events":
+                self._stream()
+            else:
+                # Captive portal probes for other hosts land here too
+                self.send_response(302)
+                self.send_header("Location", "/")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+        def _send(self, status, ctype, body):
+            self.send_response(status)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _stream(self):
+            global _viewers
+
+            with _cond:
+                if _viewers >= MAX_VIEWERS:
+                    full = True
+                else:
+                    full = False
+                    _viewers += 1
+            if full:
+                self._send(503, "text/plain", b"too many viewers\n")
+                return
+            try:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-store")
+                self.send_header("X-Accel-Buffering", "no")  # nginx: don't buffer the stream
+                self.end_headers()
+                self.close_connection = True
+                try:
+                    last_id = int(self.headers.get("Last-Event-ID", ""))
+                except ValueError:
+                    last_id = None
+                self._pump(last_id)
+            except OSError:
+                pass  # viewer went away
+            finally:
+                with _cond:
+                    _viewers -= 1
+
+        def _pump(self, last_id):
+            while True:
+                with _cond:
+                    if last_id is not None:
+                        _cond.wait_for(lambda: _next_id - 1 > last_id, timeout=KEEPALIVE)
+                    pending = None if last_id is None else _events_after(last_id)
+                    if pending is None:
+                        # New viewer, or it missed too much: start from the current state
+                        last_id = _next_id - 1
+                        out = f"id: {last_id}\nevent: snapshot\ndata: {json.dumps(snapshot())}\n\n"
+                    elif pending:
+                        last_id = pending[-1][0]
+                        out = "".join(f"id: {i}\nevent: {e}\ndata: {d}\n\n" for i, e, d in pending)
+                    else:
+                        out = ": ping\n\n"
+                # Written outside the lock: a slow phone only delays itself
+                self.wfile.write(out.encode())
+                self.wfile.flush()
+
+        def log_message(self, format, *args):
+            pass
+
+    return _Handler
+
+
+def start_server(port=DEFAULT_PORT, addr="0.0.0.0"):
+    """Serve the status page from a daemon thread. Returns the server."""
+    global _server
+
+    if _server is not None:
+        return _server
+    from http.server import ThreadingHTTPServer
+    _server = ThreadingHTTPServer((addr, port), _handler_class())
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, daemon=True, name="status-http").start()
+    log.info(f"[status] Serving on http://{addr}:{_server.server_address[1]}/")
+    return _server
+
+
+def stop_server():
+    global _server
+
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
+    start_server(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT)
+    demo = [("waiting", "Waiting for device...", 0), ("recovery", "Recovery mode - device detected!", 0),
+            ("dfu", "DFU mode instructions", 5), ("booting", "Kernel booting - SUCCESS!", 0)]
+    try:
+        while True:
+            for name, message, hold in demo:
+                stage(name, message)
+                if hold:
+                    countdown("Hold power + volume down", hold)
+                time.sleep(hold or 3)
+    except KeyboardInterrupt:
+        pass